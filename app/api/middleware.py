@@ -0,0 +1,37 @@
+import time
+from app.utils.metrics import request_latency
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each HTTP request by route template and status.
+
+    Labels use the matched route's path ("/dev/state", not the raw URL) so the
+    series count stays bounded; unmatched paths share a single label. Streaming
+    responses are timed until their last body chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            request_latency.observe(
+                time.perf_counter() - started, endpoint, scope["method"], str(status)
+            )
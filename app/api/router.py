@@ -1,6 +1,10 @@
+import asyncio
+import json
+import logging
 import uuid
-from datetime import datetime, timedelta
+from typing import Any
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from app.api.schemas import (
     ChatRequest,
     ChatResponse,
@@ -9,193 +13,133 @@ from app.api.schemas import (
     StateResponse,
     MetaResponse,
 )
-from app.domain.models import SessionState, VerificationState, PatientPublic, ConversationTurn
-from app.graph.state import GraphState
+from app.domain.models import ConversationTurn
+from app.domain.state import GraphState
 from app.graph.builder import ConversationGraph
 from app.graph.nodes import GraphNodes
+from app.llm.client import build_response_cache, collect_llm_stats
 from app.services.verification import VerificationService
 from app.services.appointments import AppointmentService
+from app.services.sessions import SessionService
 from app.repositories.mock_patients import MockPatientRepository
-from app.repositories.mock_appointments import MockAppointmentRepository
-from app.repositories.mock_session import MockSessionRepository
+from app.repositories.factory import (
+    create_appointment_repository,
+    create_session_repository,
+)
 from app.repositories.mock_otp import MockOTPRepository
-from app.utils.time import get_pst_now, create_session_expiry
+from app.utils.blocking import offload
+from app.utils.metrics import REGISTRY, MetricFamily, lockout_rejections, node_latency
+from app.utils.time import get_pst_now
+from app.utils.tracing import TracedProxy
 
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # Initialize repositories and services
 patient_repo = MockPatientRepository()
-appointment_repo = MockAppointmentRepository()
-session_repo = MockSessionRepository()
+appointment_repo = create_appointment_repository()
+session_repo = create_session_repository()
 otp_repo = MockOTPRepository()
 
-verification_service = VerificationService(patient_repo, otp_repo)
-appointment_service = AppointmentService(appointment_repo)
+# Repository calls made while the graph runs are timed into the turn trace
+verification_service = VerificationService(
+    TracedProxy(patient_repo), TracedProxy(otp_repo)
+)
+appointment_service = AppointmentService(TracedProxy(appointment_repo))
+session_service = SessionService(session_repo)
 
 # Initialize graph
-nodes = GraphNodes(verification_service, appointment_service)
+nodes = GraphNodes(
+    verification_service,
+    appointment_service,
+    response_cache=build_response_cache(),
+)
 conversation_graph = ConversationGraph(nodes)
 
 
-def create_session_state(session_id: str) -> SessionState:
-    """Create new session state"""
+async def begin_turn(request: ChatRequest) -> GraphState:
+    """Load the session, enforce lockout and set up this turn's state"""
+    # Load session state straight into the turn's graph state
     now = get_pst_now()
-    idle_timeout, absolute_timeout = create_session_expiry(now)
-
-    return SessionState(
-        session_id=session_id,
-        verified=False,
-        patient_public=PatientPublic(),
-        patient_id=None,
-        verification=VerificationState(),
-        last_list_snapshot=[],
-        last_intent=None,
-        last_activity=now,
-        expires_at=absolute_timeout,
-        phone_input=None,
-        dob_input=None,
-        conversation_history=[],
+    state = await offload(
+        session_service.blocking_io, session_service.load, request.session_id, now
     )
 
+    # Check for lockout
+    lockout_until = state.verification.lockout_until
+    if lockout_until is not None and verification_service.is_locked_out(state):
+        lockout_rejections.inc()
+        lockout_seconds = int((lockout_until - now).total_seconds())
+        raise HTTPException(
+            status_code=429,
+            detail={
+                "error": "locked_out",
+                "retry_after_seconds": max(lockout_seconds, 0),
+            },
+        )
+
+    state.user_message = request.message
+    return state
+
 
-def load_session_state(session_id: str) -> SessionState:
-    """Load or create session state"""
-    stored = session_repo.get(session_id)
-    if stored:
-        # Add default values for new fields if they don't exist (backward compatibility)
-        if 'phone_input' not in stored:
-            stored['phone_input'] = None
-        if 'dob_input' not in stored:
-            stored['dob_input'] = None
-        if 'conversation_history' not in stored:
-            stored['conversation_history'] = []
-        # Convert back to SessionState
-        session_state = SessionState(**stored)
-
-        # Check expiry
-        now = get_pst_now()
-        if now > session_state.expires_at or (
-            now - session_state.last_activity
-        ) > timedelta(minutes=15):
-            # Session expired - reset verification but keep session
-            session_state.verified = False
-            session_state.patient_id = None
-            session_state.patient_public = PatientPublic()
-            session_state.verification = VerificationState()
-            session_state.last_list_snapshot = []
-            session_state.phone_input = None
-            session_state.dob_input = None
-            session_state.conversation_history = []
-
-        # Update activity
-        session_state.last_activity = now
-        return session_state
-    else:
-        return create_session_state(session_id)
-
-
-def save_session_state(session_state: SessionState):
-    """Save session state"""
-    session_repo.set(session_state.session_id, session_state.model_dump())
+async def complete_turn(request: ChatRequest, state: GraphState) -> ChatResponse:
+    """Persist the graph result and build the chat response"""
+    now = state.now
+
+    # Persist this turn (scalar fields plus the new history entry)
+    new_turn = ConversationTurn.model_construct(
+        user_message=request.message,
+        assistant_message=state.assistant_message,
+        timestamp=now,
+    )
+    await offload(session_service.blocking_io, session_service.save, state, new_turn)
+
+    # Build response - the one validated model of the turn
+    expires_at = state.expires_at
+    return ChatResponse(
+        assistant=AssistantResponse(
+            message=state.assistant_message,
+            suggestions=state.suggestions,
+        ),
+        state=StateResponse(
+            verified=state.verified,
+            verification=state.verification,
+            patient=state.patient_public,
+            last_list_snapshot=state.last_list_snapshot,
+            session={
+                "last_activity": state.last_activity.isoformat(),
+                "expires_at": expires_at.isoformat() if expires_at is not None else None,
+            },
+        ),
+        meta=MetaResponse(
+            session_id=request.session_id,
+            turn_id=str(uuid.uuid4()),
+            timestamp=now.isoformat(),
+        ),
+        trace=state.trace if request.trace else None,
+    )
+
+
+def format_sse(event: str, data: dict[str, Any]) -> str:
+    """Encode a single Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
 @router.post("/chat", response_model=ChatResponse)
-def chat(request: ChatRequest):
+async def chat(request: ChatRequest):
     """Main chat endpoint"""
     try:
-        # Load session state
-        session_state = load_session_state(request.session_id)
-
-        # Check for lockout
-        if verification_service.is_locked_out(session_state):
-            lockout_seconds = int(
-                (
-                    session_state.verification.lockout_until - get_pst_now()
-                ).total_seconds()
-            )
-            raise HTTPException(
-                status_code=429,
-                detail={
-                    "error": "locked_out",
-                    "retry_after_seconds": max(lockout_seconds, 0),
-                },
-            )
-
-        # Create graph state
-        now = get_pst_now()
-        graph_state = GraphState(
-            session_id=request.session_id,
-            verified=session_state.verified,
-            patient_id=session_state.patient_id,
-            patient_public=session_state.patient_public,
-            verification=session_state.verification,
-            last_list_snapshot=session_state.last_list_snapshot,
-            last_intent=session_state.last_intent,
-            now=now,
-            user_message=request.message,
-            phone_input=session_state.phone_input,
-            dob_input=session_state.dob_input,
-            conversation_history=session_state.conversation_history,
-        )
+        state = await begin_turn(request)
 
         # Run conversation graph
-        result_state = conversation_graph.run(graph_state)
-
-        # Update session state from graph result
-        session_state.verified = result_state.verified
-        session_state.patient_id = result_state.patient_id
-        session_state.patient_public = result_state.patient_public
-        session_state.verification = result_state.verification
-        session_state.last_list_snapshot = result_state.last_list_snapshot
-        session_state.last_intent = result_state.last_intent
-        session_state.last_activity = now
-        session_state.phone_input = result_state.phone_input
-        session_state.dob_input = result_state.dob_input
-        
-        # Add this conversation turn to history (keep last 50 turns)
-        new_turn = ConversationTurn(
-            user_message=request.message,
-            assistant_message=result_state.assistant_message,
-            timestamp=now
-        )
-        session_state.conversation_history.append(new_turn)
-        # Keep only the most recent 50 turns to avoid memory bloat
-        if len(session_state.conversation_history) > 50:
-            session_state.conversation_history = session_state.conversation_history[-50:]
-
-        # Save updated session
-        save_session_state(session_state)
-
-        # Build response
-        response = ChatResponse(
-            assistant=AssistantResponse(
-                message=result_state.assistant_message,
-                suggestions=result_state.suggestions,
-            ),
-            state=StateResponse(
-                verified=session_state.verified,
-                verification=session_state.verification,
-                patient=session_state.patient_public,
-                last_list_snapshot=session_state.last_list_snapshot,
-                session={
-                    "last_activity": session_state.last_activity.isoformat(),
-                    "expires_at": session_state.expires_at.isoformat(),
-                },
-            ),
-            meta=MetaResponse(
-                session_id=request.session_id,
-                turn_id=str(uuid.uuid4()),
-                timestamp=now.isoformat(),
-            ),
-        )
-
-        if request.trace:
-            response.trace = {
-                "path": ["Guard", "Verify" if not result_state.verified else "Router"]
-            }
+        state = await conversation_graph.run(state)
 
-        return response
+        # Already validated; skip FastAPI's re-validation of the return value
+        return Response(
+            (await complete_turn(request, state)).model_dump_json(),
+            media_type="application/json",
+        )
 
     except HTTPException:
         raise
@@ -203,12 +147,56 @@ def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Streaming chat endpoint - emits LLM tokens as SSE, then the final state"""
+    # Lockout and session errors surface as regular HTTP errors before streaming
+    graph_state = await begin_turn(request)
+
+    tokens: asyncio.Queue[str | None] = asyncio.Queue()
+
+    async def token_sink(token: str) -> None:
+        await tokens.put(token)
+
+    graph_state.token_sink = token_sink
+
+    async def event_stream():
+        run = asyncio.create_task(conversation_graph.run(graph_state))
+        run.add_done_callback(lambda _: tokens.put_nowait(None))
+        try:
+            streamed = False
+            while (token := await tokens.get()) is not None:
+                streamed = True
+                yield format_sse("token", {"delta": token})
+
+            result_state = run.result()
+            if not streamed and result_state.assistant_message:
+                # Deterministic replies (verification, lists, ...) arrive in one piece
+                yield format_sse("token", {"delta": result_state.assistant_message})
+
+            # Persist only once the full reply is known
+            response = await complete_turn(request, result_state)
+            yield format_sse("done", response.model_dump(mode="json"))
+        except Exception:
+            # The response has already started, so this never reaches the error middleware
+            logger.exception("Streaming chat turn failed for session %s", request.session_id)
+            yield format_sse("error", {"error": "internal_error"})
+        finally:
+            run.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/dev/reset_session")
 def reset_session(request: dict):
     """Dev endpoint to reset session"""
     session_id = request.get("session_id")
     if session_id:
-        session_repo.delete(session_id)
+        session_service.reset(session_id)
         otp_repo.clear_otp(session_id)
     return {"status": "reset"}
 
@@ -216,11 +204,77 @@ def reset_session(request: dict):
 @router.get("/dev/state")
 def get_session_state(session_id: str):
     """Dev endpoint to get session state"""
-    stored = session_repo.get(session_id)
+    stored = session_service.materialize(session_id)
     return stored or {"error": "Session not found"}
 
 
+def collect_runtime_metrics() -> list[MetricFamily]:
+    """Gauges and counters read from live components at scrape time"""
+    families: list[MetricFamily] = []
+    if hasattr(session_repo, "stats"):
+        families.append(
+            ("sessions_live", "gauge", "Sessions currently held in memory",
+             [({}, session_repo.stats()["live"])])
+        )
+    families.append(
+        ("router_classifications_total", "counter", "Router classifications by tier",
+         [({"tier": tier}, count) for tier, count in sorted(nodes.routing_stats.items())])
+    )
+
+    llm_stats = collect_llm_stats(nodes.llm_client)
+    caches: dict[str, dict[str, Any]] = {}
+    if "intent_cache" in llm_stats:
+        caches["intent"] = llm_stats["intent_cache"]
+    if nodes.response_cache is not None:
+        caches["response"] = nodes.response_cache.stats()
+    hits: list[tuple[dict[str, str], int]] = []
+    misses: list[tuple[dict[str, str], int]] = []
+    ratios: list[tuple[dict[str, str], float]] = []
+    for cache, stats in caches.items():
+        lookups = stats["hits"] + stats["misses"]
+        hits.append(({"cache": cache}, stats["hits"]))
+        misses.append(({"cache": cache}, stats["misses"]))
+        ratios.append(({"cache": cache}, stats["hits"] / lookups if lookups else 0.0))
+    families += [
+        ("cache_hits_total", "counter", "Cache lookups served from memory", hits),
+        ("cache_misses_total", "counter", "Cache lookups that fell through", misses),
+        ("cache_hit_ratio", "gauge", "Hits over lookups since start", ratios),
+    ]
+
+    circuit = llm_stats.get("upstream", {}).get("circuit")
+    if circuit:
+        families.append(
+            ("llm_circuit_state", "gauge", "1 for the LLM circuit breaker's current state",
+             [({"state": state}, int(circuit["state"] == state))
+              for state in ("closed", "open", "half_open")])
+        )
+    return families
+
+
+REGISTRY.register_collector(collect_runtime_metrics)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @router.get("/health")
-def health_check():
+def health_check() -> dict[str, Any]:
     """Health check endpoint"""
-    return {"status": "healthy", "timestamp": get_pst_now().isoformat()}
+    health: dict[str, Any] = {"status": "healthy", "timestamp": get_pst_now().isoformat()}
+    if hasattr(session_repo, "stats"):
+        health["sessions"] = session_repo.stats()
+    health["routing"] = dict(nodes.routing_stats)
+    health["llm"] = collect_llm_stats(nodes.llm_client)
+    health["nodes"] = node_latency.summary()
+    circuit = health["llm"].get("upstream", {}).get("circuit")
+    if circuit and circuit["state"] != "closed":
+        # Still serving, but on rules and canned replies instead of the LLM
+        health["status"] = "degraded"
+    if nodes.response_cache is not None:
+        health["response_cache"] = nodes.response_cache.stats()
+    return health
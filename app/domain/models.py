@@ -1,7 +1,7 @@
 from enum import Enum
 from datetime import datetime, date
 from pydantic import BaseModel
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Protocol
 
 
 class AppointmentStatus(str, Enum):
@@ -50,6 +50,12 @@ class ConversationTurn(BaseModel):
     timestamp: datetime
 
 
+class VerifiableSession(Protocol):
+    """What verification reads and updates: a SessionState or the turn's GraphState"""
+    session_id: str
+    verification: VerificationState
+
+
 class SessionState(BaseModel):
     session_id: str
     verified: bool = False
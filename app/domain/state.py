@@ -0,0 +1,173 @@
+from datetime import datetime
+from typing import Optional, List, Dict, Callable, Awaitable, Any
+from app.domain.models import PatientPublic, VerificationState, ConversationTurn
+
+
+def _as_datetime(value: Any) -> Optional[datetime]:
+    # In-memory stores keep datetimes; JSON-backed ones return ISO strings
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+class GraphState:
+    """Session plus current-turn state, loaded once per turn and mutated in place.
+
+    One object carries the stored session fields and the turn's working data
+    through the graph and back to storage, so a turn no longer copies a
+    SessionState into a GraphState and back. It is a plain __slots__ class:
+    pydantic validates only the request and response models at the API
+    boundary, and stored sessions are decoded without validation.
+    """
+
+    # Session fields persisted with every turn (see SessionService)
+    SESSION_FIELDS = (
+        "session_id",
+        "verified",
+        "patient_public",
+        "patient_id",
+        "verification",
+        "last_list_snapshot",
+        "last_intent",
+        "last_activity",
+        "expires_at",
+        "phone_input",
+        "dob_input",
+    )
+
+    __slots__ = SESSION_FIELDS + (
+        "conversation_history",
+        # Current turn data
+        "now",
+        "user_message",
+        "assistant_message",
+        "suggestions",
+        # Flow control
+        "next_action",
+        "error_message",
+        # Extracted entities for appointment actions
+        "ordinal",
+        "reference_entities",  # LLM date/time/provider hints for natural references
+        "actions",  # [{action, ordinal}] for multi-action turns
+        "appointment_id",
+        "otp_code",
+        "confirmation_needed",
+        # Streaming: when set, LLM-generated replies are forwarded token by token
+        "token_sink",
+        # Filled by ConversationGraph.run: node path and per-node timings
+        "trace",
+        # Deltas journaled since the last snapshot; None until a snapshot exists
+        "pending_deltas",
+    )
+
+    def __init__(  # noqa: PLR0913 - one keyword per persisted session field
+        self,
+        session_id: str,
+        now: datetime,
+        user_message: str = "",
+        *,
+        verified: bool = False,
+        patient_id: Optional[str] = None,
+        patient_public: Optional[PatientPublic] = None,
+        verification: Optional[VerificationState] = None,
+        last_list_snapshot: Optional[List[Dict]] = None,
+        last_intent: Optional[str] = None,
+        last_activity: Optional[datetime] = None,
+        expires_at: Optional[datetime] = None,
+        phone_input: Optional[str] = None,
+        dob_input: Optional[str] = None,
+        conversation_history: Optional[List[ConversationTurn]] = None,
+    ):
+        self.session_id = session_id
+        self.verified = verified
+        self.patient_id = patient_id
+        self.patient_public = patient_public if patient_public is not None else PatientPublic()
+        self.verification = verification if verification is not None else VerificationState()
+        self.last_list_snapshot = last_list_snapshot if last_list_snapshot is not None else []
+        self.last_intent = last_intent
+        self.last_activity = last_activity or now
+        self.expires_at = expires_at
+        self.phone_input = phone_input
+        self.dob_input = dob_input
+        self.conversation_history = conversation_history if conversation_history is not None else []
+
+        self.now = now
+        self.user_message = user_message
+        self.assistant_message = ""
+        self.suggestions: List[str] = []
+        self.next_action: Optional[str] = None
+        self.error_message: Optional[str] = None
+        self.ordinal: Optional[int] = None
+        self.reference_entities: Optional[Dict[str, Any]] = None
+        self.actions: List[Dict[str, Any]] = []
+        self.appointment_id: Optional[str] = None
+        self.otp_code: Optional[str] = None
+        self.confirmation_needed = False
+        self.token_sink: Optional[Callable[[str], Awaitable[None]]] = None
+        self.trace: Optional[Dict[str, Any]] = None
+        self.pending_deltas: Optional[int] = None
+
+    @classmethod
+    def from_record(
+        cls,
+        record: Dict[str, Any],
+        history: List[Dict[str, Any]],
+        now: datetime,
+        user_message: str = "",
+    ) -> "GraphState":
+        """Decode a stored session dict (trusted: written by session_fields) without validation"""
+        verification = dict(record.get("verification") or {})
+        for key in ("otp_expires_at", "lockout_until"):
+            verification[key] = _as_datetime(verification.get(key))
+        return cls(
+            record["session_id"],
+            now,
+            user_message,
+            verified=record.get("verified", False),
+            patient_id=record.get("patient_id"),
+            patient_public=PatientPublic.model_construct(**(record.get("patient_public") or {})),
+            verification=VerificationState.model_construct(**verification),
+            last_list_snapshot=list(record.get("last_list_snapshot") or []),
+            last_intent=record.get("last_intent"),
+            last_activity=_as_datetime(record.get("last_activity")),
+            expires_at=_as_datetime(record.get("expires_at")),
+            phone_input=record.get("phone_input"),
+            dob_input=record.get("dob_input"),
+            conversation_history=[
+                ConversationTurn.model_construct(
+                    user_message=turn["user_message"],
+                    assistant_message=turn["assistant_message"],
+                    timestamp=_as_datetime(turn["timestamp"]),
+                )
+                for turn in history
+            ],
+        )
+
+    def session_fields(self) -> Dict[str, Any]:
+        """The persisted session fields as plain data, for the session journal"""
+        return {
+            "session_id": self.session_id,
+            "verified": self.verified,
+            "patient_public": self.patient_public.model_dump(),
+            "patient_id": self.patient_id,
+            "verification": self.verification.model_dump(),
+            "last_list_snapshot": [dict(item) for item in self.last_list_snapshot],
+            "last_intent": self.last_intent,
+            "last_activity": self.last_activity,
+            "expires_at": self.expires_at,
+            "phone_input": self.phone_input,
+            "dob_input": self.dob_input,
+        }
+
+    def copy(self) -> "GraphState":
+        """Shallow copy (nested models and lists are shared)"""
+        clone = GraphState.__new__(GraphState)
+        for name in self.__slots__:
+            setattr(clone, name, getattr(self, name))
+        return clone
+
+    def __repr__(self) -> str:
+        return (
+            f"GraphState(session_id={self.session_id!r}, verified={self.verified}, "
+            f"next_action={self.next_action!r}, user_message={self.user_message!r})"
+        )
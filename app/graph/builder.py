@@ -1,40 +1,76 @@
-from app.graph.state import GraphState
+from app.graph.definition import END, GraphDefinition
+from app.domain.state import GraphState
 from app.graph.nodes import GraphNodes
+from app.utils.metrics import node_dependency_latency, node_latency, turn_latency
+from app.utils.tracing import DEPENDENCIES, TurnTrace, current_trace
+
+# Nodes the router dispatches to; each produces the turn's reply
+ACTION_NODES = ("list", "confirm", "cancel", "batch", "help", "smalltalk", "fallback")
+
+
+def follow_next_action(state: GraphState) -> str | None:
+    """Continue to the node's chosen next_action until a reply has been produced"""
+    return None if state.assistant_message else state.next_action
+
+
+def build_definition(nodes: GraphNodes) -> GraphDefinition:
+    """guard -> (verify | router -> action node) -> END"""
+    graph = GraphDefinition(entry="guard")
+    graph.add_node("guard", nodes.guard_node)
+    graph.add_node("verify", nodes.verify_node)
+    graph.add_node("router", nodes.router_node)
+    for action in ACTION_NODES:
+        graph.add_node(action, getattr(nodes, f"{action}_node"))
+
+    graph.add_conditional_edges("guard", follow_next_action, ["verify", "router"])
+    graph.add_conditional_edges("router", follow_next_action, ACTION_NODES)
+    graph.add_edge("verify", END)
+    for action in ACTION_NODES:
+        graph.add_edge(action, END)
+    return graph
+
+
+def record_node(name: str, _state: GraphState, seconds: float) -> None:
+    """Node hook: close the node's trace entry and observe its latencies"""
+    node_latency.observe(seconds, name)
+    trace = current_trace.get()
+    if trace is None:
+        return
+    entry = trace.end_node(name, seconds)
+    for dependency in DEPENDENCIES:
+        if entry[dependency]:
+            node_dependency_latency.observe(entry[dependency], name, dependency)
+
+
+def record_turn(_state: GraphState, _path: list[str], seconds: float) -> None:
+    """Turn hook: observe the whole run's latency"""
+    turn_latency.observe(seconds)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.total_seconds = seconds
 
 
 class ConversationGraph:
-    """Simple state machine for conversation flow"""
+    """Conversation flow, compiled once from its declarative definition"""
 
-    def __init__(self, nodes: GraphNodes):
+    def __init__(self, nodes: GraphNodes, step_budget: int = 8):
         self.nodes = nodes
+        self.graph = build_definition(nodes).compile(step_budget)
+        # Timings come from the graph's own per-step clock, not a wrapper per node
+        self.graph.add_node_hook(record_node)
+        self.graph.add_turn_hook(record_turn)
 
-    def run(self, state: GraphState) -> GraphState:
-        """Run the conversation graph"""
-        # Start with guard node
-        state = self.nodes.guard_node(state)
-
-        # Process based on next action
-        while state.next_action and not state.assistant_message:
-            if state.next_action == "verify":
-                state = self.nodes.verify_node(state)
-            elif state.next_action == "router":
-                state = self.nodes.router_node(state)
-            elif state.next_action == "list":
-                state = self.nodes.list_node(state)
-            elif state.next_action == "confirm":
-                state = self.nodes.confirm_node(state)
-            elif state.next_action == "cancel":
-                state = self.nodes.cancel_node(state)
-            elif state.next_action == "help":
-                state = self.nodes.help_node(state)
-            elif state.next_action == "smalltalk":
-                state = self.nodes.smalltalk_node(state)
-            elif state.next_action == "fallback":
-                state = self.nodes.fallback_node(state)
-            else:
-                break
+    async def run(self, state: GraphState) -> GraphState:
+        """Run the conversation graph, recording a per-node trace in state.trace"""
+        trace = TurnTrace()
+        token = current_trace.set(trace)
+        try:
+            state = await self.graph.run(state)
+        finally:
+            current_trace.reset(token)
 
         # Clear next_action for next turn
         state.next_action = None
+        state.trace = trace.to_dict()
 
         return state
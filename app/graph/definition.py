@@ -0,0 +1,190 @@
+"""Declarative graph definitions compiled into a dispatch table.
+
+A GraphDefinition lists nodes and the transitions between them: fixed edges,
+or a conditional route function plus the targets it may return. compile()
+validates the shape once (unknown targets, cycles, unreachable nodes) and
+produces a CompiledGraph whose hot loop is a dict lookup per step.
+"""
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+END = "__end__"
+
+Handler = Callable[[Any], Awaitable[Any]]
+Route = Callable[[Any], Optional[str]]
+# Called after each node with (node name, state, seconds)
+NodeHook = Callable[[str, Any, float], None]
+# Called once per turn with (state, node path, seconds)
+TurnHook = Callable[[Any, List[str], float], None]
+
+
+class GraphDefinitionError(ValueError):
+    """The graph definition is malformed (unknown node, cycle, unreachable node)"""
+
+
+class GraphRuntimeError(RuntimeError):
+    """A turn left the declared graph or ran past its step budget"""
+
+
+class GraphDefinition:
+    """Nodes and transitions of a conversation graph, before compilation"""
+
+    def __init__(self, entry: str):
+        self.entry = entry
+        self._handlers: Dict[str, Handler] = {}
+        self._routes: Dict[str, Tuple[Optional[Route], Tuple[str, ...]]] = {}
+
+    def add_node(self, name: str, handler: Handler) -> "GraphDefinition":
+        if name in self._handlers or name == END:
+            raise GraphDefinitionError(f"Duplicate node name: {name}")
+        self._handlers[name] = handler
+        return self
+
+    def add_edge(self, source: str, target: str) -> "GraphDefinition":
+        """Always continue from `source` to `target` (or END)"""
+        return self._set_route(source, None, (target,))
+
+    def add_conditional_edges(
+        self, source: str, route: Route, targets: Iterable[str]
+    ) -> "GraphDefinition":
+        """Continue to whichever declared target `route(state)` returns"""
+        return self._set_route(source, route, tuple(targets))
+
+    def _set_route(self, source: str, route: Optional[Route], targets: Tuple[str, ...]) -> "GraphDefinition":
+        if source in self._routes:
+            raise GraphDefinitionError(f"Node {source} already has outgoing edges")
+        self._routes[source] = (route, targets)
+        return self
+
+    def compile(self, step_budget: int = 16) -> "CompiledGraph":
+        """Validate the definition and build its dispatch table"""
+        nodes = set(self._handlers)
+        if self.entry not in nodes:
+            raise GraphDefinitionError(f"Entry node {self.entry} is not defined")
+        for source, (_, targets) in self._routes.items():
+            if source not in nodes:
+                raise GraphDefinitionError(f"Edge from undefined node {source}")
+            for target in targets:
+                if target != END and target not in nodes:
+                    raise GraphDefinitionError(f"Edge {source} -> {target}: undefined target")
+
+        successors = {
+            name: [t for t in self._routes.get(name, (None, (END,)))[1] if t != END]
+            for name in nodes
+        }
+        self._check_acyclic(successors)
+        reachable = self._reachable(successors)
+        unreachable = sorted(nodes - reachable)
+        if unreachable:
+            raise GraphDefinitionError(f"Unreachable nodes: {', '.join(unreachable)}")
+
+        table = {}
+        for name, handler in self._handlers.items():
+            route, targets = self._routes.get(name, (None, (END,)))
+            table[name] = (handler, route, frozenset(targets))
+        return CompiledGraph(self.entry, table, step_budget)
+
+    def _check_acyclic(self, successors: Dict[str, List[str]]) -> None:
+        # Iterative DFS; a back edge to a node on the current path is a cycle
+        visiting, done = set(), set()
+        for start in sorted(successors):
+            if start in done:
+                continue
+            path = [start]
+            stack = [(start, iter(successors[start]))]
+            visiting.add(start)
+            while stack:
+                node, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    stack.pop()
+                    path.pop()
+                    visiting.discard(node)
+                    done.add(node)
+                elif child in visiting:
+                    cycle = path[path.index(child):] + [child]
+                    raise GraphDefinitionError(f"Cycle: {' -> '.join(cycle)}")
+                elif child not in done:
+                    visiting.add(child)
+                    path.append(child)
+                    stack.append((child, iter(successors[child])))
+
+    def _reachable(self, successors: Dict[str, List[str]]) -> set[str]:
+        seen = {self.entry}
+        frontier = [self.entry]
+        while frontier:
+            for target in successors[frontier.pop()]:
+                if target not in seen:
+                    seen.add(target)
+                    frontier.append(target)
+        return seen
+
+
+class CompiledGraph:
+    """Validated graph: name -> (handler, route, allowed targets) plus hooks.
+
+    Each step is one dict lookup, the handler call and, for conditional nodes,
+    one route call. Hooks are stored as tuples and skipped entirely when none
+    are registered.
+    """
+
+    def __init__(
+        self,
+        entry: str,
+        table: Dict[str, Tuple[Handler, Optional[Route], frozenset[str]]],
+        step_budget: int,
+    ):
+        self.entry = entry
+        self.table = table
+        self.step_budget = step_budget
+        self.node_hooks: Tuple[NodeHook, ...] = ()
+        self.turn_hooks: Tuple[TurnHook, ...] = ()
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self.table)
+
+    def add_node_hook(self, hook: NodeHook) -> None:
+        self.node_hooks += (hook,)
+
+    def add_turn_hook(self, hook: TurnHook) -> None:
+        self.turn_hooks += (hook,)
+
+    async def run(self, state: Any) -> Any:
+        """Run one turn from the entry node until a route yields END.
+
+        Node hooks get each node's wall time and turn hooks the whole run's,
+        measured here once, so observers never wrap the handlers themselves.
+        """
+        clock = time.perf_counter
+        table = self.table
+        node_hooks = self.node_hooks
+        path: List[str] = []
+        started = clock()
+
+        name = self.entry
+        while name != END:
+            if len(path) >= self.step_budget:
+                raise GraphRuntimeError(
+                    f"Step budget of {self.step_budget} exceeded: {' -> '.join(path)}"
+                )
+            handler, route, targets = table[name]
+            path.append(name)
+
+            step_started = clock()
+            state = await handler(state)
+            if node_hooks:
+                elapsed = clock() - step_started
+                for hook in node_hooks:
+                    hook(name, state, elapsed)
+
+            following = route(state) if route else next(iter(targets))
+            if following is None:
+                following = END
+            elif following not in targets:
+                raise GraphRuntimeError(f"{name} routed to undeclared target {following}")
+            name = following
+
+        for hook in self.turn_hooks:
+            hook(state, path, clock() - started)
+        return state
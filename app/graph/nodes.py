@@ -1,17 +1,48 @@
-import re
-from datetime import date
-from app.graph.state import GraphState
+import logging
+from collections import Counter
+from datetime import date, datetime
+from typing import Any, Callable, TypeVar
+from app.graph.references import Resolution, resolve_reference
+from app.domain.state import GraphState
 from app.services.verification import VerificationService
 from app.services.appointments import AppointmentService
-from app.llm.client import llm_client
+from app.llm import client as llm
+from app.llm.cache import ResponseCache
+from app.llm.interfaces import AsyncLLMClient
+from app.llm.rules import classify_by_rules, RULE_CONFIDENCE_THRESHOLD
 from app.llm.prompts import (
-    SYSTEM_PROMPT,
-    ROUTER_PROMPT,
+    HELP_PROMPT,
+    SMALLTALK_PROMPT,
+    FALLBACK_PROMPT,
     VERIFY_PROMPT,
-    APPOINTMENT_ACTION_PROMPT,
 )
-from app.utils.normalization import normalize_phone_to_e164, parse_dob
+from app.utils.blocking import offload
+from app.utils.extraction import extract
 from app.utils.time import format_appointment_time
+from app.utils.tracing import llm_call
+
+logger = logging.getLogger(__name__)
+T = TypeVar("T")
+
+
+def normalize_actions(raw: Any) -> list[dict[str, Any]]:
+    """Well-formed {action, ordinal} pairs from a batch classification.
+
+    The LLM's list is untrusted: entries that aren't dicts or name another
+    action are dropped, and ordinals like "2" or "#2" are coerced to int.
+    """
+    actions = []
+    for item in raw if isinstance(raw, list) else []:
+        if not isinstance(item, dict) or item.get("action") not in ("confirm", "cancel"):
+            continue
+        ordinal: Any = item.get("ordinal")
+        if isinstance(ordinal, str):
+            ordinal = ordinal.strip().lstrip("#")
+        try:
+            actions.append({"action": item["action"], "ordinal": int(ordinal)})
+        except (TypeError, ValueError):
+            continue
+    return actions
 
 
 class GraphNodes:
@@ -19,11 +50,23 @@ class GraphNodes:
         self,
         verification_service: VerificationService,
         appointment_service: AppointmentService,
+        rule_confidence_threshold: float = RULE_CONFIDENCE_THRESHOLD,
+        response_cache: ResponseCache | None = None,
     ):
         self.verification_service = verification_service
         self.appointment_service = appointment_service
-
-    def guard_node(self, state: GraphState) -> GraphState:
+        self.rule_confidence_threshold = rule_confidence_threshold
+        # Generic replies (help, greetings, "I can't help with that") are patient-independent
+        self.response_cache = response_cache
+        # Which classification tier routed each turn ("rules" avoids the network)
+        self.routing_stats: Counter[str] = Counter()
+
+    @property
+    def llm_client(self) -> AsyncLLMClient:
+        """Resolve the shared client at call time so it can be swapped (e.g. in tests)"""
+        return llm.llm_client
+
+    async def guard_node(self, state: GraphState) -> GraphState:
         """Check if user is verified, route accordingly"""
         if not state.verified:
             state.next_action = "verify"
@@ -31,23 +74,25 @@ class GraphNodes:
             state.next_action = "router"
         return state
 
-    def verify_node(self, state: GraphState) -> GraphState:
+    async def verify_node(self, state: GraphState) -> GraphState:
         """Handle identity verification flow"""
-        user_msg = state.user_message.lower()
+        # Phone, DOB, OTP and yes/no all come from one pass over the message
+        extraction = extract(state.user_message)
 
         # Check if locked out
-        if self.verification_service.is_locked_out(state):
-            lockout_time = state.verification.lockout_until
+        lockout_time = state.verification.lockout_until
+        if lockout_time is not None and self.verification_service.is_locked_out(state):
             lockout_prompt = f"{VERIFY_PROMPT}\n\nThe user's account is temporarily locked until {lockout_time.strftime('%I:%M %p')} for security. Explain this professionally and empathetically."
-            state.assistant_message = llm_client.chat(lockout_prompt, "Account locked")
+            state.assistant_message = await self._generate_reply(
+                state, lockout_prompt, "Account locked", call_site="lockout"
+            )
             return state
 
         # Handle OTP verification if required
         if state.verification.otp_required:
-            # Extract 6-digit code
-            otp_match = re.search(r"\b\d{6}\b", state.user_message)
-            if otp_match:
-                code = otp_match.group()
+            otp = extraction.first("otp")
+            if otp:
+                code = otp.value
                 if self.verification_service.verify_otp(state, code):
                     # OTP success - user is now verified
                     state.verified = True
@@ -66,23 +111,22 @@ class GraphNodes:
                 )
             return state
 
-        # Extract phone and DOB from message  
-        # Phone patterns: (415) 555-0123, 415-555-0123, 415.555.0123, 4155550123
-        phone_match = re.search(r"\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}", state.user_message)
-        # DOB patterns: 07/14/1985, 07-14-1985, 1985-07-14
-        dob_match = re.search(
-            r"\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{4}[/-]\d{1,2}[/-]\d{1,2}",
-            state.user_message,
-        )
+        # Phone: (415) 555-0123, 415-555-0123, 415.555.0123, 4155550123
+        phone = extraction.first("phone")
+        # DOB: 07/14/1985, 07-14-1985, 1985-07-14
+        dob = extraction.first("dob")
+        affirm = extraction.first("affirm")
 
         try:
             # Collect phone if not already extracted
-            if phone_match and not state.phone_input:
-                state.phone_input = normalize_phone_to_e164(phone_match.group())
+            if phone and not state.phone_input:
+                state.phone_input = phone.value
 
             # Collect DOB if not already extracted
-            if dob_match and not state.dob_input:
-                state.dob_input = parse_dob(dob_match.group()).strftime("%Y-%m-%d")
+            if dob and not state.dob_input:
+                if dob.value is None:
+                    raise ValueError(f"Invalid date format: {extraction.span_text(dob)}")
+                state.dob_input = dob.value.strftime("%Y-%m-%d")
 
             # If we have both, attempt verification
             if state.phone_input and state.dob_input:
@@ -93,11 +137,7 @@ class GraphNodes:
 
                 if patient:
                     # Ask for name confirmation
-                    if (
-                        "yes" in user_msg
-                        or "correct" in user_msg
-                        or "that's me" in user_msg
-                    ):
+                    if affirm and affirm.value:
                         # Confirmed - user is verified
                         state.verified = True
                         state.patient_id = patient.patient_id
@@ -156,7 +196,7 @@ Please try again with both your phone number and date of birth."""
 
         return state
 
-    def router_node(self, state: GraphState) -> GraphState:
+    async def router_node(self, state: GraphState) -> GraphState:
         """Route to appropriate action based on user intent"""
         # Prepare conversation history for context-aware classification
         conversation_context = []
@@ -169,13 +209,22 @@ Please try again with both your phone number and date of birth."""
                 for turn in state.conversation_history
             ]
         
-        # Classify intent using LLM with conversation context
-        classification = llm_client.classify_intent(state.user_message, conversation_context)
-
+        # Tier 1: deterministic rules; only ambiguous messages go to the LLM
+        classification = classify_by_rules(state.user_message, conversation_context)
+        if classification["confidence"] >= self.rule_confidence_threshold:
+            self.routing_stats["rules"] += 1
+        else:
+            # Tier 2: classify intent using LLM with conversation context
+            with llm_call("classify"):
+                classification = await self.llm_client.classify_intent(state.user_message, conversation_context)
+            self.routing_stats["llm"] += 1
 
         # Extract entities
         if classification["entities"].get("ordinal"):
             state.ordinal = classification["entities"]["ordinal"]
+        state.reference_entities = {
+            key: classification["entities"].get(key) for key in ("date", "time", "provider")
+        }
 
         # Route based on intent - normalize to expected values
         if classification["intent"] == "list_appointments":
@@ -187,6 +236,18 @@ Please try again with both your phone number and date of birth."""
         elif classification["intent"] == "cancel_appointment":
             state.last_intent = "cancel"
             state.next_action = "cancel"
+        elif classification["intent"] == "batch_actions":
+            actions = normalize_actions(classification["entities"].get("actions"))
+            if len(actions) == 1:
+                # Only one usable action: the single confirm/cancel path handles it
+                state.ordinal = actions[0]["ordinal"]
+                state.last_intent = actions[0]["action"]
+                state.next_action = actions[0]["action"]
+            else:
+                # None usable: batch_node asks which appointments were meant
+                state.actions = actions
+                state.last_intent = "batch"
+                state.next_action = "batch"
         elif classification["intent"] == "help":
             state.last_intent = "help"
             state.next_action = "help"
@@ -199,11 +260,11 @@ Please try again with both your phone number and date of birth."""
 
         return state
 
-    def list_node(self, state: GraphState) -> GraphState:
+    async def list_node(self, state: GraphState) -> GraphState:
         """List upcoming appointments"""
         try:
-            appointments = self.appointment_service.list_upcoming(
-                state.patient_id, state.now
+            appointments = await self._appointments(
+                self.appointment_service.list_upcoming, state.patient_id, state.now
             )
 
             if not appointments:
@@ -220,8 +281,14 @@ Please try again with both your phone number and date of birth."""
                     appointment_list.append(
                         f"{i}. **{time_str}** — {appt.provider_name} — **{status_str}**"
                     )
+                    # Provider and start let later turns resolve "the 2 PM one" locally
                     snapshot.append(
-                        {"ordinal": i, "appointment_id": appt.appointment_id}
+                        {
+                            "ordinal": i,
+                            "appointment_id": appt.appointment_id,
+                            "provider": appt.provider_name,
+                            "start": appt.start_time.isoformat(),
+                        }
                     )
 
                 state.last_list_snapshot = snapshot
@@ -252,19 +319,22 @@ Please try again with both your phone number and date of birth."""
         state.next_action = "router"
         return state
 
-    def confirm_node(self, state: GraphState) -> GraphState:
+    async def confirm_node(self, state: GraphState) -> GraphState:
         """Confirm an appointment"""
         try:
             # Resolve appointment reference
-            appointment_id = self._resolve_appointment_reference(state)
+            appointment_id, candidates = self._resolve_appointment_reference(state)
 
+            if candidates:
+                self._ask_which_appointment(state, "confirm", candidates)
+                return state
             if not appointment_id:
                 state.assistant_message = "I'm not sure which appointment you'd like to confirm. Could you be more specific? For example, 'Confirm #1' or 'Confirm my Oct 2 appointment'."
                 state.next_action = "router"
                 return state
 
             # Confirm the appointment
-            appointment = self.appointment_service.confirm(appointment_id)
+            appointment = await self._appointments(self.appointment_service.confirm, appointment_id)
             time_str = format_appointment_time(appointment.start_time)
 
             state.assistant_message = f"✅ Confirmed! Your **{time_str}** appointment with **{appointment.provider_name}** is now confirmed. Would you like to see your updated appointment list?"
@@ -280,20 +350,23 @@ Please try again with both your phone number and date of birth."""
         state.next_action = "router"
         return state
 
-    def cancel_node(self, state: GraphState) -> GraphState:
+    async def cancel_node(self, state: GraphState) -> GraphState:
         """Cancel an appointment"""
         try:
             # Resolve appointment reference
-            appointment_id = self._resolve_appointment_reference(state)
+            appointment_id, candidates = self._resolve_appointment_reference(state)
 
+            if candidates:
+                self._ask_which_appointment(state, "cancel", candidates)
+                return state
             if not appointment_id:
                 state.assistant_message = "I'm not sure which appointment you'd like to cancel. Could you be more specific? For example, 'Cancel #1' or 'Cancel my Oct 2 appointment'."
                 state.next_action = "router"
                 return state
 
             # Cancel the appointment
-            appointment, within_24h = self.appointment_service.cancel(
-                appointment_id, state.now
+            appointment, within_24h = await self._appointments(
+                self.appointment_service.cancel, appointment_id, state.now
             )
             time_str = format_appointment_time(appointment.start_time)
 
@@ -310,11 +383,70 @@ Please try again with both your phone number and date of birth."""
         state.next_action = "router"
         return state
 
-    def help_node(self, state: GraphState) -> GraphState:
-        """Provide help information"""
-        help_prompt = f"{SYSTEM_PROMPT}\n\nThe user is asking for help. Provide a concise, friendly overview of what you can help them with regarding their appointments. Keep it brief and actionable."
+    async def batch_node(self, state: GraphState) -> GraphState:
+        """Confirm and/or cancel several appointments in one pass with one combined reply"""
+        lines = []
+        resolved = []  # (action, appointment_id, reference)
+        seen = set()
+        for item in state.actions:
+            action, ordinal = item.get("action"), item.get("ordinal")
+            if action not in ("confirm", "cancel") or not isinstance(ordinal, int):
+                continue
+            reference = f"#{ordinal}"
+            appointment_id = next(
+                (
+                    entry["appointment_id"]
+                    for entry in state.last_list_snapshot
+                    if entry["ordinal"] == ordinal
+                ),
+                None,
+            )
+            if appointment_id is None:
+                lines.append(f"⚠️ I couldn't find appointment {reference} in your last list.")
+            elif appointment_id in seen:
+                lines.append(f"⚠️ You mentioned {reference} more than once, so I only applied the first request.")
+            else:
+                seen.add(appointment_id)
+                resolved.append((action, appointment_id, reference))
+
+        try:
+            results = await self._appointments(
+                self.appointment_service.apply_actions,
+                [(action, appointment_id) for action, appointment_id, _ in resolved],
+                state.now,
+            )
+        except Exception:
+            logger.exception("Batch appointment update failed for session %s", state.session_id)
+            state.assistant_message = "I encountered an error updating those appointments, so nothing was changed. Please try again or contact the clinic directly."
+            state.next_action = "router"
+            return state
+
+        done = []
+        for (action, _, reference), result in zip(resolved, results, strict=True):
+            appointment = result["appointment"]
+            if result["error"]:
+                lines.append(f"⚠️ I couldn't {action} {reference}: {result['error']}.")
+                continue
+            time_str = format_appointment_time(appointment.start_time)
+            done_verb = "Confirmed" if action == "confirm" else "Cancelled"
+            line = f"✅ {done_verb} your **{time_str}** appointment with **{appointment.provider_name}**."
+            if result["within_24h"]:
+                line += " It was within 24 hours, so please consider calling the clinic."
+            done.append(line)
+
+        if not done and not lines:
+            state.assistant_message = "I'm not sure which appointments you mean. Could you list them by number? For example, 'Confirm #1 and cancel #2'."
+        else:
+            state.assistant_message = "\n".join(done + lines) + "\n\nWould you like to see your updated appointment list?"
+        state.suggestions = ["List my appointments", "Get help"]
+        state.next_action = "router"
+        return state
 
-        state.assistant_message = llm_client.chat(help_prompt, state.user_message)
+    async def help_node(self, state: GraphState) -> GraphState:
+        """Provide help information"""
+        state.assistant_message = await self._generate_reply(
+            state, HELP_PROMPT, state.user_message, call_site="help", cacheable=True
+        )
 
         state.suggestions = [
             "List my appointments",
@@ -324,21 +456,21 @@ Please try again with both your phone number and date of birth."""
         state.next_action = "router"
         return state
 
-    def smalltalk_node(self, state: GraphState) -> GraphState:
+    async def smalltalk_node(self, state: GraphState) -> GraphState:
         """Handle casual conversation"""
-        smalltalk_prompt = f"{SYSTEM_PROMPT}\n\nThe user is making casual conversation. Respond warmly but briefly, then gently guide them toward appointment management tasks. Keep the response concise and professional."
-
-        state.assistant_message = llm_client.chat(smalltalk_prompt, state.user_message)
+        state.assistant_message = await self._generate_reply(
+            state, SMALLTALK_PROMPT, state.user_message, call_site="smalltalk", cacheable=True
+        )
 
         state.suggestions = ["List my appointments", "Get help"]
         state.next_action = "router"
         return state
 
-    def fallback_node(self, state: GraphState) -> GraphState:
+    async def fallback_node(self, state: GraphState) -> GraphState:
         """Handle unclear requests"""
-        fallback_prompt = f"{SYSTEM_PROMPT}\n\nThe user's request is unclear or doesn't match appointment management tasks. Politely clarify what you can help with and provide guidance. Keep it concise and helpful."
-
-        state.assistant_message = llm_client.chat(fallback_prompt, state.user_message)
+        state.assistant_message = await self._generate_reply(
+            state, FALLBACK_PROMPT, state.user_message, call_site="fallback", cacheable=True
+        )
         state.suggestions = [
             "List my appointments",
             "Confirm an appointment",
@@ -348,19 +480,73 @@ Please try again with both your phone number and date of birth."""
         state.next_action = "router"
         return state
 
-    def _resolve_appointment_reference(self, state: GraphState) -> str | None:
+    async def _generate_reply(
+        self,
+        state: GraphState,
+        system_prompt: str,
+        user_message: str,
+        call_site: str,
+        cacheable: bool = False,
+    ) -> str:
+        """Generate an LLM reply, streaming tokens to the turn's sink when present"""
+        cache = self.response_cache if cacheable else None
+        if cache is not None:
+            cached = cache.get(system_prompt, user_message)
+            if cached is not None:
+                if state.token_sink is not None:
+                    await state.token_sink(cached)
+                return cached
+
+        with llm_call(call_site):
+            if state.token_sink is None:
+                reply = await self.llm_client.chat(system_prompt, user_message)
+            else:
+                chunks = []
+                try:
+                    async for token in self.llm_client.stream_chat(system_prompt, user_message):
+                        chunks.append(token)
+                        await state.token_sink(token)
+                except llm.StreamInterrupted:
+                    cache = None  # a truncated reply must not be served to anyone else
+                reply = "".join(chunks).strip()
+
+        # Canned offline replies must not crowd real ones out of the pool
+        if cache is not None and reply != llm.offline_reply(system_prompt):
+            cache.add(system_prompt, user_message, reply)
+        return reply
+
+    async def _appointments(self, method: Callable[..., T], *args: Any) -> T:
+        """Call an AppointmentService method, off the event loop if its store blocks"""
+        return await offload(self.appointment_service.blocking_io, method, *args)
+
+    def _resolve_appointment_reference(self, state: GraphState) -> Resolution:
         """Resolve ordinal or natural appointment reference to appointment_id"""
-        if state.ordinal and state.last_list_snapshot:
-            # Use ordinal reference - must match exactly
+        if state.ordinal:
+            # Use ordinal reference - must match exactly, no fallback
             for item in state.last_list_snapshot:
                 if item["ordinal"] == state.ordinal:
-                    return item["appointment_id"]
-            # If ordinal was specified but not found, return None (don't fallback)
-            return None
+                    return Resolution(item["appointment_id"], [])
+            return Resolution(None, [])
 
-        # For natural references without ordinal, would need more sophisticated parsing
-        # Only fallback to first appointment if no ordinal was specified
-        if not state.ordinal and state.last_list_snapshot:
-            return state.last_list_snapshot[0]["appointment_id"]
+        # Date/time/provider references resolve against the snapshot details
+        return resolve_reference(
+            state.user_message, state.last_list_snapshot, state.now, state.reference_entities
+        )
 
-        return None
+    @staticmethod
+    def _ask_which_appointment(state: GraphState, action: str, candidates: list) -> None:
+        """Ask the patient to pick one of several matching appointments"""
+        options = []
+        for entry in candidates:
+            option = f"{entry['ordinal']}."
+            if "start" in entry:
+                time_str = format_appointment_time(datetime.fromisoformat(entry["start"]))
+                option += f" **{time_str}** — {entry['provider']}"
+            options.append(option)
+        options_text = "\n".join(options)
+        state.assistant_message = (
+            f"Which appointment would you like to {action}?\n\n{options_text}\n\n"
+            f"You can reply with its number, e.g. '{action.title()} #{candidates[0]['ordinal']}'."
+        )
+        state.suggestions = [f"{action.title()} #{entry['ordinal']}" for entry in candidates[:3]]
+        state.next_action = "router"
@@ -0,0 +1,109 @@
+"""Resolve natural appointment references against the last listed appointments.
+
+"my Oct 2 appointment with Dr. Kim", "tomorrow morning" and "the 2 PM one"
+are parsed into date, time and provider constraints and matched against
+`last_list_snapshot` entries ({ordinal, appointment_id, provider, start}),
+so no repository or LLM call is needed. Zero or several matches are reported
+back so the caller can ask the patient which appointment they mean.
+"""
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional
+from app.utils.extraction import WEEKDAYS, extract
+from app.utils.time import PST
+
+
+class Resolution(NamedTuple):
+    """The matched appointment, or the candidates to ask about"""
+
+    appointment_id: Optional[str]
+    candidates: List[Dict[str, Any]]
+
+
+class ReferenceConstraints(NamedTuple):
+    day: Optional[date] = None
+    month_day: Optional[tuple[int, int]] = None
+    hour: Optional[int] = None
+    minute: Optional[int] = None
+    hours: Optional[tuple[int, int]] = None
+    providers: tuple[str, ...] = ()
+
+    def __bool__(self) -> bool:
+        return any(value not in (None, ()) for value in self)
+
+
+def parse_reference(text: str, now: datetime, providers: List[str]) -> ReferenceConstraints:
+    """Date, time and provider constraints mentioned in `text`"""
+    extraction = extract(text)
+    found: Dict[str, Any] = {}
+
+    if when := extraction.first("date"):
+        found["month_day"] = when.value
+    elif when := extraction.first("day"):
+        today = now.astimezone(PST).date()
+        if when.value == "today":
+            found["day"] = today
+        elif when.value == "tomorrow":
+            found["day"] = today + timedelta(days=1)
+        else:
+            # The next such weekday, counting today
+            found["day"] = today + timedelta(days=(WEEKDAYS.index(when.value) - today.weekday()) % 7)
+
+    if time := extraction.first("time"):
+        found["hour"], found["minute"] = time.value
+    elif daypart := extraction.first("daypart"):
+        found["hours"] = daypart.value
+
+    # Bare last names ("with Kim") count as well as "Dr. Kim"
+    mentioned = tuple(
+        provider for provider in providers if provider.split()[-1].lower() in extraction.vocabulary
+    )
+    if mentioned:
+        found["providers"] = mentioned
+    return ReferenceConstraints(**found)
+
+
+def _matches(entry: Dict[str, Any], constraints: ReferenceConstraints) -> bool:
+    if "start" not in entry:
+        return False  # snapshot written before entries carried details
+    start = datetime.fromisoformat(entry["start"])
+    start = start.replace(tzinfo=PST) if start.tzinfo is None else start.astimezone(PST)
+    hours = constraints.hours
+    return (
+        (not constraints.day or start.date() == constraints.day)
+        and (not constraints.month_day or (start.month, start.day) == constraints.month_day)
+        and (constraints.hour is None or start.hour == constraints.hour)
+        and (constraints.minute is None or start.minute == constraints.minute)
+        and (not hours or hours[0] <= start.hour < hours[1])
+        and (not constraints.providers or entry.get("provider") in constraints.providers)
+    )
+
+
+def resolve_reference(
+    message: str,
+    snapshot: List[Dict[str, Any]],
+    now: datetime,
+    entities: Optional[Dict[str, Any]] = None,
+) -> Resolution:
+    """Match a natural reference (plus any LLM date/time/provider entities) to the snapshot.
+
+    Without any recognizable reference, a single listed appointment is taken
+    as meant; with several, all of them are returned as candidates.
+    """
+    if not snapshot:
+        return Resolution(None, [])
+
+    providers = sorted({entry["provider"] for entry in snapshot if entry.get("provider")})
+    hints = " ".join(
+        str(entities[key]) for key in ("date", "time", "provider") if entities and entities.get(key)
+    )
+    constraints = parse_reference(f"{message} {hints}", now, providers)
+
+    if not constraints:
+        if len(snapshot) == 1:
+            return Resolution(snapshot[0]["appointment_id"], [])
+        return Resolution(None, list(snapshot))
+
+    matches = [entry for entry in snapshot if _matches(entry, constraints)]
+    if len(matches) == 1:
+        return Resolution(matches[0]["appointment_id"], [])
+    return Resolution(None, matches)
@@ -0,0 +1,85 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+
+class BatchingLLMClient:
+    """Collects concurrent classify_intent calls into one batched completion.
+
+    The first call in a window starts a timer of `max_wait_ms`; every call that
+    arrives before it fires joins the batch, which is sent early once it holds
+    `max_batch_size` requests. The wrapped client must provide
+    classify_intents(requests) returning one classification per request.
+    """
+
+    stats_key = "batching"
+
+    def __init__(self, client: Any, max_batch_size: int = 8, max_wait_ms: float = 5.0):
+        self.client = client
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: list[tuple[str, Optional[List[Dict[str, str]]], asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.calls = 0
+        self.batches = 0
+        self.largest_batch = 0
+
+    async def chat(self, system_prompt: str, user_message: str) -> str:
+        return await self.client.chat(system_prompt, user_message)
+
+    def stream_chat(self, system_prompt: str, user_message: str) -> AsyncIterator[str]:
+        return self.client.stream_chat(system_prompt, user_message)
+
+    async def classify_intent(self, user_message: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((user_message, conversation_history, future))
+        self.calls += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+        # Keep a reference so the task isn't garbage collected mid-flight
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[str, Optional[List[Dict[str, str]]], asyncio.Future]]) -> None:
+        try:
+            if len(batch) == 1:
+                # A lone request doesn't need the (longer) batch prompt
+                user_message, conversation_history, _ = batch[0]
+                results = [await self.client.classify_intent(user_message, conversation_history)]
+            else:
+                results = await self.client.classify_intents(
+                    [(user_message, history) for user_message, history, _ in batch]
+                )
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():  # the caller may have been cancelled meanwhile
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "batches": self.batches,
+            "largest_batch": self.largest_batch,
+        }
@@ -0,0 +1,154 @@
+import copy
+import hashlib
+import random
+import re
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, List, Optional
+
+# "source" of classifications made by keyword rules because the LLM failed
+FALLBACK_SOURCE = "fallback"
+
+
+def normalize_message(message: str) -> str:
+    """Canonical form of a user message for cache keys"""
+    return re.sub(r"\s+", " ", message.lower()).strip(" .!?")
+
+
+def context_fingerprint(conversation_history: Optional[List[Dict[str, str]]]) -> str:
+    """Compact fingerprint of the last assistant turn ("yes" depends on it)"""
+    if not conversation_history:
+        return ""
+    last_assistant = normalize_message(conversation_history[-1]["assistant_message"])
+    return hashlib.blake2b(last_assistant.encode(), digest_size=8).hexdigest()
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after a fixed TTL"""
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl_seconds: float = 600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if self.clock() >= expires_at:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (self.clock() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class ResponseCache:
+    """Pools of interchangeable LLM replies keyed by (prompt, normalized message).
+
+    A key misses until its pool holds `variants` replies, so the first few
+    requests still reach the LLM and repeat visitors don't always get the same
+    wording. Full pools are served from memory until they expire.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 256,
+        ttl_seconds: float = 3600.0,
+        variants: int = 3,
+        clock: Callable[[], float] = time.monotonic,
+        choose: Callable[[List[str]], str] = random.choice,
+    ):
+        self.variants = variants
+        self.choose = choose
+        self._pools = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds, clock=clock)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(system_prompt: str, user_message: str) -> tuple[str, str]:
+        prompt_id = hashlib.blake2b(system_prompt.encode(), digest_size=8).hexdigest()
+        return prompt_id, normalize_message(user_message)
+
+    def get(self, system_prompt: str, user_message: str) -> str | None:
+        pool = self._pools.get(self.key(system_prompt, user_message))
+        if pool is None or len(pool) < self.variants:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.choose(pool)
+
+    def add(self, system_prompt: str, user_message: str, reply: str) -> None:
+        key = self.key(system_prompt, user_message)
+        pool = self._pools.get(key) or []
+        if reply and len(pool) < self.variants:
+            self._pools.set(key, pool + [reply])
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._pools.stats(), "hits": self.hits, "misses": self.misses}
+
+
+class CachingLLMClient:
+    """Serves repeated intent classifications from cache, delegating the rest"""
+
+    stats_key = "intent_cache"
+
+    def __init__(self, client: Any, cache: TTLCache):
+        self.client = client
+        self.intent_cache = cache
+
+    async def chat(self, system_prompt: str, user_message: str) -> str:
+        return await self.client.chat(system_prompt, user_message)
+
+    def stream_chat(self, system_prompt: str, user_message: str) -> AsyncIterator[str]:
+        return self.client.stream_chat(system_prompt, user_message)
+
+    async def classify_intent(self, user_message: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        """Classify intent, skipping the LLM for recently seen (message, context) pairs"""
+        key = (normalize_message(user_message), context_fingerprint(conversation_history))
+        cached = self.intent_cache.get(key)
+        if cached is None:
+            cached = await self.client.classify_intent(user_message, conversation_history)
+            if cached.get("source") == FALLBACK_SOURCE:
+                return cached  # a keyword guess while the LLM was unavailable
+            self.intent_cache.set(key, cached)
+        # Callers own their copy; the cached entry must stay pristine
+        return copy.deepcopy(cached)
+
+    def stats(self) -> Dict[str, int]:
+        return self.intent_cache.stats()
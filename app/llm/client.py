@@ -1,13 +1,155 @@
 import os
 import json
-import re
-from typing import Dict, Any, Optional, List
-from openai import OpenAI
+import logging
+import time
+from typing import Dict, Any, Optional, List, AsyncIterator
+import httpx
+import openai
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
+from app.llm.batching import BatchingLLMClient
+from app.llm.cache import FALLBACK_SOURCE, CachingLLMClient, ResponseCache, TTLCache
+from app.llm.interfaces import AsyncLLMClient
+from app.llm.prompts import OFFLINE_REPLIES
+from app.llm.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    ResilientCaller,
+)
+from app.llm.rules import fallback_classify
+from app.llm.singleflight import CoalescingLLMClient
+from app.utils.tracing import record_llm_latency, record_llm_usage
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_INTENT_MODEL_PATH = os.path.join(
+    os.path.dirname(__file__), "artifacts", "intent_model.npz"
+)
+
+class StreamInterrupted(Exception):
+    """The provider failed after part of a streamed reply was already sent"""
+
+
+CHAT_FALLBACK_MESSAGE = (
+    "I'm here to help you manage your appointments. How can I assist you today?"
+)
+
+
+CLASSIFICATION_INSTRUCTIONS = """You are a healthcare appointment assistant. Classify the user's intent and extract entities based on their current message AND the conversation context.
+
+Available intents:
+- "list_appointments": wants to see their appointments (includes confirming they want to see updated list)
+- "confirm_appointment": wants to confirm a specific appointment
+- "cancel_appointment": wants to cancel a specific appointment
+- "batch_actions": confirms and/or cancels several appointments in one message (e.g. "confirm #1 and cancel #2")
+- "help": asking for help or what they can do
+- "smalltalk": greeting, thanks, casual conversation (NOT context-dependent responses)
+- "fallback": unclear intent or doesn't match above
+
+IMPORTANT CONTEXT RULES:
+- If the assistant just offered to show updated appointments and user says "yes", "sure", "okay" → classify as "list_appointments"
+- If the assistant just asked a yes/no question about appointments and user responds with agreement → use the appropriate appointment intent
+- Single words like "yes", "no", "okay", "sure" should be interpreted based on what the assistant just offered or asked
+- Generic greetings like "hi", "hello", "thanks" without context are "smalltalk"
+
+Extract entities if present:
+- ordinal: number reference like "#2", "second", "2nd" (return as integer)
+- date: absolute dates like "Oct 2" or relative like "tomorrow"
+- time: time references like "2 PM", "morning"
+- provider: doctor names like "Dr. Kim", "Lee"
+- actions: for "batch_actions" only, the list of {"action": "confirm" | "cancel", "ordinal": integer} in message order"""
+
+
+def format_conversation_context(
+    conversation_history: Optional[List[Dict[str, str]]] = None
+) -> str:
+    """Render the last 5 turns as prompt context (empty when there is no history)"""
+    context_str = ""
+    if conversation_history:
+        # Get last 5 turns for context (up to 10 messages total)
+        recent_history = conversation_history[-5:]
+        if recent_history:
+            context_str = "\n\nRecent conversation context:\n"
+            for i, turn in enumerate(recent_history, 1):
+                context_str += f"Turn {i}:\n"
+                context_str += f"User: {turn['user_message']}\n"
+                context_str += f"Assistant: {turn['assistant_message']}\n\n"
+    return context_str
+
+
+def offline_reply(system_prompt: str) -> str:
+    """Canned reply for a prompt when the LLM can't be used"""
+    return OFFLINE_REPLIES.get(system_prompt, CHAT_FALLBACK_MESSAGE)
+
+
+def build_classification_prompt(
+    user_message: str, conversation_history: Optional[List[Dict[str, str]]] = None
+) -> str:
+    """Build the intent classification prompt including recent conversation context"""
+    return (
+        CLASSIFICATION_INSTRUCTIONS
+        + """
+
+Return ONLY valid JSON in this exact format:
+{"intent": "list_appointments", "entities": {"ordinal": 2, "date": null, "time": null, "provider": null}}"""
+        + format_conversation_context(conversation_history)
+        + f"\n\nCurrent user message: {user_message}"
+    )
+
+
+def build_batch_classification_prompt(
+    requests: List[tuple[str, Optional[List[Dict[str, str]]]]]
+) -> str:
+    """Build one prompt classifying several independent conversations at once"""
+    sections = []
+    for i, (user_message, conversation_history) in enumerate(requests, 1):
+        sections.append(
+            f"### Conversation {i}"
+            + format_conversation_context(conversation_history)
+            + f"\n\nCurrent user message: {user_message}"
+        )
+
+    return (
+        CLASSIFICATION_INSTRUCTIONS
+        + f"""
+
+Below are {len(requests)} independent conversations. Classify the current user message of each one using only that conversation's context.
+
+Return ONLY a valid JSON array with exactly one object per conversation, in the same order:
+[{{"intent": "list_appointments", "entities": {{"ordinal": 2, "date": null, "time": null, "provider": null}}}}]
+
+"""
+        + "\n\n".join(sections)
+    )
+
+
+def parse_classification(content: str) -> Dict[str, Any]:
+    """Parse the model's JSON classification, raising ValueError if malformed"""
+    result = json.loads(content)
+
+    # Validate the response structure
+    if "intent" not in result or "entities" not in result:
+        raise ValueError("Invalid response structure")
+
+    return result
+
+
+def parse_batch_classification(content: str, expected: int) -> List[Dict[str, Any]]:
+    """Parse a JSON array of classifications, raising ValueError if malformed"""
+    results = json.loads(content)
+    if not isinstance(results, list) or len(results) != expected:
+        raise ValueError("Batch response does not match the number of messages")
+
+    for result in results:
+        if not isinstance(result, dict) or "intent" not in result or "entities" not in result:
+            raise ValueError("Invalid response structure")
+    return results
+
 
 class OpenAILLMClient:
     """OpenAI LLM client for production use"""
@@ -38,50 +180,12 @@ class OpenAILLMClient:
         except Exception as e:
             # Fallback to a generic helpful message
             print(f"OpenAI API error: {e}")
-            return "I'm here to help you manage your appointments. How can I assist you today?"
+            return CHAT_FALLBACK_MESSAGE
 
     def classify_intent(self, user_message: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
         """Classify user intent using OpenAI with structured output and conversation context"""
-        
-        # Build context from conversation history
-        context_str = ""
-        if conversation_history:
-            # Get last 5 turns for context (up to 10 messages total)
-            recent_history = conversation_history[-5:]
-            if recent_history:
-                context_str = "\n\nRecent conversation context:\n"
-                for i, turn in enumerate(recent_history, 1):
-                    context_str += f"Turn {i}:\n"
-                    context_str += f"User: {turn['user_message']}\n"
-                    context_str += f"Assistant: {turn['assistant_message']}\n\n"
-        
-        classification_prompt = (
-            """You are a healthcare appointment assistant. Classify the user's intent and extract entities based on their current message AND the conversation context.
-
-Available intents:
-- "list_appointments": wants to see their appointments (includes confirming they want to see updated list)
-- "confirm_appointment": wants to confirm a specific appointment  
-- "cancel_appointment": wants to cancel a specific appointment
-- "help": asking for help or what they can do
-- "smalltalk": greeting, thanks, casual conversation (NOT context-dependent responses)
-- "fallback": unclear intent or doesn't match above
-
-IMPORTANT CONTEXT RULES:
-- If the assistant just offered to show updated appointments and user says "yes", "sure", "okay" → classify as "list_appointments"
-- If the assistant just asked a yes/no question about appointments and user responds with agreement → use the appropriate appointment intent
-- Single words like "yes", "no", "okay", "sure" should be interpreted based on what the assistant just offered or asked
-- Generic greetings like "hi", "hello", "thanks" without context are "smalltalk"
-
-Extract entities if present:
-- ordinal: number reference like "#2", "second", "2nd" (return as integer)
-- date: absolute dates like "Oct 2" or relative like "tomorrow"
-- time: time references like "2 PM", "morning"
-- provider: doctor names like "Dr. Kim", "Lee"
-
-Return ONLY valid JSON in this exact format:
-{"intent": "list_appointments", "entities": {"ordinal": 2, "date": null, "time": null, "provider": null}}"""
-            + context_str
-            + f"\n\nCurrent user message: {user_message}"
+        classification_prompt = build_classification_prompt(
+            user_message, conversation_history
         )
 
         try:
@@ -96,14 +200,7 @@ Return ONLY valid JSON in this exact format:
 
             # Try to parse the JSON response
             try:
-                result = json.loads(content)
-
-                # Validate the response structure
-                if "intent" not in result or "entities" not in result:
-                    raise ValueError("Invalid response structure")
-
-                return result
-
+                return parse_classification(content)
             except (json.JSONDecodeError, ValueError):
                 # Fallback to regex parsing if JSON parsing fails
                 return self._fallback_classify(user_message, conversation_history)
@@ -114,59 +211,285 @@ Return ONLY valid JSON in this exact format:
 
     def _fallback_classify(self, user_message: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
         """Fallback classification using regex patterns with basic context awareness"""
-        user_lower = user_message.lower()
-
-        # Extract ordinal numbers
-        ordinal = None
-        if "#" in user_message:
-            match = re.search(r"#(\d+)", user_message)
-            if match:
-                ordinal = int(match.group(1))
-        elif any(word in user_lower for word in ["first", "1st"]):
-            ordinal = 1
-        elif any(word in user_lower for word in ["second", "2nd"]):
-            ordinal = 2
-        elif any(word in user_lower for word in ["third", "3rd"]):
-            ordinal = 3
-
-        # Context-aware classification for simple responses
-        if conversation_history and user_message.lower().strip() in ["yes", "sure", "okay", "ok"]:
-            # Check last assistant message for context
-            last_turn = conversation_history[-1]
-            last_assistant_msg = last_turn['assistant_message'].lower()
-            if "updated appointment list" in last_assistant_msg or "see your updated" in last_assistant_msg:
-                intent = "list_appointments"
-            else:
-                intent = "smalltalk"  # Default for ambiguous yes/no
-        elif "list" in user_lower or "show" in user_lower or "appointments" in user_lower:
-            intent = "list_appointments"
-        elif "confirm" in user_lower:
-            intent = "confirm_appointment"
-        elif "cancel" in user_lower:
-            intent = "cancel_appointment"
-        elif "help" in user_lower:
-            intent = "help"
-        elif (
-            any(
-                word in user_lower
-                for word in ["hello", "hi", "thanks", "thank you", "good"]
+        return fallback_classify(user_message, conversation_history)
+
+
+class AsyncOpenAILLMClient:
+    """Non-blocking OpenAI LLM client used by the async conversation graph"""
+
+    stats_key = "upstream"
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        resilience: Optional[ResilientCaller] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
+        # Retries are ours (deadline-aware); the SDK's own would ignore the budget
+        self.client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"), max_retries=0, http_client=http_client
+        )
+        self.model = model or os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+        self.temperature = float(os.getenv("OPENAI_TEMPERATURE", temperature))
+        self.resilience = resilience or build_resilient_caller()
+        self.breaker = breaker or build_circuit_breaker()
+
+        if not os.getenv("OPENAI_API_KEY"):
+            raise ValueError("OPENAI_API_KEY environment variable is required")
+
+    async def _complete(self, hedge: Optional[bool] = None, **kwargs: Any) -> Any:
+        """Create a chat completion under the breaker, per-call deadline and retry policy"""
+        if not self.breaker.allow():
+            raise CircuitOpenError("LLM circuit is open")
+
+        started = time.monotonic()
+        outcome = None
+        try:
+            response = await self.resilience.call(
+                lambda: self.client.chat.completions.create(model=self.model, **kwargs),
+                hedge=hedge,
+            )
+            outcome = True
+            if not kwargs.get("stream"):
+                record_llm_usage(getattr(response, "usage", None))
+            return response
+        except Exception as e:
+            # A rejected request (4xx) still proves the provider is up
+            outcome = not (is_retryable(e) or isinstance(e, DeadlineExceeded))
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            self.breaker.record(outcome, elapsed)
+            if not kwargs.get("stream"):
+                record_llm_latency(elapsed)  # streams are timed to their last token
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.resilience.stats(), "circuit": self.breaker.stats()}
+
+    async def chat(self, system_prompt: str, user_message: str) -> str:
+        """Generate chat completion using OpenAI without blocking the event loop"""
+        try:
+            response = await self._complete(
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_message},
+                ],
+                temperature=self.temperature,
+                max_tokens=500,
             )
-            and "random" not in user_lower
-        ):
-            intent = "smalltalk"
-        else:
-            intent = "fallback"
-
-        return {
-            "intent": intent,
-            "entities": {
-                "ordinal": ordinal,
-                "date": None,
-                "time": None,
-                "provider": None,
-            },
-        }
+
+            return response.choices[0].message.content.strip()
+
+        except CircuitOpenError:
+            return offline_reply(system_prompt)
+
+        except Exception:
+            # Fallback to a generic helpful message
+            logger.warning("OpenAI chat request failed", exc_info=True)
+            return offline_reply(system_prompt)
+
+    async def stream_chat(self, system_prompt: str, user_message: str) -> AsyncIterator[str]:
+        """Stream chat completion tokens from OpenAI as they are generated.
+
+        A failure before the first token yields the offline reply instead;
+        after it, StreamInterrupted is raised so callers know the reply is cut short.
+        """
+        streamed = False
+        started = time.monotonic()
+        upstream = True
+        try:
+            # The deadline covers opening the stream; a hedged twin would double the tokens
+            stream = await self._complete(
+                hedge=False,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_message},
+                ],
+                temperature=self.temperature,
+                max_tokens=500,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+
+            async for chunk in stream:
+                # With include_usage the last chunk carries usage and no choices
+                record_llm_usage(getattr(chunk, "usage", None))
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    streamed = True
+                    yield delta
+
+        except Exception as e:
+            upstream = not isinstance(e, CircuitOpenError)
+            if upstream:
+                logger.warning("OpenAI chat stream failed", exc_info=True)
+            # Only substitute the fallback if the user hasn't seen partial output
+            if streamed:
+                raise StreamInterrupted(str(e)) from e
+            yield offline_reply(system_prompt)
+
+        finally:
+            if upstream:
+                record_llm_latency(time.monotonic() - started)
+
+    async def classify_intent(self, user_message: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        """Classify user intent using OpenAI without blocking the event loop"""
+        classification_prompt = build_classification_prompt(
+            user_message, conversation_history
+        )
+
+        try:
+            response = await self._complete(
+                messages=[{"role": "system", "content": classification_prompt}],
+                temperature=0.1,  # Lower temperature for consistent classification
+                max_tokens=150,
+            )
+
+            content = response.choices[0].message.content.strip()
+
+            try:
+                return parse_classification(content)
+            except (json.JSONDecodeError, ValueError):
+                logger.warning("Unparseable OpenAI classification, using keyword fallback", exc_info=True)
+                return self._fallback_classify(user_message, conversation_history)
+
+        except CircuitOpenError:
+            return self._fallback_classify(user_message, conversation_history)
+
+        except Exception:
+            logger.warning("OpenAI classification failed, using keyword fallback", exc_info=True)
+            return self._fallback_classify(user_message, conversation_history)
+
+    async def classify_intents(
+        self, requests: List[tuple[str, Optional[List[Dict[str, str]]]]]
+    ) -> List[Dict[str, Any]]:
+        """Classify several (message, history) pairs with a single completion"""
+        try:
+            response = await self._complete(
+                messages=[
+                    {"role": "system", "content": build_batch_classification_prompt(requests)}
+                ],
+                temperature=0.1,
+                max_tokens=150 * len(requests),
+            )
+
+            content = response.choices[0].message.content.strip()
+            return parse_batch_classification(content, len(requests))
+
+        except Exception as e:
+            if not isinstance(e, CircuitOpenError):
+                logger.warning("OpenAI batch classification failed, using keyword fallback", exc_info=True)
+            return [
+                self._fallback_classify(user_message, conversation_history)
+                for user_message, conversation_history in requests
+            ]
+
+    def _fallback_classify(self, user_message: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        """Fallback classification using regex patterns with basic context awareness"""
+        result = fallback_classify(user_message, conversation_history)
+        result["source"] = FALLBACK_SOURCE  # a stand-in, so caches don't keep it
+        return result
+
+
+def is_retryable(error: Exception) -> bool:
+    """Transient provider failures worth another attempt (not 4xx request errors)"""
+    return isinstance(
+        error,
+        (
+            openai.APITimeoutError,
+            openai.APIConnectionError,
+            openai.RateLimitError,
+            openai.InternalServerError,
+        ),
+    )
+
+
+def build_resilient_caller() -> ResilientCaller:
+    """Deadline, retry and hedging policy for upstream calls, from environment"""
+    return ResilientCaller(
+        timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "10")),
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+        backoff_base=float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.1")),
+        hedge=os.getenv("LLM_HEDGE", "false").lower() in ("1", "true", "yes"),
+        hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95")),
+        retryable=is_retryable,
+    )
+
+
+def build_circuit_breaker() -> CircuitBreaker:
+    """Breaker thresholds for the upstream provider, from environment"""
+    return CircuitBreaker(
+        window=int(os.getenv("LLM_BREAKER_WINDOW", "20")),
+        min_calls=int(os.getenv("LLM_BREAKER_MIN_CALLS", "10")),
+        failure_rate_threshold=float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5")),
+        slow_call_seconds=float(os.getenv("LLM_BREAKER_SLOW_CALL_SECONDS", "5")),
+        open_seconds=float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30")),
+    )
+
+
+def build_llm_client(base: AsyncLLMClient | None = None) -> AsyncLLMClient:
+    """Assemble the async client with the optional layers enabled by environment"""
+    client: AsyncLLMClient = base or AsyncOpenAILLMClient()
+
+    batch_size = int(os.getenv("INTENT_BATCH_SIZE", "1"))
+    if batch_size > 1:
+        client = BatchingLLMClient(
+            client,
+            max_batch_size=batch_size,
+            max_wait_ms=float(os.getenv("INTENT_BATCH_WAIT_MS", "5")),
+        )
+
+    if os.getenv("LLM_COALESCE", "true").lower() in ("1", "true", "yes"):
+        # Below the cache: only misses that are concurrently in flight get shared
+        client = CoalescingLLMClient(client)
+
+    cache_size = int(os.getenv("INTENT_CACHE_SIZE", "2048"))
+    if cache_size > 0:
+        client = CachingLLMClient(
+            client,
+            TTLCache(
+                max_size=cache_size,
+                ttl_seconds=float(os.getenv("INTENT_CACHE_TTL_SECONDS", "600")),
+            ),
+        )
+
+    if os.getenv("INTENT_CLASSIFIER", "llm") == "local":
+        # numpy is an optional dependency, only needed for the local model
+        from app.llm.local_classifier import IntentModel, LocalIntentClassifier
+
+        client = LocalIntentClassifier(
+            IntentModel.load(os.getenv("INTENT_MODEL_PATH", DEFAULT_INTENT_MODEL_PATH)),
+            client,
+            threshold=float(os.getenv("INTENT_LOCAL_THRESHOLD", "0.8")),
+        )
+
+    return client
+
+
+def collect_llm_stats(client: Any) -> Dict[str, Dict[str, Any]]:
+    """Counters from each wrapper layer around the base client, keyed by layer"""
+    stats: Dict[str, Dict[str, Any]] = {}
+    while hasattr(client, "stats_key"):
+        stats[client.stats_key] = client.stats()
+        client = client.client
+    return stats
+
+
+def build_response_cache() -> ResponseCache | None:
+    """Reply cache for the generic help/smalltalk/fallback turns (None when disabled)"""
+    cache_size = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+    if cache_size <= 0:
+        return None
+    return ResponseCache(
+        max_size=cache_size,
+        ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")),
+        variants=int(os.getenv("RESPONSE_CACHE_VARIANTS", "3")),
+    )
 
 
 # Global instance
-llm_client = OpenAILLMClient()
+llm_client = build_llm_client()
@@ -0,0 +1,14 @@
+from collections.abc import AsyncIterator
+from typing import Any, Protocol
+
+
+class AsyncLLMClient(Protocol):  # see client.build_llm_client
+    """What the graph calls; the base client and every wrapper layer implement it"""
+
+    async def chat(self, system_prompt: str, user_message: str) -> str: ...
+    def stream_chat(self, system_prompt: str, user_message: str) -> AsyncIterator[str]: ...
+    async def classify_intent(
+        self,
+        user_message: str,
+        conversation_history: list[dict[str, str]] | None = None,
+    ) -> dict[str, Any]: ...
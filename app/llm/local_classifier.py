@@ -0,0 +1,167 @@
+import re
+import zlib
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.llm.rules import fallback_classify
+
+
+# Classifications at or above this probability skip the LLM entirely
+LOCAL_CONFIDENCE_THRESHOLD = 0.8
+DEFAULT_FEATURES = 2**14
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9#']+")
+
+
+def _tokens(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def extract_features(user_message: str, context: str = "") -> List[str]:
+    """Word uni/bigrams, in-word character trigrams and last-assistant-turn words"""
+    words = _tokens(user_message)
+    features = [f"w:{word}" for word in words]
+    features += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    if len(words) <= 3:
+        # Short replies ("yes", "sure") only make sense next to the assistant's question
+        features += [f"x:{word}" for word in _tokens(context)]
+    return features
+
+
+def last_assistant_message(conversation_history: Optional[List[Dict[str, str]]]) -> str:
+    if not conversation_history:
+        return ""
+    return conversation_history[-1]["assistant_message"]
+
+
+class HashedFeaturizer:
+    """Maps feature strings into a fixed-width, L2-normalized count vector"""
+
+    def __init__(self, n_features: int = DEFAULT_FEATURES):
+        self.n_features = n_features
+
+    def transform(self, user_message: str, context: str = "") -> np.ndarray:
+        vector = np.zeros(self.n_features, dtype=np.float32)
+        # crc32 is stable across processes, unlike the salted built-in hash()
+        for feature, count in Counter(extract_features(user_message, context)).items():
+            vector[zlib.crc32(feature.encode()) % self.n_features] += count
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def transform_many(self, examples: Iterable[tuple[str, str]]) -> np.ndarray:
+        return np.stack([self.transform(message, context) for message, context in examples])
+
+
+class IntentModel:
+    """Multinomial logistic regression over hashed n-gram features"""
+
+    def __init__(self, labels: List[str], weights: np.ndarray, bias: np.ndarray):
+        self.labels = list(labels)
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.featurizer = HashedFeaturizer(weights.shape[0])
+
+    def predict_proba(self, user_message: str, context: str = "") -> np.ndarray:
+        logits = self.featurizer.transform(user_message, context) @ self.weights + self.bias
+        exp = np.exp(logits - logits.max())
+        return exp / exp.sum()
+
+    def predict(self, user_message: str, context: str = "") -> tuple[str, float]:
+        """Most likely intent and its probability"""
+        proba = self.predict_proba(user_message, context)
+        best = int(proba.argmax())
+        return self.labels[best], float(proba[best])
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(
+            path,
+            labels=np.array(self.labels),
+            weights=self.weights,
+            bias=self.bias,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "IntentModel":
+        with np.load(path) as artifact:
+            return cls(
+                [str(label) for label in artifact["labels"]],
+                artifact["weights"],
+                artifact["bias"],
+            )
+
+
+def train_intent_model(
+    examples: List[Dict[str, str]],
+    n_features: int = DEFAULT_FEATURES,
+    epochs: int = 300,
+    learning_rate: float = 2.0,
+    l2: float = 1e-4,
+) -> IntentModel:
+    """Fit the model with full-batch gradient descent on softmax cross-entropy"""
+    labels = sorted({example["intent"] for example in examples})
+    featurizer = HashedFeaturizer(n_features)
+    X = featurizer.transform_many(
+        (example["user_message"], example.get("context", "")) for example in examples
+    )
+    y = np.array([labels.index(example["intent"]) for example in examples])
+    Y = np.eye(len(labels), dtype=np.float32)[y]
+
+    weights = np.zeros((n_features, len(labels)), dtype=np.float32)
+    bias = np.zeros(len(labels), dtype=np.float32)
+    for _ in range(epochs):
+        logits = X @ weights + bias
+        logits -= logits.max(axis=1, keepdims=True)
+        proba = np.exp(logits)
+        proba /= proba.sum(axis=1, keepdims=True)
+        error = (proba - Y) / len(examples)
+        weights -= learning_rate * (X.T @ error + l2 * weights)
+        bias -= learning_rate * error.sum(axis=0)
+
+    return IntentModel(labels, weights, bias)
+
+
+class LocalIntentClassifier:
+    """Classifies intents with a local model, asking the LLM only when unsure"""
+
+    stats_key = "local_classifier"
+
+    def __init__(
+        self,
+        model: IntentModel,
+        client: Any,
+        threshold: float = LOCAL_CONFIDENCE_THRESHOLD,
+    ):
+        self.model = model
+        self.client = client
+        self.threshold = threshold
+        self.outcomes: Counter[str] = Counter()
+
+    async def chat(self, system_prompt: str, user_message: str) -> str:
+        return await self.client.chat(system_prompt, user_message)
+
+    def stream_chat(self, system_prompt: str, user_message: str) -> AsyncIterator[str]:
+        return self.client.stream_chat(system_prompt, user_message)
+
+    async def classify_intent(self, user_message: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        intent, confidence = self.model.predict(
+            user_message, last_assistant_message(conversation_history)
+        )
+        if confidence >= self.threshold:
+            # The model only predicts the intent; entities come from the keyword extractor
+            entities = fallback_classify(user_message, conversation_history)["entities"]
+            # A batch is only usable with its (action, ordinal) pairs, which only
+            # the keyword extractor or the LLM can supply
+            if intent != "batch_actions" or entities.get("actions"):
+                self.outcomes["local"] += 1
+                return {"intent": intent, "entities": entities, "confidence": confidence}
+
+        self.outcomes["llm"] += 1
+        return await self.client.classify_intent(user_message, conversation_history)
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.outcomes)
@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional, List, AsyncIterator
 import json
 import re
 
@@ -69,7 +69,7 @@ Please try again with both your phone number and date of birth."""
         else:
             return "I can help you with your appointments. You can ask me to list, confirm, or cancel appointments."
 
-    def classify_intent(self, user_message: str) -> Dict[str, Any]:
+    def classify_intent(self, user_message: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
         """Mock intent classification"""
         user_lower = user_message.lower()
 
@@ -115,3 +115,31 @@ Please try again with both your phone number and date of birth."""
                 "provider": None,
             },
         }
+
+
+class AsyncMockLLMClient:
+    """Async counterpart of MockLLMClient for exercising the async graph"""
+
+    def __init__(self):
+        self._client = MockLLMClient()
+
+    async def chat(self, system_prompt: str, user_message: str) -> str:
+        """Mock chat completion"""
+        return self._client.chat(system_prompt, user_message)
+
+    async def stream_chat(self, system_prompt: str, user_message: str) -> AsyncIterator[str]:
+        """Mock streaming completion - yields the reply word by word"""
+        reply = self._client.chat(system_prompt, user_message)
+        for token in re.findall(r"\S+\s*", reply):
+            yield token
+
+    async def classify_intent(self, user_message: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        """Mock intent classification"""
+        return self._client.classify_intent(user_message, conversation_history)
+
+    async def classify_intents(self, requests: List[tuple[str, Optional[List[Dict[str, str]]]]]) -> List[Dict[str, Any]]:
+        """Mock batched intent classification"""
+        return [
+            self._client.classify_intent(user_message, conversation_history)
+            for user_message, conversation_history in requests
+        ]
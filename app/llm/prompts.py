@@ -16,6 +16,21 @@ AVAILABLE ACTIONS:
 - Help/general assistance"""
 
 
+HELP_PROMPT = f"""{SYSTEM_PROMPT}
+
+The user is asking for help. Provide a concise, friendly overview of what you can help them with regarding their appointments. Keep it brief and actionable."""
+
+
+SMALLTALK_PROMPT = f"""{SYSTEM_PROMPT}
+
+The user is making casual conversation. Respond warmly but briefly, then gently guide them toward appointment management tasks. Keep the response concise and professional."""
+
+
+FALLBACK_PROMPT = f"""{SYSTEM_PROMPT}
+
+The user's request is unclear or doesn't match appointment management tasks. Politely clarify what you can help with and provide guidance. Keep it concise and helpful."""
+
+
 ROUTER_PROMPT = """Classify the user's intent from their message. Return valid JSON only.
 
 Available intents:
@@ -62,3 +77,21 @@ For cancellations within 24 hours, warn:
 "This appointment is within 24 hours. I can cancel it, but please consider calling the clinic at [number] to ensure proper handling."
 
 Always confirm: "Just to confirm, [action] the **[date/time]** appointment with **[provider]**?"""
+
+
+# Canned replies used when the LLM can't be reached (provider down or circuit open)
+OFFLINE_REPLIES = {
+    HELP_PROMPT: (
+        "I can help you manage your appointments. You can ask me to:\n"
+        "• List your upcoming appointments\n"
+        "• Confirm an appointment (e.g. 'Confirm #1')\n"
+        "• Cancel an appointment (e.g. 'Cancel #2')"
+    ),
+    SMALLTALK_PROMPT: (
+        "Happy to help! Would you like to see your upcoming appointments?"
+    ),
+    FALLBACK_PROMPT: (
+        "I'm not sure I can help with that. I can list, confirm or cancel your "
+        "appointments - try 'List my appointments' or 'Get help'."
+    ),
+}
@@ -0,0 +1,281 @@
+import asyncio
+import math
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call's time budget ran out before any attempt succeeded"""
+
+
+class LatencyTracker:
+    """Sliding window of recent successful attempt latencies, in seconds"""
+
+    def __init__(self, window: int = 500):
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+class ResilientCaller:
+    """Runs an async call under a deadline with jittered retries and optional hedging.
+
+    Every call gets `timeout` seconds in total. Failed attempts are retried
+    with full-jitter exponential backoff, but only while the backoff still fits
+    in the remaining budget. With hedging on, an attempt that hasn't answered
+    by the observed p95 latency gets a twin request and the first success wins.
+    """
+
+    def __init__(
+        self,
+        *,
+        timeout: float = 10.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.1,
+        backoff_max: float = 1.0,
+        hedge: bool = False,
+        hedge_percentile: float = 0.95,
+        hedge_min_samples: int = 20,
+        retryable: Callable[[Exception], bool] = lambda _: True,
+        clock: Callable[[], float] = time.monotonic,
+        jitter: Callable[[], float] = random.random,
+    ):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.retryable = retryable
+        self.clock = clock
+        self.jitter = jitter
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.deadline_exceeded = 0
+        self.failures = 0
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        timeout: float | None = None,
+        hedge: bool | None = None,
+    ) -> T:
+        """Return the first successful fn() result, or raise once the budget is spent"""
+        self.calls += 1
+        deadline = self.clock() + (self.timeout if timeout is None else timeout)
+        hedge = self.hedge if hedge is None else hedge
+        attempt = 0
+
+        while True:
+            remaining = deadline - self.clock()
+            try:
+                if remaining <= 0:
+                    raise DeadlineExceeded("LLM call deadline exceeded")
+                return await self._attempt(fn, remaining, hedge)
+            except DeadlineExceeded:
+                self.deadline_exceeded += 1
+                raise
+            except Exception as e:
+                attempt += 1
+                delay = self.jitter() * min(self.backoff_max, self.backoff_base * 2**attempt)
+                if (
+                    attempt > self.max_retries
+                    or not self.retryable(e)
+                    or self.clock() + delay >= deadline
+                ):
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]], remaining: float, hedge: bool) -> T:
+        hedge_after = self._hedge_delay() if hedge else None
+        if hedge_after is None or hedge_after >= remaining:
+            try:
+                return await asyncio.wait_for(self._timed(fn), remaining)
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded("LLM call deadline exceeded") from None
+
+        primary = asyncio.ensure_future(self._timed(fn))
+        pending: set[asyncio.Future] = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=hedge_after)
+            if done:
+                return primary.result()
+
+            self.hedges += 1
+            hedged = asyncio.ensure_future(self._timed(fn))
+            pending.add(hedged)
+            time_left = remaining - hedge_after
+            error: BaseException | None = None
+            while pending:
+                started = self.clock()
+                done, pending = await asyncio.wait(
+                    pending, timeout=time_left, return_when=asyncio.FIRST_COMPLETED
+                )
+                time_left -= self.clock() - started
+                if not done:
+                    raise DeadlineExceeded("LLM call deadline exceeded")
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedged:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _timed(self, fn: Callable[[], Awaitable[T]]) -> T:
+        started = self.clock()
+        result = await fn()
+        self.latency.observe(self.clock() - started)
+        return result
+
+    def _hedge_delay(self) -> float | None:
+        # Without enough history the percentile is noise; don't double traffic on it
+        if len(self.latency) < self.hedge_min_samples:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+    def stats(self) -> Dict[str, Any]:
+        def ms(q: float) -> float | None:
+            value = self.latency.percentile(q)
+            return None if value is None else round(value * 1000, 1)
+
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": round(self.hedges / self.calls, 4) if self.calls else 0.0,
+            "deadline_exceeded": self.deadline_exceeded,
+            "failures": self.failures,
+            "latency_p50_ms": ms(0.5),
+            "latency_p95_ms": ms(0.95),
+            "latency_p99_ms": ms(0.99),
+        }
+
+
+class CircuitOpenError(Exception):
+    """The breaker is open; the call was rejected without touching the network"""
+
+
+class CircuitBreaker:
+    """Error-rate and latency circuit breaker over a rolling window of calls.
+
+    closed: calls flow; each outcome lands in the window, and a call slower
+    than `slow_call_seconds` counts as a failure. Once the window holds at
+    least `min_calls` outcomes and the failure rate reaches
+    `failure_rate_threshold`, the breaker opens.
+    open: calls are rejected outright for `open_seconds`.
+    half_open: up to `half_open_probes` calls go through; a successful probe
+    closes the breaker, a failed one re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        *,
+        window: int = 20,
+        min_calls: int = 10,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 5.0,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+        self.state = self.CLOSED
+        self._outcomes: deque[bool] = deque(maxlen=window)  # True = failure
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self.times_opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Whether a call may proceed now; callers must report back via record()"""
+        if self.state == self.OPEN:
+            if self.clock() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._probes_in_flight = 0
+
+        if self.state == self.HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_probes:
+                self.rejected += 1
+                return False
+            self._probes_in_flight += 1
+        return True
+
+    def record(self, success: bool | None, latency: float = 0.0) -> None:
+        """Report an allowed call's outcome (None: no verdict, e.g. cancelled)"""
+        if self.state == self.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+        if success is None:
+            return
+
+        failed = not success or latency >= self.slow_call_seconds
+        if self.state == self.HALF_OPEN:
+            if failed:
+                self._open()
+            else:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            return
+
+        self._outcomes.append(failed)
+        if (
+            self.state == self.CLOSED
+            and len(self._outcomes) >= self.min_calls
+            and self.failure_rate() >= self.failure_rate_threshold
+        ):
+            self._open()
+
+    def failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(self._outcomes) / len(self._outcomes)
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self._opened_at = self.clock()
+        self._outcomes.clear()
+        self.times_opened += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failure_rate": round(self.failure_rate(), 4),
+            "window_calls": len(self._outcomes),
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
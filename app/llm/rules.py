@@ -0,0 +1,149 @@
+import re
+from typing import Dict, Any, Optional, List
+from app.utils.extraction import Extraction, extract
+
+
+# Rule matches at or above this confidence are routed without calling the LLM
+RULE_CONFIDENCE_THRESHOLD = 0.9
+
+ACTION_KEYWORDS = {"confirm", "cancel", "list", "show", "reschedule", "change", "move"}
+NEGATIONS = {"not", "don't", "dont", "no", "never", "without", "instead"}
+GREETING_WORDS = {"hi", "hello", "hey", "thanks", "thank"}
+GREETING_FILLER = GREETING_WORDS | {"you", "so", "much", "there", "good", "morning", "afternoon", "evening", "a", "lot"}
+
+# Whole words per keyword intent, in priority order
+INTENT_KEYWORDS = [
+    ("list_appointments", {"list", "lists", "listing", "show", "shows", "showing", "appointments"}),
+    ("confirm_appointment", {"confirm", "confirmed", "confirming", "confirmation"}),
+    ("cancel_appointment", {"cancel", "canceled", "cancelled", "canceling", "cancelling", "cancellation"}),
+    ("help", {"help", "helping"}),
+    ("smalltalk", {"hello", "hi", "thanks", "thank", "good"}),
+]
+YES_REPLIES = {"yes", "sure", "okay", "ok"}
+ACTION_VERB = re.compile(r"\b(?:confirm|cancel)\b")
+
+
+def extract_actions(user_message: str, extraction: Optional[Extraction] = None) -> List[Dict[str, Any]]:
+    """(action, ordinal) pairs in message order: "confirm #1 and #3, cancel #2".
+
+    Each reference binds to the nearest action verb before it; references
+    ahead of any verb are ignored.
+    """
+    extraction = extraction or extract(user_message)
+    if "ordinal" not in extraction.firsts:
+        return []
+    ordinals = [entity for entity in extraction.entities if entity.kind == "ordinal"]
+
+    verbs = [(match.start(), match.group()) for match in ACTION_VERB.finditer(extraction.lower)]
+    actions = []
+    for ordinal in ordinals:
+        preceding = [verb for start, verb in verbs if start < ordinal.start]
+        if preceding:
+            actions.append({"action": preceding[-1], "ordinal": ordinal.value})
+    return actions
+
+
+def reference_entities(extraction: Extraction) -> Dict[str, Any]:
+    """Ordinal plus date/time/provider as written, shaped like the LLM's entities"""
+    firsts = extraction.firsts
+    if not firsts:
+        return {"ordinal": None, "date": None, "time": None, "provider": None}
+    ordinal = firsts.get("ordinal")
+    when = firsts.get("date") or firsts.get("day")
+    time = firsts.get("time") or firsts.get("daypart")
+    provider = firsts.get("provider")
+    return {
+        "ordinal": ordinal.value if ordinal else None,
+        "date": extraction.span_text(when) if when else None,
+        "time": extraction.span_text(time) if time else None,
+        "provider": provider.value if provider else None,
+    }
+
+
+def fallback_classify(
+    user_message: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    extraction: Optional[Extraction] = None,
+) -> Dict[str, Any]:
+    """Fallback classification using keyword matches with basic context awareness"""
+    extraction = extraction or extract(user_message)
+    entities = reference_entities(extraction)
+
+    # Several confirm/cancel references are handled together in one turn
+    actions = extract_actions(user_message, extraction)
+    if len(actions) > 1:
+        return {
+            "intent": "batch_actions",
+            "entities": {**entities, "ordinal": None, "actions": actions},
+        }
+
+    # Context-aware classification for simple responses
+    if conversation_history and extraction.lower.strip() in YES_REPLIES:
+        # Check last assistant message for context
+        last_turn = conversation_history[-1]
+        last_assistant_msg = last_turn['assistant_message'].lower()
+        if "updated appointment list" in last_assistant_msg or "see your updated" in last_assistant_msg:
+            intent = "list_appointments"
+        else:
+            intent = "smalltalk"  # Default for ambiguous yes/no
+    else:
+        intent = "fallback"
+        vocabulary = extraction.vocabulary
+        for keyword_intent, keywords in INTENT_KEYWORDS:
+            if not keywords.isdisjoint(vocabulary):
+                intent = keyword_intent
+                break
+
+    return {"intent": intent, "entities": entities}
+
+
+def classify_by_rules(
+    user_message: str, conversation_history: Optional[List[Dict[str, str]]] = None
+) -> Dict[str, Any]:
+    """Keyword classification plus a confidence score for the tiered router"""
+    extraction = extract(user_message)
+    result = fallback_classify(user_message, conversation_history, extraction)
+    result["confidence"] = _score(extraction, result)
+    return result
+
+
+def _action_score(extraction: Extraction, result: dict[str, Any]) -> float:
+    keyword = "confirm" if result["intent"] == "confirm_appointment" else "cancel"
+    if extraction.vocabulary & ACTION_KEYWORDS - {keyword}:
+        return 0.4  # several actions in one message
+    return 0.98 if result["entities"]["ordinal"] is not None else 0.9
+
+
+def _list_score(extraction: Extraction, _result: dict[str, Any]) -> float:
+    vocabulary = extraction.vocabulary
+    if vocabulary & {"yes", "sure", "okay", "ok"}:
+        return 0.9  # agreed to the assistant's offer to show the list
+    if vocabulary & {"confirm", "cancel", "reschedule", "change", "move"}:
+        return 0.4  # "confirm my appointments" mentions the list, wants an action
+    return 0.9 if vocabulary & {"list", "show"} else 0.6
+
+
+def _smalltalk_score(extraction: Extraction, _result: dict[str, Any]) -> float:
+    vocabulary = extraction.vocabulary
+    if extraction.words and vocabulary <= GREETING_FILLER and vocabulary & GREETING_WORDS:
+        return 0.95  # a bare greeting or thanks
+    return 0.3  # keyword buried in a longer message, or an ambiguous yes/no
+
+
+# Confidence of a keyword match, by intent; intents not listed score 0.0
+INTENT_SCORES = {
+    "batch_actions": lambda _extraction, _result: 0.95,  # every reference was paired with an explicit verb
+    "confirm_appointment": _action_score,
+    "cancel_appointment": _action_score,
+    "list_appointments": _list_score,
+    "help": lambda extraction, _result: 0.5 if extraction.vocabulary & ACTION_KEYWORDS else 0.9,
+    "smalltalk": _smalltalk_score,
+}
+
+
+def _score(extraction: Extraction, result: Dict[str, Any]) -> float:
+    """How safe it is to trust the keyword match without asking the LLM"""
+    if extraction.vocabulary & NEGATIONS:
+        return 0.3  # "don't cancel", "not the first one" - needs real understanding
+    scorer = INTENT_SCORES.get(result["intent"])
+    return scorer(extraction, result) if scorer else 0.0
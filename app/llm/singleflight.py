@@ -0,0 +1,95 @@
+import asyncio
+import copy
+import hashlib
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+from app.llm.cache import context_fingerprint, normalize_message
+
+
+class _Flight:
+    """One running call and how many callers are still waiting for it"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers share its result"""
+
+    def __init__(self):
+        self._in_flight: dict[Hashable, _Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """Await fn() or an identical call already running; returns (result, shared)"""
+        flight = self._in_flight.get(key)
+        shared = flight is not None
+        if flight is None:
+            self.calls += 1
+            # The call belongs to the flight, not to whichever caller started it
+            flight = self._in_flight[key] = _Flight(asyncio.ensure_future(fn()))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            # shield: one waiter being cancelled must not cancel the shared call
+            return await asyncio.shield(flight.task), shared
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                flight.task.cancel()  # every caller gave up on it
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._in_flight.get(key) is flight:
+            del self._in_flight[key]
+        if not flight.task.cancelled():
+            flight.task.exception()  # mark retrieved when every waiter was cancelled
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
+
+
+class CoalescingLLMClient:
+    """Shares one upstream request between concurrent identical LLM calls"""
+
+    stats_key = "coalescing"
+
+    def __init__(self, client: Any):
+        self.client = client
+        self.flight = SingleFlight()
+
+    async def chat(self, system_prompt: str, user_message: str) -> str:
+        prompt_id = hashlib.blake2b(system_prompt.encode(), digest_size=8).hexdigest()
+        reply, _ = await self.flight.do(
+            ("chat", prompt_id, user_message),
+            lambda: self.client.chat(system_prompt, user_message),
+        )
+        return reply
+
+    def stream_chat(self, system_prompt: str, user_message: str) -> AsyncIterator[str]:
+        # Token streams are per-connection; fanning them out isn't worth the buffering
+        return self.client.stream_chat(system_prompt, user_message)
+
+    async def classify_intent(self, user_message: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        key = (
+            "classify",
+            normalize_message(user_message),
+            context_fingerprint(conversation_history),
+        )
+        result, shared = await self.flight.do(
+            key, lambda: self.client.classify_intent(user_message, conversation_history)
+        )
+        # Followers get their own copy so nobody mutates the leader's dict
+        return copy.deepcopy(result) if shared else result
+
+    def stats(self) -> Dict[str, int]:
+        return self.flight.stats()
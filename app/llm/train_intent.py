@@ -0,0 +1,61 @@
+"""Train the local intent classifier from logged classifications.
+
+Each line of the input is a JSON object with ``user_message``, ``intent`` and
+optionally ``context`` (the assistant message the user was replying to).
+
+The seed set in ``app/llm/data/`` is synthetic: hand-written phrasings, not
+logged traffic. Retrain on real classifications before trusting the holdout
+accuracy as a production estimate.
+
+Usage:
+    python -m app.llm.train_intent --data app/llm/data/intent_examples.jsonl \
+        --out app/llm/artifacts/intent_model.npz
+"""
+
+import argparse
+import json
+import random
+
+from app.llm.local_classifier import DEFAULT_FEATURES, IntentModel, train_intent_model
+
+
+def load_examples(path: str) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(model: IntentModel, examples: list[dict]) -> float:
+    correct = sum(
+        model.predict(example["user_message"], example.get("context", ""))[0] == example["intent"]
+        for example in examples
+    )
+    return correct / len(examples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="app/llm/data/intent_examples.jsonl")
+    parser.add_argument("--out", default="app/llm/artifacts/intent_model.npz")
+    parser.add_argument("--features", type=int, default=DEFAULT_FEATURES)
+    parser.add_argument("--epochs", type=int, default=300)
+    parser.add_argument("--holdout", type=float, default=0.2, help="fraction held out for accuracy")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    random.Random(args.seed).shuffle(examples)
+    split = int(len(examples) * (1 - args.holdout))
+    train, holdout = examples[:split], examples[split:]
+
+    if holdout:
+        model = train_intent_model(train, n_features=args.features, epochs=args.epochs)
+        print(f"holdout accuracy: {evaluate(model, holdout):.3f} ({len(holdout)} examples)")
+
+    # The shipped artifact is refit on everything once the holdout looks sane
+    model = train_intent_model(examples, n_features=args.features, epochs=args.epochs)
+    model.save(args.out)
+    print(f"trained on {len(examples)} examples, labels={model.labels} -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,47 @@
+import asyncio
+import os
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from app.api.router import router
+from app.api.middleware import MetricsMiddleware
+from app.api.router import router, session_repo
+from app.repositories.sqlite_session import SQLiteSessionRepository
+from app.repositories.ttl_session import TTLSessionRepository
 
 # Load environment variables early
 load_dotenv()
 
+
+async def sweep_sqlite_sessions(repo: SQLiteSessionRepository, interval_seconds: float) -> None:
+    """Delete expired session rows periodically; every worker may run this, deletes are idempotent"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        await asyncio.to_thread(repo.sweep)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncGenerator[None, None]:
+    """Start and stop background maintenance tasks"""
+    interval = float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "30"))
+    sqlite_sweeper = None
+    if isinstance(session_repo, TTLSessionRepository):
+        session_repo.start_sweeper(interval)
+    elif isinstance(session_repo, SQLiteSessionRepository):
+        sqlite_sweeper = asyncio.create_task(sweep_sqlite_sessions(session_repo, interval))
+    yield
+    if isinstance(session_repo, TTLSessionRepository):
+        session_repo.stop_sweeper()
+    if sqlite_sweeper is not None:
+        sqlite_sweeper.cancel()
+
+
 app = FastAPI(
     title="Patient Appointment Management API",
     description="Conversational AI service for managing patient appointments",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -21,6 +53,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so request latency includes the other middleware
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(router)
 
 if __name__ == "__main__":
@@ -0,0 +1,47 @@
+import os
+from app.repositories.interfaces import AppointmentRepository, SessionRepository
+from app.repositories.mock_appointments import MockAppointmentRepository, seed_appointments
+from app.repositories.mock_session import MockSessionRepository
+from app.repositories.sqlite_appointments import SQLiteAppointmentRepository
+from app.repositories.sqlite_session import SQLiteSessionRepository
+from app.repositories.ttl_session import TTLSessionRepository
+from app.utils.time import get_pst_now
+
+
+def create_session_repository() -> SessionRepository:
+    """Build the session repository selected by SESSION_BACKEND (ttl | memory | sqlite)"""
+    backend = os.getenv("SESSION_BACKEND", "ttl").lower()
+
+    if backend == "ttl":
+        return TTLSessionRepository()
+    if backend == "memory":
+        return MockSessionRepository()
+    if backend == "sqlite":
+        return SQLiteSessionRepository(
+            os.getenv("SESSION_DB_PATH", "sessions.db"),
+            pool_size=int(os.getenv("SESSION_DB_POOL_SIZE", "5")),
+        )
+
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
+
+
+def create_appointment_repository() -> AppointmentRepository:
+    """Build the appointment repository selected by APPOINTMENT_BACKEND (memory | sqlite)"""
+    backend = os.getenv("APPOINTMENT_BACKEND", "memory").lower()
+
+    if backend == "memory":
+        return MockAppointmentRepository()
+    if backend == "sqlite":
+        repo = SQLiteAppointmentRepository(
+            os.getenv("APPOINTMENT_DB_PATH", "appointments.db"),
+            pool_size=int(os.getenv("APPOINTMENT_DB_POOL_SIZE", "5")),
+        )
+        if repo.count() == 0:
+            # Seed the demo data once; concurrent workers may race to do so
+            try:
+                repo.add_many(seed_appointments(get_pst_now()))
+            except ValueError:
+                pass
+        return repo
+
+    raise ValueError(f"Unknown APPOINTMENT_BACKEND: {backend}")
@@ -1,4 +1,4 @@
-from typing import Protocol, Sequence
+from typing import Callable, Protocol, Sequence
 from app.domain.models import Patient, Appointment, AppointmentStatus
 from datetime import datetime, date
 
@@ -6,6 +6,7 @@ from datetime import datetime, date
 class PatientRepository(Protocol):
     def find_by_phone_and_dob(self, phone_e164: str, dob: date) -> list[Patient]: ...
     def get_by_id(self, patient_id: str) -> Patient | None: ...
+    def get_many_by_id(self, patient_ids: list[str]) -> list[Patient]: ...
 
 
 class AppointmentRepository(Protocol):
@@ -14,8 +15,15 @@ class AppointmentRepository(Protocol):
     ) -> list[Appointment]: ...
     def get_by_id(self, appointment_id: str) -> Appointment | None: ...
     def update_status(
-        self, appointment_id: str, status: AppointmentStatus
+        self,
+        appointment_id: str,
+        status: AppointmentStatus,
+        expected_status: AppointmentStatus | None = None,  # compare-and-set guard
     ) -> Appointment: ...
+    def update_statuses(
+        self,
+        updates: Sequence[tuple[str, AppointmentStatus, AppointmentStatus | None]],
+    ) -> list[Appointment]: ...  # all or nothing; (id, status, expected_status)
 
 
 class OTPRepository(Protocol):
@@ -24,7 +32,12 @@ class OTPRepository(Protocol):
     def clear_otp(self, session_id: str) -> None: ...
 
 
-class SessionRepository(Protocol):  # in-memory for dev
+class SessionRepository(Protocol):  # see factory.create_session_repository
     def get(self, session_id: str) -> dict | None: ...
-    def set(self, session_id: str, state_dict: dict) -> None: ...
+    def set(self, session_id: str, state_dict: dict) -> None: ...  # clears deltas
     def delete(self, session_id: str) -> None: ...
+    def append_delta(self, session_id: str, delta: dict) -> None: ...
+    def get_deltas(self, session_id: str) -> list[dict]: ...
+    def compact(
+        self, session_id: str, fold: Callable[[dict | None, list[dict]], dict]
+    ) -> None: ...  # set(fold(snapshot, deltas)) with no append in between
@@ -1,82 +1,141 @@
+from bisect import bisect_left, bisect_right, insort
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from app.domain.models import Appointment, AppointmentStatus
 
 
+def seed_appointments(now: datetime) -> list[Appointment]:
+    """Demo appointments relative to `now` (shared by every repository backend)"""
+    # Use future dates that won't expire during testing
+    seed = {
+        "a_001": Appointment(
+            appointment_id="a_001",
+            patient_id="p_001",
+            provider_name="Dr. Lee",
+            start_time=now
+            + timedelta(days=14, hours=10),  # 2 weeks from now at 10 AM
+            location="Main Clinic",
+            status=AppointmentStatus.scheduled,
+        ),
+        "a_002": Appointment(
+            appointment_id="a_002",
+            patient_id="p_001",
+            provider_name="Dr. Kim",
+            start_time=now
+            + timedelta(days=21, hours=14),  # 3 weeks from now at 2 PM
+            location="Main Clinic",
+            status=AppointmentStatus.scheduled,
+        ),
+        "a_003": Appointment(
+            appointment_id="a_003",
+            patient_id="p_001",
+            provider_name="Dr. Lee",
+            start_time=now - timedelta(days=1, hours=21),  # Yesterday 3 PM
+            location="Main Clinic",
+            status=AppointmentStatus.past,
+        ),
+        "a_004": Appointment(
+            appointment_id="a_004",
+            patient_id="p_002",
+            provider_name="Dr. Patel",
+            start_time=now
+            + timedelta(hours=3),  # Today + 3h (triggers <24h warning)
+            location="Main Clinic",
+            status=AppointmentStatus.scheduled,
+        ),
+        "a_005": Appointment(
+            appointment_id="a_005",
+            patient_id="p_002",
+            provider_name="Dr. Kim",
+            start_time=now
+            + timedelta(days=7, hours=-14, minutes=30),  # Next Mon 9:30 AM
+            location="Main Clinic",
+            status=AppointmentStatus.confirmed,
+        ),
+    }
+    return list(seed.values())
+
+
 class MockAppointmentRepository:
     def __init__(self):
         # PST timezone
         pst = ZoneInfo("America/Los_Angeles")
         now = datetime.now(pst)
 
-        # Seed data - use future dates that won't expire during testing
-        self.appointments = {
-            "a_001": Appointment(
-                appointment_id="a_001",
-                patient_id="p_001",
-                provider_name="Dr. Lee",
-                start_time=now
-                + timedelta(days=14, hours=10),  # 2 weeks from now at 10 AM
-                location="Main Clinic",
-                status=AppointmentStatus.scheduled,
-            ),
-            "a_002": Appointment(
-                appointment_id="a_002",
-                patient_id="p_001",
-                provider_name="Dr. Kim",
-                start_time=now
-                + timedelta(days=21, hours=14),  # 3 weeks from now at 2 PM
-                location="Main Clinic",
-                status=AppointmentStatus.scheduled,
-            ),
-            "a_003": Appointment(
-                appointment_id="a_003",
-                patient_id="p_001",
-                provider_name="Dr. Lee",
-                start_time=now - timedelta(days=1, hours=21),  # Yesterday 3 PM
-                location="Main Clinic",
-                status=AppointmentStatus.past,
-            ),
-            "a_004": Appointment(
-                appointment_id="a_004",
-                patient_id="p_002",
-                provider_name="Dr. Patel",
-                start_time=now
-                + timedelta(hours=3),  # Today + 3h (triggers <24h warning)
-                location="Main Clinic",
-                status=AppointmentStatus.scheduled,
-            ),
-            "a_005": Appointment(
-                appointment_id="a_005",
-                patient_id="p_002",
-                provider_name="Dr. Kim",
-                start_time=now
-                + timedelta(days=7, hours=-14, minutes=30),  # Next Mon 9:30 AM
-                location="Main Clinic",
-                status=AppointmentStatus.confirmed,
-            ),
-        }
+        self.appointments: dict[str, Appointment] = {}
+        # patient_id -> [(start_time, appointment_id)] sorted, canceled excluded
+        self._by_patient: dict[str, list[tuple[datetime, str]]] = {}
+
+        for appointment in seed_appointments(now):
+            self.add(appointment)
+
+    def add(self, appointment: Appointment) -> None:
+        """Insert an appointment, keeping the per-patient index sorted"""
+        if appointment.appointment_id in self.appointments:
+            raise ValueError(f"Appointment {appointment.appointment_id} already exists")
+        self.appointments[appointment.appointment_id] = appointment
+        if appointment.status != AppointmentStatus.canceled:
+            self._index(appointment)
 
     def list_upcoming_by_patient(
         self, patient_id: str, now: datetime
     ) -> list[Appointment]:
-        upcoming = []
-        for appt in self.appointments.values():
-            if (
-                appt.patient_id == patient_id
-                and appt.start_time > now
-                and appt.status != AppointmentStatus.canceled
-            ):
-                upcoming.append(appt)
-        return sorted(upcoming, key=lambda a: a.start_time)
+        entries = self._by_patient.get(patient_id, [])
+        start = bisect_right(entries, now, key=lambda entry: entry[0])
+        return [self.appointments[appointment_id] for _, appointment_id in entries[start:]]
 
     def get_by_id(self, appointment_id: str) -> Appointment | None:
         return self.appointments.get(appointment_id)
 
     def update_status(
-        self, appointment_id: str, status: AppointmentStatus
+        self,
+        appointment_id: str,
+        status: AppointmentStatus,
+        expected_status: AppointmentStatus | None = None,
     ) -> Appointment:
         if appointment_id in self.appointments:
-            self.appointments[appointment_id].status = status
-            return self.appointments[appointment_id]
+            appointment = self.appointments[appointment_id]
+            if expected_status is not None and appointment.status != expected_status:
+                raise ValueError(
+                    f"Appointment {appointment_id} is {appointment.status.value}, "
+                    f"expected {expected_status.value}"
+                )
+            was_canceled = appointment.status == AppointmentStatus.canceled
+            is_canceled = status == AppointmentStatus.canceled
+            if is_canceled and not was_canceled:
+                self._unindex(appointment)
+            elif was_canceled and not is_canceled:
+                self._index(appointment)
+            appointment.status = status
+            return appointment
         raise ValueError(f"Appointment {appointment_id} not found")
+
+    def update_statuses(
+        self,
+        updates: list[tuple[str, AppointmentStatus, AppointmentStatus | None]],
+    ) -> list[Appointment]:
+        """Apply several status changes, or none if any guard fails"""
+        for appointment_id, _, expected_status in updates:
+            appointment = self.appointments.get(appointment_id)
+            if appointment is None:
+                raise ValueError(f"Appointment {appointment_id} not found")
+            if expected_status is not None and appointment.status != expected_status:
+                raise ValueError(
+                    f"Appointment {appointment_id} is {appointment.status.value}, "
+                    f"expected {expected_status.value}"
+                )
+        return [
+            self.update_status(appointment_id, status)
+            for appointment_id, status, _ in updates
+        ]
+
+    def _index(self, appointment: Appointment) -> None:
+        insort(
+            self._by_patient.setdefault(appointment.patient_id, []),
+            (appointment.start_time, appointment.appointment_id),
+        )
+
+    def _unindex(self, appointment: Appointment) -> None:
+        entries = self._by_patient[appointment.patient_id]
+        entry = (appointment.start_time, appointment.appointment_id)
+        del entries[bisect_left(entries, entry)]
@@ -4,28 +4,67 @@ from app.domain.models import Patient
 
 class MockPatientRepository:
     def __init__(self):
+        self.patients: dict[str, Patient] = {}
+        # Composite index (phone_e164, dob) -> patient_ids; maintained by add/update
+        self._by_phone_and_dob: dict[tuple[str, date], list[str]] = {}
+
         # Seed data
-        self.patients = {
-            "p_001": Patient(
+        self.add(
+            Patient(
                 patient_id="p_001",
                 full_name="John Adam Doe",
                 phone_e164="+14155550123",
                 dob=date(1985, 7, 14),
-            ),
-            "p_002": Patient(
+            )
+        )
+        self.add(
+            Patient(
                 patient_id="p_002",
                 full_name="Maria G. Santos",
                 phone_e164="+14155550999",
                 dob=date(1990, 2, 1),
-            ),
-        }
+            )
+        )
+
+    def add(self, patient: Patient) -> None:
+        """Insert a patient (or replace one with the same id), keeping the index current"""
+        if patient.patient_id in self.patients:
+            self.update(patient)
+            return
+        self.patients[patient.patient_id] = patient
+        self._by_phone_and_dob.setdefault(
+            (patient.phone_e164, patient.dob), []
+        ).append(patient.patient_id)
+
+    def update(self, patient: Patient) -> None:
+        """Replace a stored patient, re-indexing if phone or DOB changed"""
+        existing = self.patients.get(patient.patient_id)
+        if existing is None:
+            raise ValueError(f"Patient {patient.patient_id} not found")
+
+        old_key = (existing.phone_e164, existing.dob)
+        new_key = (patient.phone_e164, patient.dob)
+        if old_key != new_key:
+            ids = self._by_phone_and_dob[old_key]
+            ids.remove(patient.patient_id)
+            if not ids:
+                del self._by_phone_and_dob[old_key]
+            self._by_phone_and_dob.setdefault(new_key, []).append(patient.patient_id)
+        self.patients[patient.patient_id] = patient
 
     def find_by_phone_and_dob(self, phone_e164: str, dob: date) -> list[Patient]:
-        matches = []
-        for patient in self.patients.values():
-            if patient.phone_e164 == phone_e164 and patient.dob == dob:
-                matches.append(patient)
-        return matches
+        return [
+            self.patients[patient_id]
+            for patient_id in self._by_phone_and_dob.get((phone_e164, dob), ())
+        ]
 
     def get_by_id(self, patient_id: str) -> Patient | None:
         return self.patients.get(patient_id)
+
+    def get_many_by_id(self, patient_ids: list[str]) -> list[Patient]:
+        """Fetch several patients at once, skipping unknown ids and keeping order"""
+        return [
+            self.patients[patient_id]
+            for patient_id in patient_ids
+            if patient_id in self.patients
+        ]
@@ -1,13 +1,28 @@
+from typing import Callable
+
+
 class MockSessionRepository:
     def __init__(self):
         self.sessions = {}
+        self.deltas = {}  # session_id -> deltas appended since the last set()
 
     def get(self, session_id: str) -> dict | None:
         return self.sessions.get(session_id)
 
     def set(self, session_id: str, state_dict: dict) -> None:
         self.sessions[session_id] = state_dict
+        self.deltas.pop(session_id, None)
 
     def delete(self, session_id: str) -> None:
         if session_id in self.sessions:
             del self.sessions[session_id]
+        self.deltas.pop(session_id, None)
+
+    def append_delta(self, session_id: str, delta: dict) -> None:
+        self.deltas.setdefault(session_id, []).append(delta)
+
+    def get_deltas(self, session_id: str) -> list[dict]:
+        return list(self.deltas.get(session_id, []))
+
+    def compact(self, session_id: str, fold: Callable[[dict | None, list[dict]], dict]) -> None:
+        self.set(session_id, fold(self.sessions.get(session_id), self.deltas.get(session_id, [])))
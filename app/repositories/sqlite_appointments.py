@@ -0,0 +1,156 @@
+import sqlite3
+from datetime import datetime
+from app.domain.models import Appointment, AppointmentStatus
+from app.repositories.sqlite_pool import SQLiteConnectionPool
+
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS appointments (
+        appointment_id TEXT PRIMARY KEY,
+        patient_id TEXT NOT NULL,
+        provider_name TEXT NOT NULL,
+        start_ts REAL NOT NULL,     -- epoch seconds, for ordering and range scans
+        start_time TEXT NOT NULL,   -- ISO 8601 with the original UTC offset
+        location TEXT,
+        status TEXT NOT NULL,
+        notes TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_appointments_patient_start "
+    "ON appointments (patient_id, start_ts)",
+    "CREATE INDEX IF NOT EXISTS idx_appointments_start_status "
+    "ON appointments (start_ts, status)",
+]
+
+# Statement text is kept constant so each pooled connection compiles it once
+# and reuses the prepared statement from its statement cache.
+COLUMNS = "appointment_id, patient_id, provider_name, start_time, location, status, notes"
+INSERT_APPOINTMENT = (
+    "INSERT INTO appointments (appointment_id, patient_id, provider_name, start_ts, "
+    "start_time, location, status, notes) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+SELECT_UPCOMING = (
+    f"SELECT {COLUMNS} FROM appointments "
+    "WHERE patient_id = ? AND start_ts > ? AND status != 'canceled' "
+    "ORDER BY start_ts"
+)
+SELECT_BY_ID = f"SELECT {COLUMNS} FROM appointments WHERE appointment_id = ?"
+UPDATE_STATUS = "UPDATE appointments SET status = ? WHERE appointment_id = ?"
+COUNT_APPOINTMENTS = "SELECT COUNT(*) FROM appointments"
+
+
+def _row_to_appointment(row: tuple) -> Appointment:
+    appointment_id, patient_id, provider_name, start_time, location, status, notes = row
+    return Appointment(
+        appointment_id=appointment_id,
+        patient_id=patient_id,
+        provider_name=provider_name,
+        start_time=datetime.fromisoformat(start_time),
+        location=location,
+        status=AppointmentStatus(status),
+        notes=notes,
+    )
+
+
+def _to_row(appointment: Appointment) -> tuple:
+    return (
+        appointment.appointment_id,
+        appointment.patient_id,
+        appointment.provider_name,
+        appointment.start_time.timestamp(),
+        appointment.start_time.isoformat(),
+        appointment.location,
+        appointment.status.value,
+        appointment.notes,
+    )
+
+
+class SQLiteAppointmentRepository:
+    """Durable appointment store shared by every worker process using the same file"""
+
+    blocking_io = True  # lock waits up to busy_timeout; callers keep it off the event loop
+
+    def __init__(self, db_path: str, pool_size: int = 5):
+        self.pool = SQLiteConnectionPool(db_path, size=pool_size)
+        with self.pool.connection() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    def add(self, appointment: Appointment) -> None:
+        self.add_many([appointment])
+
+    def add_many(self, appointments: list[Appointment]) -> None:
+        """Insert appointments in a single transaction"""
+        try:
+            with self.pool.transaction() as conn:
+                conn.executemany(
+                    INSERT_APPOINTMENT, [_to_row(appt) for appt in appointments]
+                )
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"Appointment already exists: {e}") from e
+
+    def count(self) -> int:
+        with self.pool.connection() as conn:
+            return conn.execute(COUNT_APPOINTMENTS).fetchone()[0]
+
+    def list_upcoming_by_patient(
+        self, patient_id: str, now: datetime
+    ) -> list[Appointment]:
+        with self.pool.connection() as conn:
+            rows = conn.execute(SELECT_UPCOMING, (patient_id, now.timestamp())).fetchall()
+        return [_row_to_appointment(row) for row in rows]
+
+    def get_by_id(self, appointment_id: str) -> Appointment | None:
+        with self.pool.connection() as conn:
+            row = conn.execute(SELECT_BY_ID, (appointment_id,)).fetchone()
+        return _row_to_appointment(row) if row else None
+
+    def update_status(
+        self,
+        appointment_id: str,
+        status: AppointmentStatus,
+        expected_status: AppointmentStatus | None = None,
+    ) -> Appointment:
+        # BEGIN IMMEDIATE takes the write lock up front, so the status check and
+        # the update are atomic across worker processes
+        with self.pool.transaction() as conn:
+            row = conn.execute(SELECT_BY_ID, (appointment_id,)).fetchone()
+            if row is None:
+                raise ValueError(f"Appointment {appointment_id} not found")
+
+            appointment = _row_to_appointment(row)
+            if expected_status is not None and appointment.status != expected_status:
+                raise ValueError(
+                    f"Appointment {appointment_id} is {appointment.status.value}, "
+                    f"expected {expected_status.value}"
+                )
+
+            conn.execute(UPDATE_STATUS, (status.value, appointment_id))
+
+        appointment.status = status
+        return appointment
+
+    def update_statuses(
+        self,
+        updates: list[tuple[str, AppointmentStatus, AppointmentStatus | None]],
+    ) -> list[Appointment]:
+        """Apply several status changes in one transaction, or none if any guard fails"""
+        appointments = []
+        with self.pool.transaction() as conn:
+            for appointment_id, status, expected_status in updates:
+                row = conn.execute(SELECT_BY_ID, (appointment_id,)).fetchone()
+                if row is None:
+                    raise ValueError(f"Appointment {appointment_id} not found")
+
+                appointment = _row_to_appointment(row)
+                if expected_status is not None and appointment.status != expected_status:
+                    raise ValueError(
+                        f"Appointment {appointment_id} is {appointment.status.value}, "
+                        f"expected {expected_status.value}"
+                    )
+
+                conn.execute(UPDATE_STATUS, (status.value, appointment_id))
+                appointment.status = status
+                appointments.append(appointment)
+        return appointments
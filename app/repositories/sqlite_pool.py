@@ -0,0 +1,59 @@
+import queue
+import sqlite3
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class SQLiteConnectionPool:
+    """Fixed-size pool of SQLite connections configured for concurrent access.
+
+    Connections run in WAL mode so readers never block the single writer, and
+    several processes (uvicorn workers) can share the same database file.
+    """
+
+    def __init__(self, db_path: str, size: int = 5, busy_timeout_ms: int = 5000):
+        if db_path == ":memory:":
+            raise ValueError("SQLite pool requires a file path; :memory: is per-connection")
+        self.db_path = db_path
+        self.size = size
+        self.busy_timeout_ms = busy_timeout_ms
+        self._pool: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            self._pool.put(self._connect())
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            isolation_level=None,  # autocommit; transactions are explicit
+            cached_statements=128,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection, returning it to the pool afterwards"""
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection inside a write transaction (BEGIN IMMEDIATE)"""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self) -> None:
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
@@ -0,0 +1,161 @@
+import json
+import sqlite3
+import time
+from datetime import date, datetime
+from typing import Any, Callable
+from app.repositories.sqlite_pool import SQLiteConnectionPool
+from app.utils.time import SESSION_IDLE_TIMEOUT, get_pst_now
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _deadline(fields: dict[str, Any]) -> float | None:
+    """Epoch time at which a session with these fields expires (idle or absolute)"""
+    deadlines = []
+    for key, grace in (("last_activity", SESSION_IDLE_TIMEOUT), ("expires_at", None)):
+        value = fields.get(key)
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        if isinstance(value, datetime):
+            deadlines.append(value + grace if grace else value)
+    return min(deadlines).timestamp() if deadlines else None
+
+
+class SQLiteSessionRepository:
+    """Durable session store shared by every worker process using the same file"""
+
+    blocking_io = True  # lock waits up to busy_timeout; callers keep it off the event loop
+
+    def __init__(self, db_path: str, pool_size: int = 5):
+        self.pool = SQLiteConnectionPool(db_path, size=pool_size)
+        with self.pool.connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    expires_at REAL
+                )
+                """
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+            if "expires_at" not in columns:  # files created before sweeping existed
+                conn.execute("ALTER TABLE sessions ADD COLUMN expires_at REAL")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)"
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS session_deltas (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    delta TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_session_deltas_session "
+                "ON session_deltas (session_id, seq)"
+            )
+
+    def get(self, session_id: str) -> dict | None:
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT state FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, session_id: str, state_dict: dict) -> None:
+        payload = json.dumps(state_dict, default=_json_default)
+        with self.pool.transaction() as conn:
+            self._replace(conn, session_id, payload, _deadline(state_dict))
+
+    def compact(self, session_id: str, fold: Callable[[dict | None, list[dict]], dict]) -> None:
+        # BEGIN IMMEDIATE holds the write lock from the read on, so a delta
+        # appended by another worker can't land between the fold and the delete
+        with self.pool.transaction() as conn:
+            row = conn.execute(
+                "SELECT state FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            rows = conn.execute(
+                "SELECT delta FROM session_deltas WHERE session_id = ? ORDER BY seq",
+                (session_id,),
+            ).fetchall()
+            record = fold(
+                json.loads(row[0]) if row else None, [json.loads(delta) for delta, in rows]
+            )
+            self._replace(
+                conn, session_id, json.dumps(record, default=_json_default), _deadline(record)
+            )
+
+    @staticmethod
+    def _replace(
+        conn: sqlite3.Connection, session_id: str, payload: str, deadline: float | None
+    ) -> None:
+        """Write a snapshot and drop the deltas it supersedes"""
+        conn.execute(
+            "DELETE FROM session_deltas WHERE session_id = ?", (session_id,)
+        )
+        conn.execute(
+            """
+            INSERT INTO sessions (session_id, state, updated_at, expires_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(session_id) DO UPDATE
+            SET state = excluded.state, updated_at = excluded.updated_at,
+                expires_at = excluded.expires_at
+            """,
+            (session_id, payload, time.time(), deadline),
+        )
+
+    def delete(self, session_id: str) -> None:
+        with self.pool.transaction() as conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            conn.execute(
+                "DELETE FROM session_deltas WHERE session_id = ?", (session_id,)
+            )
+
+    def append_delta(self, session_id: str, delta: dict) -> None:
+        payload = json.dumps(delta, default=_json_default)
+        deadline = _deadline(delta.get("fields", {}))
+        with self.pool.transaction() as conn:
+            conn.execute(
+                "INSERT INTO session_deltas (session_id, delta) VALUES (?, ?)",
+                (session_id, payload),
+            )
+            if deadline is not None:
+                # Each turn pushes the idle deadline out, without rewriting the snapshot
+                conn.execute(
+                    "UPDATE sessions SET expires_at = ? WHERE session_id = ?",
+                    (deadline, session_id),
+                )
+
+    def get_deltas(self, session_id: str) -> list[dict]:
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT delta FROM session_deltas WHERE session_id = ? ORDER BY seq",
+                (session_id,),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def sweep(self, now: datetime | None = None) -> int:
+        """Delete every session (and its deltas) past its deadline, returning the count"""
+        if now is None:
+            now = get_pst_now()
+        cutoff = now.timestamp()
+        with self.pool.transaction() as conn:
+            conn.execute(
+                """
+                DELETE FROM session_deltas WHERE session_id IN (
+                    SELECT session_id FROM sessions WHERE expires_at < ?
+                )
+                """,
+                (cutoff,),
+            )
+            return conn.execute(
+                "DELETE FROM sessions WHERE expires_at < ?", (cutoff,)
+            ).rowcount
@@ -0,0 +1,171 @@
+import heapq
+import itertools
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable
+from app.utils.time import get_pst_now, SESSION_IDLE_TIMEOUT
+
+
+def _as_datetime(value: Any) -> datetime | None:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return None
+
+
+class TTLSessionRepository:
+    """In-memory session store with an expiry index and background sweeping.
+
+    Each session's deadline is the earlier of its idle timeout (last_activity +
+    15 min) and its absolute expiry (expires_at). Deadlines live in a min-heap,
+    so a sweep pops only the sessions that are actually due, O(log n) each.
+    Re-saving a session pushes a fresh heap entry; the superseded one is
+    discarded lazily when it reaches the top.
+    """
+
+    def __init__(self, idle_timeout: timedelta = SESSION_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self.sessions: dict[str, dict] = {}
+        self.deltas: dict[str, list[dict]] = {}  # appended since the last set()
+        self._deadlines: dict[str, tuple[datetime, str]] = {}  # id -> (deadline, reason)
+        self._heap: list[tuple[datetime, int, str]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper: threading.Thread | None = None
+        self.evicted_idle = 0
+        self.evicted_absolute = 0
+
+    def get(self, session_id: str) -> dict | None:
+        with self._lock:
+            entry = self._deadlines.get(session_id)
+            if entry and get_pst_now() >= entry[0]:
+                # Due but not swept yet - never hand out an expired session
+                self._evict(session_id, entry[1])
+                return None
+            return self.sessions.get(session_id)
+
+    def set(self, session_id: str, state_dict: dict) -> None:
+        with self._lock:
+            self._store(session_id, state_dict)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self.sessions.pop(session_id, None)
+            self.deltas.pop(session_id, None)
+            self._deadlines.pop(session_id, None)
+
+    def append_delta(self, session_id: str, delta: dict) -> None:
+        with self._lock:
+            snapshot = self.sessions.get(session_id)
+            if snapshot is None:
+                return  # evicted in the meantime; the next turn starts fresh
+            self.deltas.setdefault(session_id, []).append(delta)
+            fields = delta.get("fields", {})
+            self._index(
+                session_id,
+                _as_datetime(fields.get("last_activity")),
+                _as_datetime(fields.get("expires_at", snapshot.get("expires_at"))),
+            )
+
+    def get_deltas(self, session_id: str) -> list[dict]:
+        with self._lock:
+            return list(self.deltas.get(session_id, []))
+
+    def compact(self, session_id: str, fold: Callable[[dict | None, list[dict]], dict]) -> None:
+        with self._lock:
+            snapshot = self.sessions.get(session_id)
+            self._store(session_id, fold(snapshot, self.deltas.get(session_id, [])))
+
+    def sweep(self, now: datetime | None = None) -> int:
+        """Evict every session whose deadline has passed, returning the count"""
+        if now is None:
+            now = get_pst_now()
+
+        evicted = 0
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, _, session_id = heapq.heappop(self._heap)
+                entry = self._deadlines.get(session_id)
+                if entry is None or entry[0] != deadline:
+                    continue  # superseded by a later save, or already deleted
+                self._evict(session_id, entry[1])
+                evicted += 1
+        return evicted
+
+    def stats(self) -> dict[str, int]:
+        """Live and evicted session counters"""
+        return {
+            "live": len(self.sessions),
+            "evicted_idle": self.evicted_idle,
+            "evicted_absolute": self.evicted_absolute,
+        }
+
+    def start_sweeper(self, interval_seconds: float = 30.0) -> None:
+        """Run sweep() periodically on a daemon thread"""
+        if self._sweeper and self._sweeper.is_alive():
+            return
+        self._stop.clear()
+        self._sweeper = threading.Thread(
+            target=self._sweep_loop,
+            args=(interval_seconds,),
+            name="session-sweeper",
+            daemon=True,
+        )
+        self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        self._stop.set()
+        if self._sweeper:
+            self._sweeper.join()
+            self._sweeper = None
+
+    def _sweep_loop(self, interval_seconds: float) -> None:
+        while not self._stop.wait(interval_seconds):
+            self.sweep()
+
+    def _store(self, session_id: str, state_dict: dict) -> None:
+        self.sessions[session_id] = state_dict
+        self.deltas.pop(session_id, None)
+        self._index(
+            session_id,
+            _as_datetime(state_dict.get("last_activity")),
+            _as_datetime(state_dict.get("expires_at")),
+        )
+
+    def _index(
+        self,
+        session_id: str,
+        last_activity: datetime | None,
+        expires_at: datetime | None,
+    ) -> None:
+        if last_activity is None or expires_at is None:
+            self._deadlines.pop(session_id, None)
+            return
+
+        idle_deadline = last_activity + self.idle_timeout
+        if idle_deadline < expires_at:
+            deadline, reason = idle_deadline, "idle"
+        else:
+            deadline, reason = expires_at, "absolute"
+
+        self._deadlines[session_id] = (deadline, reason)
+        heapq.heappush(self._heap, (deadline, next(self._sequence), session_id))
+
+        # Rebuild when superseded entries dominate so the heap stays O(live)
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [
+                (deadline, next(self._sequence), sid)
+                for sid, (deadline, _) in self._deadlines.items()
+            ]
+            heapq.heapify(self._heap)
+
+    def _evict(self, session_id: str, reason: str) -> None:
+        self.sessions.pop(session_id, None)
+        self.deltas.pop(session_id, None)
+        self._deadlines.pop(session_id, None)
+        if reason == "idle":
+            self.evicted_idle += 1
+        else:
+            self.evicted_absolute += 1
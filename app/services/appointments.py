@@ -1,12 +1,15 @@
 from datetime import datetime
 from app.domain.models import Appointment, AppointmentStatus
 from app.repositories.interfaces import AppointmentRepository
+from app.utils.blocking import does_blocking_io
 from app.utils.time import get_pst_now, is_within_24_hours
 
 
 class AppointmentService:
     def __init__(self, appointment_repo: AppointmentRepository):
         self.appointment_repo = appointment_repo
+        # Async callers run these methods in a worker thread when this is set
+        self.blocking_io = does_blocking_io(appointment_repo)
 
     def list_upcoming(self, patient_id: str, now: datetime = None) -> list[Appointment]:
         """List upcoming appointments for patient"""
@@ -30,8 +33,11 @@ class AppointmentService:
                 f"Cannot confirm appointment with status {appointment.status}"
             )
 
+        # Guard against a concurrent cancel between the read and the write
         return self.appointment_repo.update_status(
-            appointment_id, AppointmentStatus.confirmed
+            appointment_id,
+            AppointmentStatus.confirmed,
+            expected_status=AppointmentStatus.scheduled,
         )
 
     def cancel(
@@ -54,3 +60,51 @@ class AppointmentService:
         )
 
         return updated_appointment, within_24h
+
+    def apply_actions(
+        self, actions: list[tuple[str, str]], now: datetime = None
+    ) -> list[dict]:
+        """Confirm/cancel several appointments with one repository transaction.
+
+        `actions` are (action, appointment_id) pairs. Each result carries the
+        action, the appointment (or None), whether a cancel is within 24 hours
+        and an error message when that action could not be applied. Invalid
+        actions are reported without blocking the others; the valid ones are
+        written together, guarded on the status read here.
+        """
+        if now is None:
+            now = get_pst_now()
+
+        results = []
+        updates = []
+        for action, appointment_id in actions:
+            result = {"action": action, "appointment": None, "within_24h": False, "error": None}
+            results.append(result)
+            appointment = self.appointment_repo.get_by_id(appointment_id)
+            if not appointment:
+                result["error"] = "not found"
+                continue
+            result["appointment"] = appointment
+
+            if action == "confirm":
+                if appointment.status == AppointmentStatus.confirmed:
+                    continue  # idempotent, nothing to write
+                if appointment.status != AppointmentStatus.scheduled:
+                    result["error"] = f"it is {appointment.status.value}"
+                    continue
+                updates.append((result, AppointmentStatus.confirmed, appointment.status))
+            else:
+                result["within_24h"] = is_within_24_hours(appointment.start_time, now)
+                updates.append((result, AppointmentStatus.canceled, appointment.status))
+
+        if updates:
+            # A concurrent change to any of them fails the whole write
+            updated = self.appointment_repo.update_statuses(
+                [
+                    (result["appointment"].appointment_id, status, expected)
+                    for result, status, expected in updates
+                ]
+            )
+            for (result, _, _), appointment in zip(updates, updated, strict=True):
+                result["appointment"] = appointment
+        return results
@@ -0,0 +1,121 @@
+from datetime import datetime
+from app.domain.models import ConversationTurn
+from app.domain.state import GraphState
+from app.repositories.interfaces import SessionRepository
+from app.utils.blocking import does_blocking_io
+from app.utils.time import get_pst_now, create_session_expiry, SESSION_IDLE_TIMEOUT
+
+
+# Fields persisted with every turn; everything except the conversation history
+SCALAR_FIELDS = set(GraphState.SESSION_FIELDS)
+
+MAX_HISTORY_TURNS = 50  # retained in storage
+CONTEXT_HISTORY_TURNS = 5  # materialized on load for intent classification
+
+
+class SessionService:
+    """Delta-journaled session persistence.
+
+    Each turn appends a small delta (scalar fields plus the one new history
+    entry) instead of rewriting the whole session. The journal is folded into
+    a full snapshot every `compact_every` turns. Loading decodes only the
+    scalar fields and the last few history turns into the turn's GraphState,
+    so per-turn cost stays flat as the conversation grows; the full history is
+    only touched, as plain dicts, during compaction.
+    """
+
+    def __init__(self, session_repo: SessionRepository, compact_every: int = 20):
+        self.session_repo = session_repo
+        self.compact_every = compact_every
+        # Async callers run load/save in a worker thread when this is set
+        self.blocking_io = does_blocking_io(session_repo)
+
+    def create(self, session_id: str, now: datetime | None = None) -> GraphState:
+        """Create new session state"""
+        if now is None:
+            now = get_pst_now()
+        _, absolute_timeout = create_session_expiry(now)
+        return GraphState(session_id, now, expires_at=absolute_timeout)
+
+    def load(self, session_id: str, now: datetime | None = None) -> GraphState:
+        """Load or create session state, dropping it if expired"""
+        if now is None:
+            now = get_pst_now()
+
+        snapshot = self.session_repo.get(session_id)
+        if not snapshot:
+            return self.create(session_id, now)
+        deltas = self.session_repo.get_deltas(session_id)
+
+        fields = {key: snapshot[key] for key in SCALAR_FIELDS if key in snapshot}
+        recent_turns = list(snapshot.get("conversation_history", [])[-CONTEXT_HISTORY_TURNS:])
+        for delta in deltas:
+            fields.update(delta["fields"])
+            recent_turns.append(delta["turn"])
+
+        session_state = GraphState.from_record(
+            fields, recent_turns[-CONTEXT_HISTORY_TURNS:], now
+        )
+        session_state.pending_deltas = len(deltas)
+
+        # Check expiry
+        expires_at = session_state.expires_at
+        if (expires_at is not None and now > expires_at) or (
+            now - session_state.last_activity
+        ) > SESSION_IDLE_TIMEOUT:
+            # Session expired - drop it and start over with fresh timeouts
+            self.session_repo.delete(session_id)
+            return self.create(session_id, now)
+
+        # Update activity
+        session_state.last_activity = now
+        return session_state
+
+    def save(self, session_state: GraphState, turn: ConversationTurn) -> None:
+        """Persist this turn's changes, compacting the journal when it is due"""
+        session_state.conversation_history.append(turn)
+        session_state.conversation_history = session_state.conversation_history[
+            -CONTEXT_HISTORY_TURNS:
+        ]
+
+        delta = {
+            "fields": session_state.session_fields(),
+            "turn": turn.model_dump(),
+        }
+        pending = session_state.pending_deltas
+
+        if pending is None or pending + 1 >= self.compact_every:
+            self._compact(session_state.session_id, delta)
+            pending = 0
+        else:
+            self.session_repo.append_delta(session_state.session_id, delta)
+            pending += 1
+        session_state.pending_deltas = pending
+
+    def materialize(self, session_id: str) -> dict | None:
+        """Fold snapshot and journal into the full stored session dict"""
+        snapshot = self.session_repo.get(session_id)
+        if not snapshot:
+            return None
+        return self._fold(snapshot, self.session_repo.get_deltas(session_id))
+
+    def reset(self, session_id: str) -> None:
+        self.session_repo.delete(session_id)
+
+    def _compact(self, session_id: str, delta: dict) -> None:
+        def fold(snapshot: dict | None, deltas: list[dict]) -> dict:
+            if not snapshot:
+                return self._fold({}, [delta])  # deltas without a snapshot are stale
+            return self._fold(snapshot, [*deltas, delta])
+
+        # Read, fold and replace in one step, so no concurrent delta is lost
+        self.session_repo.compact(session_id, fold)
+
+    def _fold(self, snapshot: dict, deltas: list[dict]) -> dict:
+        record = dict(snapshot)
+        history = list(record.get("conversation_history", []))
+        for delta in deltas:
+            record.update(delta["fields"])
+            history.append(delta["turn"])
+        record["conversation_history"] = history[-MAX_HISTORY_TURNS:]
+        return record
@@ -1,9 +1,10 @@
 import hashlib
 import secrets
 from datetime import datetime, timedelta, date
-from app.domain.models import Patient, SessionState, PatientPublic
+from app.domain.models import Patient, PatientPublic, VerifiableSession
 from app.repositories.interfaces import PatientRepository, OTPRepository
 from app.utils.masking import create_patient_public
+from app.utils.metrics import lockouts
 from app.utils.time import get_pst_now
 
 
@@ -17,11 +18,11 @@ class VerificationService:
         matches = self.patient_repo.find_by_phone_and_dob(phone_e164, dob)
         return matches[0] if len(matches) == 1 else None
 
-    def require_otp_if_needed(self, session: SessionState) -> bool:
+    def require_otp_if_needed(self, session: VerifiableSession) -> bool:
         """Check if OTP is required based on failed attempts"""
         return session.verification.failed_attempts >= 3
 
-    def send_otp(self, patient: Patient, session: SessionState) -> None:
+    def send_otp(self, patient: Patient, session: VerifiableSession) -> None:
         """Generate and 'send' OTP (mock implementation)"""
         # Generate 6-digit OTP
         otp_code = str(secrets.randbelow(1000000)).zfill(6)
@@ -41,7 +42,7 @@ class VerificationService:
         # In real implementation, would send SMS here
         print(f"Mock SMS to {patient.phone_e164}: Your verification code is {otp_code}")
 
-    def verify_otp(self, session: SessionState, code: str) -> bool:
+    def verify_otp(self, session: VerifiableSession, code: str) -> bool:
         """Verify OTP code against stored hash"""
         stored = self.otp_repo.get_otp(session.session_id)
         if not stored:
@@ -72,10 +73,11 @@ class VerificationService:
                 session.verification.lockout_until = get_pst_now() + timedelta(
                     minutes=5
                 )
+                lockouts.inc()
                 self.otp_repo.clear_otp(session.session_id)
             return False
 
-    def is_locked_out(self, session: SessionState) -> bool:
+    def is_locked_out(self, session: VerifiableSession) -> bool:
         """Check if session is locked out"""
         if not session.verification.lockout_until:
             return False
@@ -0,0 +1,21 @@
+import asyncio
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+def does_blocking_io(repository: Any) -> bool:
+    """Whether `repository` waits on disk or locks (SQLite) rather than memory"""
+    return getattr(repository, "blocking_io", False)
+
+
+async def offload(blocking: bool, fn: Callable[..., T], *args: Any) -> T:
+    """Call fn in a worker thread when it blocks, inline otherwise.
+
+    In-memory repositories rely on the event loop running one call at a time
+    and aren't thread-safe, so only blocking ones leave the loop. The thread
+    inherits this task's context, keeping the turn trace attribution.
+    """
+    if not blocking:
+        return fn(*args)
+    return await asyncio.to_thread(fn, *args)
@@ -0,0 +1,211 @@
+"""Single-pass entity extraction shared by verification and rule routing.
+
+The lowercased message is tokenized once into words and digit runs. Plain
+words cost a set lookup; a one-word entity ("tomorrow", "second", "yes")
+is a table lookup; a digit run or the first word of a longer entity is
+matched in place with an anchored pattern: phone, DOB, OTP code, date,
+time, "#2", "Dr. Kim", "that's me". Digit-led alternatives are ordered so
+the more specific reading wins where they overlap: "07/14/1985" is a DOB
+rather than a date, "2nd of October" a date rather than an ordinal.
+
+Searching the message with one alternation of every entity pattern would
+be slower in CPython than the separate searches it replaced, since the
+regex engine retries each alternative at every position.
+"""
+import re
+from collections.abc import Callable
+from datetime import date
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional
+from app.utils.normalization import parse_dob
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+# Hour ranges [start, end) for parts of the day
+PARTS_OF_DAY = {"morning": (5, 12), "afternoon": (12, 17), "evening": (17, 24), "tonight": (17, 24)}
+ORDINAL_WORDS = {"first": 1, "1st": 1, "second": 2, "2nd": 2, "third": 3, "3rd": 3}
+
+_MONTH = (
+    r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+    r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?"
+)
+_SUFFIX = r"(?:st|nd|rd|th)?"
+
+# Entities starting at a digit, "(" or "#", most specific first
+NUMERIC_ENTITY = re.compile(
+    "|".join(
+        [
+            r"(?P<dob>(?:\d{4}[/-]\d{1,2}[/-]\d{1,2}|\d{1,2}[/-]\d{1,2}[/-]\d{2,4})\b)",
+            r"(?P<phone>\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}(?!\d))",
+            r"(?P<otp>\d{6}\b)",
+            rf"(?P<date>(?P<day>\d{{1,2}}){_SUFFIX}\s+(?:of\s+)?(?P<month>{_MONTH})(?![a-z])"
+            r"|(?P<numeric_month>\d{1,2})/(?P<numeric_day>\d{1,2})\b(?!/))",
+            r"(?P<time>(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?\s*(?P<meridiem>[ap])\.?m\b\.?)",
+            r"(?P<ordinal>#\d+|(?:1st|2nd|3rd)\b)",
+        ]
+    )
+)
+# Entities of several words, tried only at their possible first words
+PHRASE_ENTITY = re.compile(
+    "|".join(
+        [
+            rf"(?P<date>(?P<month>{_MONTH})\s+(?P<day>\d{{1,2}}){_SUFFIX}\b)",
+            r"(?P<provider>dr\.?\s+[a-z][a-z'-]*)",
+            r"(?P<yes>(?:that's|that is) me\b)",
+            r"(?P<no>not (?:me|correct|right)\b)",
+        ]
+    )
+)
+PHRASE_STARTS = {"dr", "that's", "that", "not", "sept"} | set(MONTHS) | {
+    "january", "february", "march", "april", "june", "july",
+    "august", "september", "october", "november", "december",
+}
+# One-word entities: (kind, value)
+WORD_ENTITIES = {
+    "today": ("day", "today"),
+    "tomorrow": ("day", "tomorrow"),
+    **{day: ("day", day) for day in WEEKDAYS},
+    **{part: ("daypart", hours) for part, hours in PARTS_OF_DAY.items()},
+    "noon": ("time", (12, 0)),
+    "first": ("ordinal", 1),
+    "second": ("ordinal", 2),
+    "third": ("ordinal", 3),
+    **dict.fromkeys(("yes", "yeah", "yep", "correct"), ("affirm", True)),
+    **dict.fromkeys(("no", "nope", "incorrect"), ("affirm", False)),
+}
+NUMERIC_STARTS = set("0123456789#(")
+ENTITY_STARTS = frozenset(WORD_ENTITIES.keys() | PHRASE_STARTS)
+HAS_NUMERIC = re.compile(r"[\d#(]")
+# Words and digit runs; "(" and "#" can open a phone number or "#2"
+TOKEN = re.compile(r"[a-z']+|\d+|[#(]")
+WORD = re.compile(r"[a-z']+")
+DIGITS = re.compile(r"\d+")
+
+
+class Entity(NamedTuple):
+    kind: str
+    value: Any
+    start: int
+    end: int
+
+
+def _dob_value(match: "re.Match[str]") -> date | None:
+    try:
+        return parse_dob(match.group())
+    except ValueError:
+        return None  # looks like a date but isn't one (02/30/1985, 07/14/85)
+
+
+def _date_value(match: "re.Match[str]") -> tuple[int, int]:
+    if match.group("month") is None:
+        return int(match.group("numeric_month")), int(match.group("numeric_day"))  # 10/6
+    return MONTHS[match.group("month")[:3]], int(match.group("day"))
+
+
+def _time_value(match: "re.Match[str]") -> tuple[int, int | None]:
+    minute = match.group("minute")
+    hour = int(match.group("hour")) % 12 + (12 if match.group("meridiem") == "p" else 0)
+    return hour, int(minute) if minute else None
+
+
+def _ordinal_value(match: "re.Match[str]") -> int:
+    text = match.group()
+    return int(text[1:]) if text.startswith("#") else ORDINAL_WORDS[text]
+
+
+# Typed value of an entity matched with NUMERIC_ENTITY or PHRASE_ENTITY, by kind;
+# kinds not listed (otp) keep the matched text
+VALUE_PARSERS: dict[str, Callable[["re.Match[str]"], Any]] = {
+    "dob": _dob_value,
+    "phone": lambda match: "+1" + "".join(DIGITS.findall(match.group())),
+    "date": _date_value,
+    "time": _time_value,
+    "ordinal": _ordinal_value,
+    "provider": lambda match: "Dr. " + WORD.findall(match.group())[-1].title(),
+}
+
+
+class Extraction:
+    """All entities of one message in message order, and its words"""
+
+    __slots__ = ("text", "lower", "entities", "firsts", "_tokens", "_words", "_vocabulary")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lower = lower = text.lower()
+        self.entities: List[Entity] = []
+        self.firsts: Dict[str, Entity] = {}  # first entity of each kind
+        self._words: Optional[List[str]] = None
+        self._vocabulary: Optional[FrozenSet[str]] = None
+
+        self._tokens = tokens = TOKEN.findall(lower)
+        if ENTITY_STARTS.isdisjoint(tokens) and not HAS_NUMERIC.search(lower):
+            return  # plain words only, the common routing message
+
+        # Locals: this loop runs for every token of every message
+        add, first_of = self.entities.append, self.firsts.setdefault
+        find, numeric_match, phrase_match = lower.find, NUMERIC_ENTITY.match, PHRASE_ENTITY.match
+        position = 0
+        consumed = 0  # end of the last entity spanning several tokens
+        for token in tokens:
+            # Tokens are in order and separators hold no token characters
+            start = find(token, position)
+            position = start + len(token)
+            if start < consumed:
+                continue
+            if token[0] in NUMERIC_STARTS:
+                # Not when continuing a word or number ("abc123456")
+                if start and lower[start - 1].isalnum():
+                    continue
+                match = numeric_match(lower, start)
+            elif token not in ENTITY_STARTS:
+                continue
+            elif token in PHRASE_STARTS:
+                match = phrase_match(lower, start)
+            else:
+                kind, value = WORD_ENTITIES[token]
+                entity = Entity(kind, value, start, position)
+                add(entity)
+                first_of(kind, entity)
+                continue
+
+            if match:
+                kind, consumed = match.lastgroup, match.end()
+                if kind in ("yes", "no"):
+                    kind, value = "affirm", kind == "yes"
+                else:
+                    parse = VALUE_PARSERS.get(kind)
+                    value = parse(match) if parse else match.group()
+                entity = Entity(kind, value, start, consumed)
+                add(entity)
+                first_of(kind, entity)
+
+    @property
+    def words(self) -> List[str]:
+        """Every word in order, entity words included"""
+        if self._words is None:
+            self._words = [token for token in self._tokens if token[0] not in NUMERIC_STARTS]
+        return self._words
+
+    @property
+    def vocabulary(self) -> FrozenSet[str]:
+        if self._vocabulary is None:
+            self._vocabulary = frozenset(self.words)
+        return self._vocabulary
+
+    def first(self, kind: str) -> Optional[Entity]:
+        """The first entity of `kind`, if any"""
+        return self.firsts.get(kind)
+
+    def span_text(self, entity: Entity) -> str:
+        """The entity as written in the original message"""
+        # Spans index the lowercased text, which rarely differs in length
+        source = self.text if len(self.text) == len(self.lower) else self.lower
+        return source[entity.start:entity.end]
+
+
+def extract(text: str) -> Extraction:
+    """Tokenize `text` once into entities and words"""
+    return Extraction(text)
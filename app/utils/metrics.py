@@ -0,0 +1,247 @@
+"""In-process metrics with Prometheus text exposition.
+
+Counters and histograms are sharded per thread: a write only touches the
+calling thread's own dict, so recording never takes a lock or contends with
+other workers' threads. A scrape sums the shards. Values that already live
+elsewhere (cache stats, live sessions) are read at scrape time by collectors.
+"""
+import bisect
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+# Latency buckets in seconds (upper bounds; +Inf is implicit)
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# (name, type, help, [(label dict, value[, name suffix])])
+MetricFamily = Tuple[str, str, str, List[Tuple[Any, ...]]]
+
+
+class _Sharded:
+    """Per-thread dicts of label values -> state, merged only when read"""
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._shards: List[Dict[Tuple[str, ...], Any]] = []
+        self._shards_lock = threading.Lock()  # taken once per thread, on first write
+
+    def _shard(self) -> Dict[Tuple[str, ...], Any]:
+        shard: Dict[Tuple[str, ...], Any] | None = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def _snapshots(self) -> List[Dict[Tuple[str, ...], Any]]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        return [shard.copy() for shard in shards]
+
+
+class Counter(_Sharded):
+    """Monotonic counter, one series per label tuple"""
+
+    def __init__(self, name: str, help: str = "", labels: Iterable[str] = ()):
+        super().__init__()
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        shard = self._shard()
+        shard[label_values] = shard.get(label_values, 0.0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        merged: Dict[Tuple[str, ...], float] = {}
+        for shard in self._snapshots():
+            for labels, value in shard.items():
+                merged[labels] = merged.get(labels, 0.0) + value
+        return merged
+
+    def collect(self) -> List[MetricFamily]:
+        samples = [
+            (dict(zip(self.labels, labels, strict=True)), value)
+            for labels, value in sorted(self.values().items())
+        ]
+        return [(self.name, "counter", self.help, samples)]
+
+
+class Histogram(_Sharded):
+    """Fixed-bucket histogram, one series per label tuple"""
+
+    def __init__(
+        self,
+        name: str,
+        help: str = "",
+        labels: Iterable[str] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__()
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *label_values: str) -> None:
+        shard = self._shard()
+        # [per-bucket counts..., +Inf count, sum]
+        series = shard.get(label_values)
+        if series is None:
+            series = shard[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def series(self) -> Dict[Tuple[str, ...], List[float]]:
+        merged: Dict[Tuple[str, ...], List[float]] = {}
+        for shard in self._snapshots():
+            for labels, values in shard.items():
+                if labels in merged:
+                    merged[labels] = [a + b for a, b in zip(merged[labels], values, strict=True)]
+                else:
+                    merged[labels] = list(values)
+        return merged
+
+    def summary(self) -> Dict[str, Dict[str, float | None]]:
+        """Count, mean and bucket-estimated p50/p95 (ms) per series, for /health"""
+        result = {}
+        for labels, values in self.series().items():
+            counts, total = values[:-1], values[-1]
+            count = sum(counts)
+            if not count:
+                continue
+            result["/".join(labels)] = {
+                "count": count,
+                "mean_ms": round(total / count * 1000, 2),
+                "p50_ms": self._quantile_ms(counts, count, 0.5),
+                "p95_ms": self._quantile_ms(counts, count, 0.95),
+            }
+        return result
+
+    def _quantile_ms(self, counts: List[float], count: float, q: float) -> float | None:
+        # Upper bound of the bucket holding the q-th observation
+        rank = q * count
+        seen = 0.0
+        for i, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= rank:
+                return round(self.buckets[i] * 1000, 2) if i < len(self.buckets) else None
+        return None
+
+    def collect(self) -> List[MetricFamily]:
+        samples: List[Tuple[Any, ...]] = []
+        for labels, values in sorted(self.series().items()):
+            base = dict(zip(self.labels, labels, strict=True))
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), values[:-1], strict=True):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                samples.append(({**base, "le": le}, cumulative, "_bucket"))
+            samples.append((base, cumulative, "_count"))
+            samples.append((base, values[-1], "_sum"))
+        return [(self.name, "histogram", self.help, samples)]
+
+
+class MetricsRegistry:
+    """Owns the process's metrics and renders them in Prometheus text format"""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Counter | Histogram] = {}
+        self._collectors: List[Callable[[], List[MetricFamily]]] = []
+
+    def counter(self, name: str, help: str = "", labels: Iterable[str] = ()) -> Counter:
+        counter = Counter(name, help, labels)
+        self._register(counter)
+        return counter
+
+    def histogram(self, name: str, help: str = "", labels: Iterable[str] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        histogram = Histogram(name, help, labels, buckets)
+        self._register(histogram)
+        return histogram
+
+    def register_collector(self, collector: Callable[[], List[MetricFamily]]) -> None:
+        """Add a callback producing metric families from state read at scrape time"""
+        self._collectors.append(collector)
+
+    def _register(self, metric: Counter | Histogram) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        families = []
+        for metric in self._metrics.values():
+            families.extend(metric.collect())
+        for collector in self._collectors:
+            families.extend(collector())
+
+        lines = []
+        for name, kind, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample in samples:
+                labels, value = sample[0], sample[1]
+                suffix = sample[2] if len(sample) > 2 else ""
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+REGISTRY = MetricsRegistry()
+
+# HTTP, recorded by MetricsMiddleware
+request_latency = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Time from request start to the last response byte",
+    labels=("endpoint", "method", "status"),
+)
+
+# Per-turn graph timing, fed by ConversationGraph.run
+turn_latency = REGISTRY.histogram(
+    "graph_turn_duration_seconds", "Wall time of one conversation graph run"
+)
+node_latency = REGISTRY.histogram(
+    "graph_node_duration_seconds", "Wall time per graph node", labels=("node",)
+)
+node_dependency_latency = REGISTRY.histogram(
+    "graph_node_dependency_duration_seconds",
+    "Time a node spent waiting on the LLM or repositories",
+    labels=("node", "dependency"),
+)
+
+# LLM usage by call site (classify, help, smalltalk, fallback, lockout)
+llm_latency = REGISTRY.histogram(
+    "llm_call_duration_seconds",
+    "Upstream LLM request latency per graph call site, including retries and hedging",
+    labels=("call_site",),
+)
+llm_tokens = REGISTRY.counter(
+    "llm_tokens_total", "Tokens reported by the provider", labels=("call_site", "kind")
+)
+
+# Verification
+lockouts = REGISTRY.counter("verification_lockouts_total", "Sessions locked out after failed OTPs")
+lockout_rejections = REGISTRY.counter(
+    "verification_lockout_rejections_total", "Turns rejected with 429 during a lockout"
+)
@@ -1,6 +1,8 @@
 import re
 from datetime import date
 
+DOB_FORMAT = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})|(\d{1,2})([/-])(\d{1,2})\5(\d{4})")
+
 
 def normalize_phone_to_e164(phone_input: str) -> str:
     """Normalize phone input to E.164 format"""
@@ -20,22 +22,19 @@ def normalize_phone_to_e164(phone_input: str) -> str:
 
 def parse_dob(dob_input: str) -> date:
     """Parse date of birth from various formats to date object"""
-    # Try different formats
-    formats = [
-        "%Y-%m-%d",  # 1985-07-14
-        "%m/%d/%Y",  # 07/14/1985
-        "%m-%d-%Y",  # 07-14-1985
-        "%d/%m/%Y",  # 14/07/1985 (European)
-    ]
-
-    for fmt in formats:
-        try:
-            if fmt == "%Y-%m-%d":
-                return date.fromisoformat(dob_input)
-            else:
-                from datetime import datetime
-                return datetime.strptime(dob_input, fmt).date()
-        except (ValueError, TypeError):
-            continue
-
-    raise ValueError(f"Invalid date format: {dob_input}")
+    # 1985-07-14, 07/14/1985, 07-14-1985 or 14/07/1985 (European)
+    match = DOB_FORMAT.fullmatch(dob_input.strip())
+    if not match:
+        raise ValueError(f"Invalid date format: {dob_input}")
+
+    if match.group(1):
+        year, month, day = int(match.group(1)), int(match.group(2)), int(match.group(3))
+    else:
+        month, day, year = int(match.group(4)), int(match.group(6)), int(match.group(7))
+        if month > 12 and match.group(5) == "/":
+            month, day = day, month
+
+    try:
+        return date(year, month, day)
+    except ValueError:
+        raise ValueError(f"Invalid date format: {dob_input}") from None
@@ -4,6 +4,9 @@ from zoneinfo import ZoneInfo
 
 PST = ZoneInfo("America/Los_Angeles")
 
+SESSION_IDLE_TIMEOUT = timedelta(minutes=15)
+SESSION_ABSOLUTE_TIMEOUT = timedelta(minutes=30)
+
 
 def get_pst_now() -> datetime:
     """Get current time in PST"""
@@ -38,7 +41,7 @@ def create_session_expiry(now: datetime = None) -> tuple[datetime, datetime]:
     if now is None:
         now = get_pst_now()
 
-    idle_timeout = now + timedelta(minutes=15)
-    absolute_timeout = now + timedelta(minutes=30)
+    idle_timeout = now + SESSION_IDLE_TIMEOUT
+    absolute_timeout = now + SESSION_ABSOLUTE_TIMEOUT
 
     return idle_timeout, absolute_timeout
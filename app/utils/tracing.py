@@ -0,0 +1,126 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from app.utils.metrics import llm_latency, llm_tokens
+
+# Dependencies whose time is attributed to the node that called them
+DEPENDENCIES = ("llm", "repository")
+
+
+class TurnTrace:
+    """Node sequence of one graph run, with wall time per node and per dependency.
+
+    Node and turn times come from the compiled graph's hooks; dependency time
+    spent while a node runs accumulates until that node's hook closes its entry.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.total_seconds = 0.0
+        self.nodes: List[Dict[str, Any]] = []
+        self._pending = dict.fromkeys(DEPENDENCIES, 0.0)
+
+    def add(self, dependency: str, seconds: float) -> None:
+        self._pending[dependency] += seconds
+
+    def end_node(self, name: str, seconds: float) -> Dict[str, Any]:
+        """Close the entry of the node that just ran, with the dependency time it spent"""
+        entry = {"node": name, "seconds": seconds, **self._pending}
+        self.nodes.append(entry)
+        self._pending = dict.fromkeys(DEPENDENCIES, 0.0)
+        return entry
+
+    def to_dict(self) -> Dict[str, Any]:
+        def ms(seconds: float) -> float:
+            return round(seconds * 1000, 3)
+
+        return {
+            "path": [entry["node"].title() for entry in self.nodes],
+            "nodes": [
+                {
+                    "node": entry["node"],
+                    "ms": ms(entry["seconds"]),
+                    **{f"{dep}_ms": ms(entry[dep]) for dep in DEPENDENCIES},
+                }
+                for entry in self.nodes
+            ],
+            "total_ms": ms(self.total_seconds),
+            **{
+                f"{dep}_ms": ms(sum(entry[dep] for entry in self.nodes))
+                for dep in DEPENDENCIES
+            },
+        }
+
+
+# The trace of the graph run executing in this task, if any
+current_trace: ContextVar[Optional[TurnTrace]] = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def dependency_span(dependency: str) -> Iterator[None]:
+    """Attribute the wall time of the enclosed block to the running node"""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = trace.clock()
+    try:
+        yield
+    finally:
+        trace.add(dependency, trace.clock() - started)
+
+
+# The LLM call site ("classify", "help", ...) active in this task, for token accounting
+current_call_site: ContextVar[Optional[str]] = ContextVar("current_call_site", default=None)
+
+
+@contextmanager
+def llm_call(call_site: str) -> Iterator[None]:
+    """Time the enclosed LLM call as the running node's LLM time, tagged with its call site.
+
+    Cache hits, coalesced and rule answers pass through here too, so the
+    per-call-site latency histogram is recorded by the client, per upstream request.
+    """
+    token = current_call_site.set(call_site)
+    try:
+        with dependency_span("llm"):
+            yield
+    finally:
+        current_call_site.reset(token)
+
+
+def record_llm_latency(seconds: float) -> None:
+    """Observe one upstream LLM request against the current call site"""
+    llm_latency.observe(seconds, current_call_site.get() or "other")
+
+
+def record_llm_usage(usage: Any) -> None:
+    """Count provider-reported tokens against the current call site"""
+    if usage is None:
+        return
+    call_site = current_call_site.get() or "other"
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None)
+        if tokens:
+            llm_tokens.inc(call_site, kind, amount=tokens)
+
+
+class TracedProxy:
+    """Wraps an object so every method call counts as `dependency` time"""
+
+    def __init__(self, target: Any, dependency: str = "repository"):
+        self._target = target
+        self._dependency = dependency
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args: Any, **kwargs: Any) -> Any:
+            with dependency_span(self._dependency):
+                return attr(*args, **kwargs)
+
+        return call
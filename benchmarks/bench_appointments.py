@@ -0,0 +1,114 @@
+"""Load benchmark for SQLiteAppointmentRepository under concurrent workers.
+
+Seeds a clinic-sized table, then runs a mixed workload (list upcoming,
+confirm, cancel through AppointmentService) from a growing number of
+threads and reports throughput and per-operation latency percentiles.
+
+    uv run python -m benchmarks.bench_appointments --patients 20000 --threads 1 4 8
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from app.domain.models import Appointment, AppointmentStatus
+from app.repositories.sqlite_appointments import SQLiteAppointmentRepository
+from app.services.appointments import AppointmentService
+from app.utils.time import get_pst_now
+
+PROVIDERS = ["Dr. Lee", "Dr. Kim", "Dr. Patel", "Dr. Garcia"]
+
+
+def seed(repo: SQLiteAppointmentRepository, patients: int, per_patient: int) -> None:
+    now = get_pst_now()
+    batch = []
+    for p in range(patients):
+        for a in range(per_patient):
+            batch.append(
+                Appointment(
+                    appointment_id=f"a_{p}_{a}",
+                    patient_id=f"p_{p}",
+                    provider_name=PROVIDERS[a % len(PROVIDERS)],
+                    start_time=now + timedelta(days=random.randint(-60, 90), hours=a),
+                    location="Main Clinic",
+                    status=AppointmentStatus.scheduled,
+                )
+            )
+        if len(batch) >= 10_000:
+            repo.add_many(batch)
+            batch = []
+    if batch:
+        repo.add_many(batch)
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    return statistics.quantiles(samples, n=100)[int(pct) - 1] if len(samples) > 1 else samples[0]
+
+
+def run(service: AppointmentService, args, threads: int) -> None:
+    latencies: dict[str, list[float]] = defaultdict(list)
+    conflicts = 0
+
+    def one_op(_: int) -> tuple[str, float, bool]:
+        patient = random.randrange(args.patients)
+        roll = random.random()
+        start = time.perf_counter()
+        ok = True
+        try:
+            if roll < 0.8:
+                op = "list"
+                service.list_upcoming(f"p_{patient}", get_pst_now())
+            else:
+                appointment_id = f"a_{patient}_{random.randrange(args.per_patient)}"
+                if roll < 0.9:
+                    op = "confirm"
+                    service.confirm(appointment_id)
+                else:
+                    op = "cancel"
+                    service.cancel(appointment_id)
+        except ValueError:
+            ok = False  # lost a race or invalid transition; still a completed op
+        return op, (time.perf_counter() - start) * 1000, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for op, ms, ok in pool.map(one_op, range(args.ops)):
+            latencies[op].append(ms)
+            conflicts += not ok
+    elapsed = time.perf_counter() - start
+
+    print(f"\nthreads={threads}  {args.ops / elapsed:,.0f} ops/sec  rejected={conflicts}")
+    for op, samples in sorted(latencies.items()):
+        print(
+            f"  {op:<8} n={len(samples):<6} p50={percentile(samples, 50):.3f}ms "
+            f"p95={percentile(samples, 95):.3f}ms p99={percentile(samples, 99):.3f}ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=10_000)
+    parser.add_argument("--per-patient", type=int, default=10)
+    parser.add_argument("--ops", type=int, default=20_000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = SQLiteAppointmentRepository(
+            os.path.join(tmp, "appointments.db"), pool_size=max(args.threads)
+        )
+        start = time.perf_counter()
+        seed(repo, args.patients, args.per_patient)
+        print(f"seeded {repo.count():,} appointments in {time.perf_counter() - start:.1f}s")
+
+        service = AppointmentService(repo)
+        for threads in args.threads:
+            run(service, args, threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Microbenchmark of per-message entity extraction for verification and routing.
+
+Runs a corpus of real-world phrasings (identity details in many formats,
+OTP codes, yes/no replies, ordinal, date, time and provider references,
+greetings) through what verify_node and the rule classifier each do with a
+message. The current path tokenizes once with app.utils.extraction; the
+previous one, reproduced below, ran separate phone/DOB/OTP regexes, tried
+DOB formats through exception handling and lowercased and keyword-scanned
+the message again in the classifier.
+
+Each node is timed on the messages it actually receives: verify_node on
+unverified turns (identity details, codes, confirmations), the classifier
+on verified ones. Reports microseconds per message for each node and lists
+the messages whose results differ between the two paths.
+
+    uv run python -m benchmarks.bench_extraction --rounds 2000
+"""
+import argparse
+import re
+import time
+from datetime import date, datetime
+from types import SimpleNamespace
+from app.llm.rules import _score, classify_by_rules
+from app.utils.extraction import ORDINAL_WORDS, extract
+
+# Unverified turns, handled by verify_node
+VERIFY_CORPUS = [
+    # Identity details
+    "My phone is (415) 555-0123 and DOB is 07/14/1985",
+    "415-555-0123, born 1985-07-14",
+    "phone 415.555.0999 dob 02/01/1990",
+    "4155550123 07-14-1985",
+    "it's 415 555 0123",
+    "my date of birth is 14/07/1985",
+    "dob 07/14/85",
+    "Hi, I'm John, my number is (415)555-0123",
+    "I was born on 02/30/1985",
+    "call me at +1 415-555-0123 please",
+    # OTP codes and confirmations
+    "482913",
+    "the code is 105 not 105992, sorry: 105992",
+    "Yes",
+    "yes that's me",
+    "yeah that is correct",
+    "no, that's incorrect",
+    "not me",
+]
+# Verified turns, routed by the rule classifier
+ROUTING_CORPUS = [
+    "list my appointments",
+    "show me my upcoming appointments please",
+    "confirm #2",
+    "Confirm the first one",
+    "cancel my appointment with Dr. Kim",
+    "cancel my Oct 21st appointment",
+    "confirm the 2 PM one",
+    "can you cancel tomorrow morning's visit",
+    "confirm my appointment on the 2nd of October at 10:30am",
+    "confirm #1 and cancel #2",
+    "confirm the first and third, cancel the second",
+    "I don't want to cancel anything",
+    "I need help with my appointments",
+    "help",
+    "hello",
+    "thank you so much",
+    "good morning!",
+    "which one is this",
+    "something random",
+    "can I reschedule to next week",
+    "is the clinic open on saturday",
+]
+
+
+# Previous extraction, reproduced for comparison
+def legacy_parse_dob(dob_input: str) -> date:
+    for fmt in ["%Y-%m-%d", "%m/%d/%Y", "%m-%d-%Y", "%d/%m/%Y"]:
+        try:
+            if fmt == "%Y-%m-%d":
+                return date.fromisoformat(dob_input)
+            return datetime.strptime(dob_input, fmt).date()
+        except (ValueError, TypeError):
+            continue
+    raise ValueError(f"Invalid date format: {dob_input}")
+
+
+def legacy_verify(message: str) -> tuple:
+    user_msg = message.lower()
+    otp_match = re.search(r"\b\d{6}\b", message)
+    phone_match = re.search(r"\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}", message)
+    dob_match = re.search(r"\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{4}[/-]\d{1,2}[/-]\d{1,2}", message)
+    phone = "+1" + re.sub(r"\D", "", phone_match.group())[-10:] if phone_match else None
+    dob = None
+    if dob_match:
+        try:
+            dob = legacy_parse_dob(dob_match.group())
+        except ValueError:
+            pass
+    affirmed = "yes" in user_msg or "correct" in user_msg or "that's me" in user_msg
+    return otp_match.group() if otp_match else None, phone, dob, affirmed
+
+
+LEGACY_ACTION_TOKEN = re.compile(r"\b(confirm|cancel)\b|#(\d+)|\b(first|1st|second|2nd|third|3rd)\b")
+
+
+def legacy_classify(message: str) -> tuple:
+    user_lower = message.lower()
+    ordinal = None
+    if "#" in message:
+        match = re.search(r"#(\d+)", message)
+        if match:
+            ordinal = int(match.group(1))
+    elif any(word in user_lower for word in ["first", "1st"]):
+        ordinal = 1
+    elif any(word in user_lower for word in ["second", "2nd"]):
+        ordinal = 2
+    elif any(word in user_lower for word in ["third", "3rd"]):
+        ordinal = 3
+
+    actions, action = [], None
+    for verb, number, word in LEGACY_ACTION_TOKEN.findall(message.lower()):
+        if verb:
+            action = verb
+        elif action:
+            actions.append({"action": action, "ordinal": int(number) if number else ORDINAL_WORDS[word]})
+
+    if len(actions) > 1:
+        result = {"intent": "batch_actions", "entities": {"ordinal": None, "date": None, "time": None, "provider": None, "actions": actions}}
+    else:
+        if "list" in user_lower or "show" in user_lower or "appointments" in user_lower:
+            intent = "list_appointments"
+        elif "confirm" in user_lower:
+            intent = "confirm_appointment"
+        elif "cancel" in user_lower:
+            intent = "cancel_appointment"
+        elif "help" in user_lower:
+            intent = "help"
+        elif any(word in user_lower for word in ["hello", "hi", "thanks", "thank you", "good"]) and "random" not in user_lower:
+            intent = "smalltalk"
+        else:
+            intent = "fallback"
+        result = {"intent": intent, "entities": {"ordinal": ordinal, "date": None, "time": None, "provider": None}}
+
+    # The confidence score tokenized the message once more; scoring itself is unchanged
+    words = re.findall(r"[a-z']+", message.lower())
+    tokens = SimpleNamespace(words=words, vocabulary=set(words))
+    return result["intent"], result["entities"]["ordinal"], _score(tokens, result)
+
+
+def current_verify(message: str) -> tuple:
+    extraction = extract(message)
+    otp, phone, dob, affirm = (extraction.first(kind) for kind in ("otp", "phone", "dob", "affirm"))
+    return (
+        otp.value if otp else None,
+        phone.value if phone else None,
+        dob.value if dob else None,
+        bool(affirm and affirm.value),
+    )
+
+
+def current_classify(message: str) -> tuple:
+    result = classify_by_rules(message)
+    return result["intent"], result["entities"]["ordinal"], result["confidence"]
+
+
+def measure(handlers: tuple, corpus: list, rounds: int, repeats: int = 7) -> list:
+    """Best of `repeats` timings per handler, in microseconds per message.
+
+    Handlers take turns within each repeat so machine noise hits them alike.
+    """
+    for handler in handlers:
+        for message in corpus:
+            handler(message)
+    best = [float("inf")] * len(handlers)
+    for _ in range(repeats):
+        for index, handler in enumerate(handlers):
+            started = time.perf_counter()
+            for _ in range(rounds):
+                for message in corpus:
+                    handler(message)
+            best[index] = min(best[index], time.perf_counter() - started)
+    return [elapsed / (rounds * len(corpus)) * 1e6 for elapsed in best]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    nodes = (
+        ("verify", VERIFY_CORPUS, legacy_verify, current_verify),
+        ("rules", ROUTING_CORPUS, legacy_classify, current_classify),
+    )
+    print(f"{args.rounds} rounds")
+    for node, corpus, legacy, current in nodes:
+        before, after = measure((legacy, current), corpus, args.rounds)
+        print(f"{node:>7}: {len(corpus):3d} messages, {before:6.1f} -> {after:6.1f} us/message ({before / after:.2f}x)")
+
+    print("\nResults that differ (previous -> current):")
+    for node, corpus, legacy, current in nodes:
+        for message in corpus:
+            if legacy(message) != current(message):
+                print(f"  {node}: {message!r}: {legacy(message)} -> {current(message)}")
+
+
+if __name__ == "__main__":
+    main()
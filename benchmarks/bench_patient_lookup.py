@@ -0,0 +1,74 @@
+"""Patient lookup cost by (phone, DOB) as the roster grows from 1k to 1M.
+
+    uv run python -m benchmarks.bench_patient_lookup
+    uv run python -m benchmarks.bench_patient_lookup --sizes 1000 100000 --scan
+"""
+import argparse
+import random
+import timeit
+from functools import partial
+from datetime import date, timedelta
+from app.domain.models import Patient
+from app.repositories.mock_patients import MockPatientRepository
+
+LOOKUPS = 10_000
+
+
+def build_repo(size: int) -> MockPatientRepository:
+    repo = MockPatientRepository()
+    epoch = date(1940, 1, 1)
+    for i in range(size):
+        repo.add(
+            Patient.model_construct(
+                patient_id=f"bench_{i}",
+                full_name=f"Patient {i}",
+                phone_e164=f"+1{2000000000 + i}",
+                dob=epoch + timedelta(days=i % 25_000),
+            )
+        )
+    return repo
+
+
+def linear_scan(repo: MockPatientRepository, phone_e164: str, dob: date) -> list[Patient]:
+    return [
+        p for p in repo.patients.values() if p.phone_e164 == phone_e164 and p.dob == dob
+    ]
+
+
+def indexed_lookups(repo: MockPatientRepository, targets: list[tuple[str, date]]) -> None:
+    for phone, dob in targets:
+        repo.find_by_phone_and_dob(phone, dob)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--scan", action="store_true", help="also time a linear scan")
+    args = parser.parse_args()
+
+    print(f"{'patients':>10} {'index ns/op':>12} {'scan ns/op':>12}")
+    for size in args.sizes:
+        repo = build_repo(size)
+        targets = [
+            (p.phone_e164, p.dob) for p in random.sample(list(repo.patients.values()), 100)
+        ]
+
+        # Bound explicitly, so each size times its own roster and keys
+        index_ns = timeit.timeit(
+            partial(indexed_lookups, repo, targets), number=LOOKUPS // 100
+        ) / LOOKUPS * 1e9
+
+        scan = "-"
+        if args.scan:
+            phone, dob = targets[0]
+            runs = max(1, 1_000_000 // size)
+            scan_ns = timeit.timeit(partial(linear_scan, repo, phone, dob), number=runs)
+            scan = f"{scan_ns / runs * 1e9:.0f}"
+
+        print(f"{size:>10} {index_ns:>12.0f} {scan:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Session store throughput as worker processes scale from 1 to N.
+
+Each worker process simulates the session half of a /chat turn against the
+shared SQLite repository: load the session through SessionService, update it
+and persist the turn (a journaled delta, compacted on schedule).
+
+This measures the storage layer only. HTTP, the conversation graph and the
+LLM are left out, so the numbers bound /chat throughput across uvicorn
+workers rather than measure it; use benchmarks.load_chat for full turns.
+
+    uv run python -m benchmarks.bench_session_workers --workers 8 --turns 2000
+"""
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+from app.domain.models import ConversationTurn
+from app.repositories.sqlite_session import SQLiteSessionRepository
+from app.services.sessions import SessionService
+from app.utils.time import get_pst_now
+
+SESSIONS_PER_WORKER = 50
+
+
+def run_worker(db_path: str, worker_id: int, turns: int, barrier) -> None:
+    session_service = SessionService(SQLiteSessionRepository(db_path, pool_size=1))
+    session_ids = [f"w{worker_id}_s{i}" for i in range(SESSIONS_PER_WORKER)]
+
+    barrier.wait()
+    for turn in range(turns):
+        session_id = session_ids[turn % SESSIONS_PER_WORKER]
+        state = session_service.load(session_id)
+        state.last_intent = "list"
+        session_service.save(
+            state,
+            ConversationTurn(
+                user_message="List my appointments",
+                assistant_message="Here are your upcoming appointments (PST): ...",
+                timestamp=get_pst_now(),
+            ),
+        )
+
+
+def measure(db_path: str, workers: int, turns: int) -> float:
+    """Return aggregate turns/sec for the given number of worker processes"""
+    barrier = mp.Barrier(workers + 1)
+    procs = [
+        mp.Process(target=run_worker, args=(db_path, i, turns, barrier))
+        for i in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    for proc in procs:
+        proc.join()
+    elapsed = time.perf_counter() - start
+
+    return workers * turns / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--turns", type=int, default=1000, help="turns per worker")
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'turns/sec':>12} {'speedup':>8}")
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in range(1, args.workers + 1):
+            db_path = os.path.join(tmp, f"sessions_{workers}.db")
+            SQLiteSessionRepository(db_path)  # create schema before forking
+            rate = measure(db_path, workers, args.turns)
+            baseline = baseline or rate
+            print(f"{workers:>8} {rate:>12.0f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Microbenchmark of the per-turn state plumbing around the graph.
+
+Times what /chat does besides running nodes: decode the stored session,
+set up the turn state, let a node write a reply, produce the journal delta
+and serialize the ChatResponse. The current path (one __slots__ GraphState,
+validated models only at the API boundary) is compared with the previous
+one, reproduced below: a validated SessionState copied into a pydantic
+GraphState and back, then a ChatResponse that FastAPI dumped and validated
+again before serializing.
+
+Reports CPU time per turn and the median peak of memory traced while a
+turn runs (what it allocates on top of the stored session).
+
+    uv run python -m benchmarks.bench_turn_state --turns 20000
+"""
+import argparse
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from app.api.schemas import AssistantResponse, ChatResponse, MetaResponse, StateResponse
+from app.domain.models import (
+    ConversationTurn,
+    PatientPublic,
+    SessionState,
+    VerificationState,
+)
+from app.domain.state import GraphState
+from app.services.sessions import CONTEXT_HISTORY_TURNS, SCALAR_FIELDS
+from app.utils.time import get_pst_now
+
+REPLY = "You have 2 upcoming appointments:\n1. Dr. Lee - Mon Jan 12 at 10:00 AM\n2. Dr. Kim - Tue Jan 13 at 2:30 PM"
+
+
+class LegacyGraphState(BaseModel):
+    """GraphState as a validated pydantic model, before the unified turn state"""
+
+    session_id: str
+    verified: bool = False
+    patient_id: Optional[str] = None
+    patient_public: PatientPublic = PatientPublic()
+    verification: VerificationState = VerificationState()
+    last_list_snapshot: List[Dict] = []
+    last_intent: Optional[str] = None
+    now: datetime
+    user_message: str
+    assistant_message: str = ""
+    suggestions: List[str] = []
+    next_action: Optional[str] = None
+    phone_input: Optional[str] = None
+    dob_input: Optional[str] = None
+    conversation_history: List[ConversationTurn] = []
+
+
+def stored_session(now: datetime) -> tuple[dict, list[dict]]:
+    """A verified session snapshot with a few journaled turns, as the store returns it"""
+    record = SessionState(
+        session_id="bench",
+        verified=True,
+        patient_id="p_001",
+        patient_public=PatientPublic(
+            patient_id="p_001", name_masked="J*** D**", phone_masked="***-***-0123", dob_masked="**/**/1985"
+        ),
+        last_list_snapshot=[
+            {"ordinal": 1, "appointment_id": "a_001"},
+            {"ordinal": 2, "appointment_id": "a_002"},
+        ],
+        last_intent="list",
+        last_activity=now,
+        expires_at=now + timedelta(minutes=30),
+    ).model_dump(mode="json")
+    turns = [
+        ConversationTurn(user_message=f"message {i}", assistant_message=REPLY, timestamp=now).model_dump(mode="json")
+        for i in range(CONTEXT_HISTORY_TURNS)
+    ]
+    record["conversation_history"] = turns[:2]
+    deltas = [{"fields": {"last_activity": record["last_activity"]}, "turn": turn} for turn in turns[2:]]
+    return record, deltas
+
+
+def merge(record: dict, deltas: list[dict]) -> tuple[dict, list[dict]]:
+    fields = {key: record[key] for key in SCALAR_FIELDS if key in record}
+    recent = list(record["conversation_history"][-CONTEXT_HISTORY_TURNS:])
+    for delta in deltas:
+        fields.update(delta["fields"])
+        recent.append(delta["turn"])
+    return fields, recent[-CONTEXT_HISTORY_TURNS:]
+
+
+def response_for(state, turn_state, session_id: str, now: datetime) -> ChatResponse:
+    return ChatResponse(
+        assistant=AssistantResponse(
+            message=turn_state.assistant_message, suggestions=turn_state.suggestions
+        ),
+        state=StateResponse(
+            verified=state.verified,
+            verification=state.verification,
+            patient=state.patient_public,
+            last_list_snapshot=state.last_list_snapshot,
+            session={
+                "last_activity": state.last_activity.isoformat(),
+                "expires_at": state.expires_at.isoformat(),
+            },
+        ),
+        meta=MetaResponse(session_id=session_id, turn_id=str(uuid.uuid4()), timestamp=now.isoformat()),
+    )
+
+
+def legacy_turn(record: dict, deltas: list[dict], message: str, now: datetime) -> tuple[dict, str]:
+    fields, recent = merge(record, deltas)
+    session = SessionState(**fields, conversation_history=recent)
+    session.last_activity = now
+
+    graph = LegacyGraphState(
+        session_id=session.session_id,
+        verified=session.verified,
+        patient_id=session.patient_id,
+        patient_public=session.patient_public,
+        verification=session.verification,
+        last_list_snapshot=session.last_list_snapshot,
+        last_intent=session.last_intent,
+        now=now,
+        user_message=message,
+        phone_input=session.phone_input,
+        dob_input=session.dob_input,
+        conversation_history=session.conversation_history,
+    )
+    graph.assistant_message = REPLY
+    graph.suggestions = ["Confirm #1", "Cancel #2"]
+
+    session.verified = graph.verified
+    session.patient_id = graph.patient_id
+    session.patient_public = graph.patient_public
+    session.verification = graph.verification
+    session.last_list_snapshot = graph.last_list_snapshot
+    session.last_intent = graph.last_intent
+    session.phone_input = graph.phone_input
+    session.dob_input = graph.dob_input
+
+    turn = ConversationTurn(user_message=message, assistant_message=graph.assistant_message, timestamp=now)
+    session.conversation_history = (session.conversation_history + [turn])[-CONTEXT_HISTORY_TURNS:]
+    delta = {"fields": session.model_dump(include=SCALAR_FIELDS), "turn": turn.model_dump()}
+
+    response = response_for(session, graph, session.session_id, now)
+    # FastAPI's response_model handling: dump, validate again, serialize
+    body = ChatResponse.model_validate(response.model_dump()).model_dump_json()
+    return delta, body
+
+
+def unified_turn(record: dict, deltas: list[dict], message: str, now: datetime) -> tuple[dict, str]:
+    fields, recent = merge(record, deltas)
+    state = GraphState.from_record(fields, recent, now, message)
+
+    state.assistant_message = REPLY
+    state.suggestions = ["Confirm #1", "Cancel #2"]
+
+    turn = ConversationTurn.model_construct(user_message=message, assistant_message=state.assistant_message, timestamp=now)
+    state.conversation_history = (state.conversation_history + [turn])[-CONTEXT_HISTORY_TURNS:]
+    delta = {"fields": state.session_fields(), "turn": turn.model_dump()}
+
+    body = response_for(state, state, state.session_id, now).model_dump_json()
+    return delta, body
+
+
+def measure(turn, record: dict, deltas: list[dict], turns: int, now: datetime) -> dict:
+    for _ in range(min(turns, 500)):
+        turn(record, deltas, "list my appointments", now)
+
+    started = time.process_time()
+    for _ in range(turns):
+        turn(record, deltas, "list my appointments", now)
+    cpu = time.process_time() - started
+
+    tracemalloc.start()
+    peaks = []
+    for _ in range(min(turns, 2000)):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        turn(record, deltas, "list my appointments", now)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    return {
+        "us_per_turn": round(cpu / turns * 1e6, 1),
+        "peak_kib_per_turn": round(sorted(peaks)[len(peaks) // 2] / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20000)
+    args = parser.parse_args()
+
+    now = get_pst_now()
+    record, deltas = stored_session(now)
+
+    # Both paths must produce the same journal delta and response body
+    legacy_delta, legacy_body = legacy_turn(record, deltas, "hi", now)
+    unified_delta, unified_body = unified_turn(record, deltas, "hi", now)
+    assert legacy_delta["fields"].keys() == unified_delta["fields"].keys()
+    assert legacy_body.split('"turn_id"')[0] == unified_body.split('"turn_id"')[0]
+
+    print(f"{'path':<10}{'us/turn':>10}{'peak KiB':>10}")
+    for name, turn in (("legacy", legacy_turn), ("unified", unified_turn)):
+        result = measure(turn, record, deltas, args.turns, now)
+        print(f"{name:<10}{result['us_per_turn']:>10}{result['peak_kib_per_turn']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""OpenAI-compatible fake chat-completions server for offline load testing.
+
+Speaks the /v1/chat/completions wire format (JSON and SSE streaming), so the
+real AsyncOpenAILLMClient path - HTTP, retries, hedging, circuit breaker -
+runs without a provider. Classification prompts are answered by the keyword
+rules; chat prompts get MockLLMClient replies. Latency follows a configurable
+distribution and errors can be injected.
+
+    uv run python -m benchmarks.fake_llm_server --port 8100 \
+        --latency lognormal:median=0.4,sigma=0.6 --error-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 uv run uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.llm.mock_client import MockLLMClient
+from app.llm.rules import fallback_classify
+
+
+class LatencyDistribution:
+    """Samples delays in seconds, parsed from specs like 'lognormal:median=0.4,sigma=0.6'"""
+
+    KINDS = {
+        "fixed": ("seconds",),
+        "uniform": ("low", "high"),
+        "lognormal": ("median", "sigma"),
+        "exponential": ("mean",),
+    }
+
+    def __init__(self, kind: str, **params: float):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        missing = set(self.KINDS[kind]) - set(params)
+        if missing:
+            raise ValueError(f"{kind} latency needs {', '.join(sorted(missing))}")
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        kind, _, args = spec.partition(":")
+        params = {}
+        for pair in filter(None, args.split(",")):
+            name, _, value = pair.partition("=")
+            params[name.strip()] = float(value)
+        if kind == "fixed" and not params:
+            params["seconds"] = 0.0
+        return cls(kind, **params)
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            return p["seconds"]
+        if self.kind == "uniform":
+            return rng.uniform(p["low"], p["high"])
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(p["median"]), p["sigma"])
+        return rng.expovariate(1 / p["mean"])
+
+
+@dataclass
+class FakeServerConfig:
+    latency: LatencyDistribution = field(
+        default_factory=lambda: LatencyDistribution("fixed", seconds=0.0)
+    )
+    token_delay: float = 0.0  # between streamed chunks
+    error_rate: float = 0.0  # fraction answered with `error_status`
+    error_status: int = 503
+    hang_rate: float = 0.0  # fraction that never answer within `hang_seconds`
+    hang_seconds: float = 60.0
+    seed: int | None = None
+
+
+CURRENT_MESSAGE = re.compile(r"Current user message: (.*)")
+ASSISTANT_LINE = re.compile(r"^Assistant: (.*)$", re.MULTILINE)
+
+
+def _classify_section(section: str) -> dict:
+    message = CURRENT_MESSAGE.search(section).group(1).strip()
+    assistant_lines = ASSISTANT_LINE.findall(section)
+    history = (
+        [{"user_message": "", "assistant_message": assistant_lines[-1]}]
+        if assistant_lines
+        else None
+    )
+    return fallback_classify(message, history)
+
+
+def answer(messages: list[dict]) -> str:
+    """Reply text for a request, mimicking what the real prompts expect back"""
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+
+    if "### Conversation" in system:
+        sections = system.split("### Conversation")[1:]
+        return json.dumps([_classify_section(section) for section in sections])
+    if CURRENT_MESSAGE.search(system):
+        return json.dumps(_classify_section(system))
+    return MockLLMClient().chat(system, user)
+
+
+def _count_tokens(text: str) -> int:
+    # Roughly what a BPE tokenizer produces for English text
+    return max(1, math.ceil(len(text) / 4))
+
+
+def create_app(config: FakeServerConfig | None = None) -> FastAPI:
+    config = config or FakeServerConfig()
+    rng = random.Random(config.seed)
+    stats: Counter[str] = Counter()
+    app = FastAPI(title="Fake LLM server")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+
+        roll = rng.random()
+        if roll < config.error_rate:
+            stats["errors_injected"] += 1
+            await asyncio.sleep(config.latency.sample(rng))
+            return JSONResponse(
+                {"error": {"message": "Injected failure", "type": "server_error"}},
+                status_code=config.error_status,
+            )
+        if roll < config.error_rate + config.hang_rate:
+            stats["hangs_injected"] += 1
+            await asyncio.sleep(config.hang_seconds)
+
+        content = answer(body["messages"])
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = body.get("model", "fake-model")
+        prompt_tokens = sum(_count_tokens(m["content"]) for m in body["messages"])
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": _count_tokens(content),
+            "total_tokens": prompt_tokens + _count_tokens(content),
+        }
+
+        # The sampled latency is the time to the first byte of the answer
+        await asyncio.sleep(config.latency.sample(rng))
+
+        if not body.get("stream"):
+            stats["completions"] += 1
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        async def events():
+            def chunk(delta: dict | None, finish_reason: str | None = None, **extra) -> str:
+                payload = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": (
+                        [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                        if delta is not None
+                        else []
+                    ),
+                    **extra,
+                }
+                return f"data: {json.dumps(payload)}\n\n"
+
+            yield chunk({"role": "assistant", "content": ""})
+            for i, token in enumerate(re.findall(r"\S+\s*", content)):
+                if i and config.token_delay:
+                    await asyncio.sleep(config.token_delay)
+                yield chunk({"content": token})
+            yield chunk({}, finish_reason="stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield chunk(None, usage=usage)
+            yield "data: [DONE]\n\n"
+            stats["streams"] += 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    def get_stats():
+        return dict(stats)
+
+    app.state.stats = stats
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument(
+        "--latency",
+        default="lognormal:median=0.4,sigma=0.5",
+        help="fixed:seconds=S | uniform:low=A,high=B | lognormal:median=M,sigma=S | exponential:mean=M",
+    )
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = FakeServerConfig(
+        latency=LatencyDistribution.parse(args.latency),
+        token_delay=args.token_delay,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        hang_rate=args.hang_rate,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""In-process load generator for the chat API.
+
+Drives the FastAPI app over ASGI (no sockets) with scripted multi-turn
+conversations - the demo.sh flow, the OTP lockout path and smalltalk - from
+N concurrent virtual patients. Reports throughput and p50/p95/p99 latency
+per endpoint and per graph node (from the turn traces, including the LLM and
+repository share of each node), and writes the numbers to a JSON file.
+
+The LLM is either the zero-latency mock or the real OpenAI client talking to
+the in-process fake server (benchmarks.fake_llm_server) with a latency
+distribution, so network behavior (retries, coalescing, caches) is included.
+
+    uv run python -m benchmarks.load_chat --patients 50 --conversations 4 \
+        --llm fake --llm-latency lognormal:median=0.2,sigma=0.5 --out load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import Counter, defaultdict
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import httpx  # noqa: E402
+
+from app.llm import client as llm  # noqa: E402
+
+DEMO_PHONE_DOB = "My phone is (415) 555-0123 and DOB is 07/14/1985"
+
+SCENARIOS = {
+    # Mirrors demo.sh: greet, verify, confirm name, list, confirm #1
+    "demo": [
+        "Hi",
+        DEMO_PHONE_DOB,
+        "Yes, that's me",
+        "List my appointments",
+        "Confirm #1",
+    ],
+    # Three failed matches trigger OTP, three wrong codes lock the session
+    "otp_lockout": [
+        "My phone is (415) 555-0123 and DOB is 01/01/1990",
+        "Please try again",
+        "One more time",
+        "000000",
+        "111111",
+        "222222",
+        "Hello?",  # rejected with 429 while locked out
+    ],
+    "smalltalk": [
+        DEMO_PHONE_DOB,
+        "Yes, that's me",
+        "Hello!",
+        "What can you do?",
+        "Thanks so much",
+        "Tell me a joke",
+    ],
+}
+
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+def summarize(samples: list[float]) -> dict:
+    return {
+        "count": len(samples),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 2),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 2),
+    }
+
+
+def record_trace(trace: dict | None, node_samples: dict[str, list[float]]) -> None:
+    """Collect per-node wall time (and its LLM/repository share) from a turn trace"""
+    for entry in (trace or {}).get("nodes", []):
+        node_samples[entry["node"]].append(entry["ms"] / 1000)
+        for dependency in ("llm", "repository"):
+            if entry[f"{dependency}_ms"]:
+                node_samples[f"{entry['node']} ({dependency})"].append(entry[f"{dependency}_ms"] / 1000)
+
+
+def install_llm(mode: str, latency: str, error_rate: float) -> None:
+    if mode == "mock":
+        from app.llm.mock_client import AsyncMockLLMClient
+
+        llm.llm_client = AsyncMockLLMClient()
+        return
+
+    from benchmarks.fake_llm_server import FakeServerConfig, LatencyDistribution, create_app
+
+    os.environ["OPENAI_BASE_URL"] = "http://fake-llm/v1"
+    fake = create_app(
+        FakeServerConfig(
+            latency=LatencyDistribution.parse(latency),
+            error_rate=error_rate,
+        )
+    )
+    http_client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=fake),
+        limits=httpx.Limits(max_connections=None),
+    )
+    llm.llm_client = llm.build_llm_client(llm.AsyncOpenAILLMClient(http_client=http_client))
+
+
+async def send_turn(
+    client: httpx.AsyncClient,
+    session_id: str,
+    message: str,
+    stream: bool,
+    endpoint_samples: dict[str, list[float]],
+    node_samples: dict[str, list[float]],
+    statuses: Counter,
+) -> None:
+    payload = {"session_id": session_id, "message": message, "trace": True}
+    endpoint = "/chat/stream" if stream else "/chat"
+    started = time.perf_counter()
+    if stream:
+        async with client.stream("POST", endpoint, json=payload) as response:
+            first_token = None
+            event = None
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                    if first_token is None and event == "token":
+                        first_token = time.perf_counter() - started
+                elif line.startswith("data: ") and event == "done":
+                    record_trace(json.loads(line[len("data: "):]).get("trace"), node_samples)
+            status = response.status_code
+        if first_token is not None:
+            endpoint_samples["/chat/stream (first token)"].append(first_token)
+    else:
+        response = await client.post(endpoint, json=payload)
+        status = response.status_code
+        if status == 200:
+            record_trace(response.json().get("trace"), node_samples)
+
+    endpoint_samples[endpoint].append(time.perf_counter() - started)
+    statuses[f"{endpoint} {status}"] += 1
+
+
+async def virtual_patient(
+    index: int,
+    client: httpx.AsyncClient,
+    scenarios: list[str],
+    conversations: int,
+    stream_every: int,
+    endpoint_samples: dict[str, list[float]],
+    node_samples: dict[str, list[float]],
+    statuses: Counter,
+) -> int:
+    turns = 0
+    for n in range(conversations):
+        scenario = scenarios[(index + n) % len(scenarios)]
+        session_id = f"load-{scenario}-{uuid.uuid4().hex[:12]}"
+        for message in SCENARIOS[scenario]:
+            turns += 1
+            stream = bool(stream_every) and turns % stream_every == 0
+            await send_turn(
+                client, session_id, message, stream, endpoint_samples, node_samples, statuses
+            )
+    return turns
+
+
+async def run(args: argparse.Namespace) -> dict:
+    install_llm(args.llm, args.llm_latency, args.llm_error_rate)
+
+    from app.main import app
+
+    node_samples: dict[str, list[float]] = defaultdict(list)
+    endpoint_samples: dict[str, list[float]] = defaultdict(list)
+    statuses: Counter = Counter()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        turns = await asyncio.gather(*(
+            virtual_patient(
+                i, client, args.scenarios, args.conversations,
+                args.stream_every, endpoint_samples, node_samples, statuses,
+            )
+            for i in range(args.patients)
+        ))
+        elapsed = time.perf_counter() - started
+
+        health = (await client.get("/health")).json()
+
+    total_turns = sum(turns)
+    return {
+        "config": {
+            "patients": args.patients,
+            "conversations": args.conversations,
+            "scenarios": args.scenarios,
+            "llm": args.llm,
+            "llm_latency": args.llm_latency if args.llm == "fake" else None,
+            "stream_every": args.stream_every,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "turns": total_turns,
+        "throughput_turns_per_s": round(total_turns / elapsed, 1),
+        "statuses": dict(statuses),
+        "endpoints": {name: summarize(s) for name, s in sorted(endpoint_samples.items())},
+        "nodes": {name: summarize(s) for name, s in sorted(node_samples.items())},
+        "routing": health.get("routing", {}),
+        "llm": health.get("llm", {}),
+    }
+
+
+def print_report(result: dict) -> None:
+    print(
+        f"{result['turns']} turns in {result['elapsed_s']}s "
+        f"-> {result['throughput_turns_per_s']} turns/s"
+    )
+    print(f"statuses: {result['statuses']}")
+    for section in ("endpoints", "nodes"):
+        print(f"\n{section:<28}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for name, s in result[section].items():
+            print(f"{name:<28}{s['count']:>8}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=20, help="concurrent virtual patients")
+    parser.add_argument("--conversations", type=int, default=3, help="conversations per patient")
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=sorted(SCENARIOS), default=sorted(SCENARIOS)
+    )
+    parser.add_argument("--llm", choices=["mock", "fake"], default="mock")
+    parser.add_argument("--llm-latency", default="lognormal:median=0.2,sigma=0.5")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--stream-every", type=int, default=0,
+        help="send every Nth turn to /chat/stream (0: never)",
+    )
+    parser.add_argument("--out", default="load_results.json")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nwrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
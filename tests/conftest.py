@@ -0,0 +1,12 @@
+import pytest
+from app.llm.mock_client import AsyncMockLLMClient
+import app.llm.client
+
+
+@pytest.fixture(autouse=True)
+def mock_llm_client():
+    """Replace the global LLM client with mock for testing"""
+    original_client = app.llm.client.llm_client
+    app.llm.client.llm_client = AsyncMockLLMClient()
+    yield app.llm.client.llm_client
+    app.llm.client.llm_client = original_client
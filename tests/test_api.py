@@ -0,0 +1,236 @@
+import asyncio
+import json
+import time
+import uuid
+import httpx
+import pytest
+from app.llm.client import AsyncOpenAILLMClient
+from app.llm.mock_client import AsyncMockLLMClient
+from app.llm.resilience import CircuitBreaker
+from app.api.router import appointment_repo, conversation_graph
+from app.main import app
+
+
+class SlowMockLLMClient(AsyncMockLLMClient):
+    """Mock client that simulates network latency without holding a thread"""
+
+    async def chat(self, system_prompt: str, user_message: str) -> str:
+        await asyncio.sleep(0.2)
+        return await super().chat(system_prompt, user_message)
+
+
+@pytest.fixture
+def client():
+    transport = httpx.ASGITransport(app=app)
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+async def verify_session(client: httpx.AsyncClient, session_id: str) -> None:
+    await client.post(
+        "/chat",
+        json={
+            "session_id": session_id,
+            "message": "My phone is (415) 555-0123 and DOB is 07/14/1985",
+        },
+    )
+    response = await client.post(
+        "/chat", json={"session_id": session_id, "message": "Yes, that's me"}
+    )
+    assert response.json()["state"]["verified"] is True
+
+
+@pytest.mark.asyncio
+async def test_chat_demo_flow(client):
+    """Test the verify → list → confirm flow through the async endpoint"""
+    session_id = f"api_{uuid.uuid4().hex}"
+    async with client:
+        await verify_session(client, session_id)
+
+        response = await client.post(
+            "/chat", json={"session_id": session_id, "message": "List my appointments"}
+        )
+        body = response.json()
+        assert response.status_code == 200
+        assert "upcoming appointments" in body["assistant"]["message"]
+        assert len(body["state"]["last_list_snapshot"]) >= 1
+
+        response = await client.post(
+            "/chat", json={"session_id": session_id, "message": "Confirm #1"}
+        )
+        assert "Confirmed" in response.json()["assistant"]["message"]
+
+
+@pytest.mark.asyncio
+async def test_chat_turns_run_concurrently(client, monkeypatch):
+    """Test that slow LLM calls overlap instead of queueing behind each other"""
+    session_ids = [f"api_{uuid.uuid4().hex}" for _ in range(50)]
+    async with client:
+        await asyncio.gather(*(verify_session(client, sid) for sid in session_ids))
+
+        monkeypatch.setattr("app.llm.client.llm_client", SlowMockLLMClient())
+        start = time.perf_counter()
+        responses = await asyncio.gather(
+            *(
+                client.post("/chat", json={"session_id": sid, "message": "hello"})
+                for sid in session_ids
+            )
+        )
+        elapsed = time.perf_counter() - start
+
+    assert all(r.status_code == 200 for r in responses)
+    # 50 sequential turns would take at least 10 seconds
+    assert elapsed < 2.0
+
+
+def parse_sse(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_llm_reply(client):
+    """Test that LLM replies stream as tokens followed by the final state"""
+    session_id = f"api_{uuid.uuid4().hex}"
+    async with client:
+        await verify_session(client, session_id)
+        response = await client.post(
+            "/chat/stream", json={"session_id": session_id, "message": "help"}
+        )
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    tokens = [data["delta"] for name, data in events if name == "token"]
+    name, final = events[-1]
+
+    assert len(tokens) > 1
+    assert name == "done"
+    assert final["assistant"]["message"] == "".join(tokens).strip()
+    assert final["state"]["verified"] is True
+    assert final["meta"]["session_id"] == session_id
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_persists_after_completion(client):
+    """Test that deterministic replies stream in one piece and are persisted"""
+    session_id = f"api_{uuid.uuid4().hex}"
+    async with client:
+        await verify_session(client, session_id)
+        response = await client.post(
+            "/chat/stream",
+            json={"session_id": session_id, "message": "List my appointments"},
+        )
+        state = (await client.get("/dev/state", params={"session_id": session_id})).json()
+
+    events = parse_sse(response.text)
+    assert [name for name, _ in events] == ["token", "done"]
+    assert state["last_intent"] == "list"
+    assert state["conversation_history"][-1]["assistant_message"] == events[0][1]["delta"]
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_logs_failures(client, monkeypatch, caplog):
+    """Test that a failing streamed turn ends in an error event and a logged traceback"""
+    async def broken_run(state):
+        raise RuntimeError("graph exploded")
+
+    monkeypatch.setattr(conversation_graph, "run", broken_run)
+    async with client:
+        response = await client.post(
+            "/chat/stream", json={"session_id": f"api_{uuid.uuid4().hex}", "message": "help"}
+        )
+
+    assert parse_sse(response.text) == [("error", {"error": "internal_error"})]
+    record = next(r for r in caplog.records if r.name == "app.api.router")
+    assert record.exc_info[1].args == ("graph exploded",)
+
+
+@pytest.mark.asyncio
+async def test_health_reports_open_circuit(client, monkeypatch):
+    """Test that /health shows breaker state and degrades while it is open"""
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    breaker = CircuitBreaker(min_calls=1)
+    monkeypatch.setattr(
+        "app.llm.client.llm_client", AsyncOpenAILLMClient(breaker=breaker)
+    )
+
+    response = await client.get("/health")
+    assert response.json()["status"] == "healthy"
+    assert response.json()["llm"]["upstream"]["circuit"]["state"] == "closed"
+
+    breaker.record(False)
+    response = await client.get("/health")
+    assert response.json()["status"] == "degraded"
+    assert response.json()["llm"]["upstream"]["circuit"]["state"] == "open"
+
+
+@pytest.mark.asyncio
+async def test_chat_trace_reports_node_path_and_timings(client):
+    """Test that trace=true returns the nodes actually run with their timings"""
+    session_id = f"trace-{uuid.uuid4()}"
+    await verify_session(client, session_id)
+
+    response = await client.post(
+        "/chat",
+        json={"session_id": session_id, "message": "List my appointments", "trace": True},
+    )
+    trace = response.json()["trace"]
+
+    assert trace["path"] == ["Guard", "Router", "List"]
+    assert [entry["node"] for entry in trace["nodes"]] == ["guard", "router", "list"]
+    assert all(entry["ms"] >= entry["repository_ms"] for entry in trace["nodes"])
+    assert trace["total_ms"] >= sum(entry["ms"] for entry in trace["nodes"])
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exposes_request_and_node_latency(client):
+    """Test that /metrics serves route-labelled HTTP, node and LLM call-site series"""
+    session_id = f"metrics-{uuid.uuid4()}"
+    await verify_session(client, session_id)
+    await client.post("/chat", json={"session_id": session_id, "message": "Tell me a joke"})
+
+    response = await client.get("/metrics")
+    body = response.text
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'http_request_duration_seconds_count{endpoint="/chat",method="POST",status="200"}' in body
+    assert 'graph_node_duration_seconds_bucket{node="router",le="+Inf"}' in body
+    # The mock LLM makes no upstream requests; real ones are counted in test_fake_llm_server
+    assert "# TYPE llm_call_duration_seconds histogram" in body
+    assert "sessions_live " in body
+    assert 'cache_hit_ratio{cache="response"}' in body
+
+
+@pytest.fixture
+def restore_appointments():
+    """The app's appointment store is shared across tests; undo status changes"""
+    ids = ["a_001", "a_002"]
+    statuses = {appointment_id: appointment_repo.get_by_id(appointment_id).status for appointment_id in ids}
+    yield
+    for appointment_id, status in statuses.items():
+        appointment_repo.update_status(appointment_id, status)
+
+
+@pytest.mark.asyncio
+async def test_multi_action_turn_applies_all_in_one_reply(client, mock_llm_client, monkeypatch, restore_appointments):
+    """Test that "confirm #1 and cancel #2" is handled in one turn without the LLM"""
+    session_id = f"batch-{uuid.uuid4()}"
+    await verify_session(client, session_id)
+    await client.post("/chat", json={"session_id": session_id, "message": "List my appointments"})
+
+    async def no_llm(*args, **kwargs):
+        raise AssertionError("classification should not reach the LLM")
+
+    monkeypatch.setattr(mock_llm_client, "classify_intent", no_llm)
+    response = await client.post(
+        "/chat",
+        json={"session_id": session_id, "message": "Confirm #1 and cancel #2", "trace": True},
+    )
+    data = response.json()
+
+    assert data["trace"]["path"] == ["Guard", "Router", "Batch"]
+    message = data["assistant"]["message"]
+    assert "Confirmed" in message and "Dr. Lee" in message
+    assert "Cancelled" in message and "Dr. Kim" in message
@@ -1,9 +1,17 @@
+import threading
 import pytest
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
+from app.graph.nodes import GraphNodes
+from app.domain.state import GraphState
 from app.services.appointments import AppointmentService
+from app.services.verification import VerificationService
+from app.repositories.factory import create_appointment_repository
 from app.repositories.mock_appointments import MockAppointmentRepository
-from app.domain.models import AppointmentStatus
+from app.repositories.mock_otp import MockOTPRepository
+from app.repositories.mock_patients import MockPatientRepository
+from app.repositories.sqlite_appointments import SQLiteAppointmentRepository
+from app.domain.models import Appointment, AppointmentStatus
 from app.utils.time import get_pst_now
 
 
@@ -115,4 +123,145 @@ def test_cancel_within_24_hours(appointment_service, appointment_repo):
 def test_cancel_nonexistent_appointment(appointment_service):
     """Test cancelling non-existent appointment"""
     with pytest.raises(ValueError, match="not found"):
-        appointment_service.cancel("nonexistent_id")
\ No newline at end of file
+        appointment_service.cancel("nonexistent_id")
+
+def test_upcoming_index_sorted_and_tracks_status(appointment_repo):
+    """Test the per-patient index stays sorted and follows cancel/uncancel"""
+    now = get_pst_now()
+    for appointment_id, days in [("b_late", 30), ("b_early", 1), ("b_mid", 10)]:
+        appointment_repo.add(
+            Appointment(
+                appointment_id=appointment_id,
+                patient_id="p_bulk",
+                provider_name="Dr. Lee",
+                start_time=now + timedelta(days=days),
+                status=AppointmentStatus.scheduled,
+            )
+        )
+
+    upcoming = appointment_repo.list_upcoming_by_patient("p_bulk", now)
+    assert [a.appointment_id for a in upcoming] == ["b_early", "b_mid", "b_late"]
+
+    appointment_repo.update_status("b_mid", AppointmentStatus.canceled)
+    upcoming = appointment_repo.list_upcoming_by_patient("p_bulk", now)
+    assert [a.appointment_id for a in upcoming] == ["b_early", "b_late"]
+
+    appointment_repo.update_status("b_mid", AppointmentStatus.scheduled)
+    later = appointment_repo.list_upcoming_by_patient("p_bulk", now + timedelta(days=5))
+    assert [a.appointment_id for a in later] == ["b_mid", "b_late"]
+
+
+@pytest.fixture
+def sqlite_appointment_repo(tmp_path, monkeypatch):
+    monkeypatch.setenv("APPOINTMENT_BACKEND", "sqlite")
+    monkeypatch.setenv("APPOINTMENT_DB_PATH", str(tmp_path / "appointments.db"))
+    return create_appointment_repository()
+
+
+def test_sqlite_repository_seeded_and_upcoming(sqlite_appointment_repo):
+    """Test demo seeding and the upcoming query on the SQLite backend"""
+    now = get_pst_now()
+    upcoming = sqlite_appointment_repo.list_upcoming_by_patient("p_001", now)
+
+    assert [a.appointment_id for a in upcoming] == ["a_001", "a_002"]
+    assert upcoming[0].start_time < upcoming[1].start_time
+    assert sqlite_appointment_repo.count() == 5
+
+
+def test_sqlite_status_updates_visible_to_other_workers(sqlite_appointment_repo, tmp_path):
+    """Test that status changes persist and are shared through the database file"""
+    service = AppointmentService(sqlite_appointment_repo)
+    other_worker = SQLiteAppointmentRepository(str(tmp_path / "appointments.db"))
+
+    service.cancel("a_001")
+
+    assert other_worker.get_by_id("a_001").status == AppointmentStatus.canceled
+    upcoming = other_worker.list_upcoming_by_patient("p_001", get_pst_now())
+    assert [a.appointment_id for a in upcoming] == ["a_002"]
+
+
+def test_confirm_loses_race_to_cancel(sqlite_appointment_repo):
+    """Test that confirm refuses to overwrite a concurrent cancellation"""
+    with pytest.raises(ValueError, match="expected scheduled"):
+        sqlite_appointment_repo.update_status(
+            "a_005",
+            AppointmentStatus.confirmed,
+            expected_status=AppointmentStatus.scheduled,
+        )
+    assert sqlite_appointment_repo.get_by_id("a_005").status == AppointmentStatus.confirmed
+
+    with pytest.raises(ValueError, match="not found"):
+        sqlite_appointment_repo.update_status("missing", AppointmentStatus.canceled)
+
+
+def test_apply_actions_reports_each_action(appointment_service, appointment_repo):
+    """Test a mixed batch: applied, idempotent and rejected actions"""
+    results = appointment_service.apply_actions(
+        [("confirm", "a_001"), ("cancel", "a_002"), ("confirm", "a_003"), ("cancel", "missing")]
+    )
+
+    assert [r["error"] for r in results] == [None, None, "it is past", "not found"]
+    assert appointment_repo.get_by_id("a_001").status == AppointmentStatus.confirmed
+    assert appointment_repo.get_by_id("a_002").status == AppointmentStatus.canceled
+    assert results[1]["within_24h"] is False
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_update_statuses_is_all_or_nothing(backend, appointment_repo, sqlite_appointment_repo):
+    """Test that a failed guard leaves every appointment in the batch unchanged"""
+    repo = appointment_repo if backend == "memory" else sqlite_appointment_repo
+
+    with pytest.raises(ValueError, match="expected scheduled"):
+        repo.update_statuses(
+            [
+                ("a_001", AppointmentStatus.canceled, AppointmentStatus.scheduled),
+                ("a_005", AppointmentStatus.confirmed, AppointmentStatus.scheduled),
+            ]
+        )
+    assert repo.get_by_id("a_001").status == AppointmentStatus.scheduled
+
+    updated = repo.update_statuses(
+        [
+            ("a_001", AppointmentStatus.confirmed, AppointmentStatus.scheduled),
+            ("a_002", AppointmentStatus.canceled, None),
+        ]
+    )
+    assert [a.status for a in updated] == [AppointmentStatus.confirmed, AppointmentStatus.canceled]
+    assert [a.appointment_id for a in repo.list_upcoming_by_patient("p_001", get_pst_now())] == ["a_001"]
+
+
+class ThreadRecordingRepository:
+    """Forwards to a repository, recording the thread each call runs on"""
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.threads = []
+
+    def __getattr__(self, name):
+        attr = getattr(self.repo, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self.threads.append(threading.get_ident())
+            return attr(*args, **kwargs)
+
+        return call
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+async def test_sqlite_appointment_calls_leave_the_event_loop(backend, appointment_repo, sqlite_appointment_repo):
+    """Test that graph nodes run only blocking (SQLite) appointment calls in a worker thread"""
+    repo = ThreadRecordingRepository(appointment_repo if backend == "memory" else sqlite_appointment_repo)
+    nodes = GraphNodes(
+        VerificationService(MockPatientRepository(), MockOTPRepository()),
+        AppointmentService(repo),
+    )
+    state = GraphState("threads", get_pst_now(), verified=True, patient_id="p_001")
+
+    state = await nodes.list_node(state)
+
+    assert [entry["appointment_id"] for entry in state.last_list_snapshot] == ["a_001", "a_002"]
+    offloaded = repo.threads != [threading.get_ident()]
+    assert offloaded is (backend == "sqlite")
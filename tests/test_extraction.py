@@ -0,0 +1,69 @@
+import pytest
+from datetime import date
+from app.llm.rules import classify_by_rules
+from app.utils.extraction import extract
+from app.utils.normalization import parse_dob
+
+
+def entities(message):
+    return [(entity.kind, entity.value) for entity in extract(message).entities]
+
+
+def test_extracts_entities_with_spans_in_one_pass():
+    """Test each entity kind, its typed value and its span"""
+    message = "My phone is (415) 555-0123 and DOB is 07/14/1985"
+    extraction = extract(message)
+    phone = extraction.first("phone")
+    assert phone.value == "+14155550123"
+    assert extraction.span_text(phone) == "(415) 555-0123"
+    assert extraction.first("dob").value == date(1985, 7, 14)
+    assert extraction.words == ["my", "phone", "is", "and", "dob", "is"]
+
+    assert entities("my code is 482913") == [("otp", "482913")]
+    assert entities("cancel the 2:30 PM one tomorrow morning with Dr. Kim") == [
+        ("time", (14, 30)),
+        ("day", "tomorrow"),
+        ("daypart", (5, 12)),
+        ("provider", "Dr. Kim"),
+    ]
+    assert entities("yes, that's me") == [("affirm", True), ("affirm", True)]
+    assert entities("no, that's incorrect") == [("affirm", False), ("affirm", False)]
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        # A DOB is not read as a date, nor a date's day as an ordinal
+        ("born 07/14/1985", [("dob", date(1985, 7, 14))]),
+        ("my Oct 21st appointment", [("date", (10, 21))]),
+        ("the 2nd of October", [("date", (10, 2))]),
+        ("10/6 at noon", [("date", (10, 6)), ("time", (12, 0))]),
+        ("confirm #1 and cancel the second", [("ordinal", 1), ("ordinal", 2)]),
+        # Ten digits are a phone, not an OTP; an invalid date is still a DOB
+        ("4155550123", [("phone", "+14155550123")]),
+        ("02/30/1985", [("dob", None)]),
+    ],
+)
+def test_overlapping_readings_prefer_the_specific_one(message, expected):
+    """Test that alternatives are ordered so the more specific entity wins"""
+    assert entities(message) == expected
+
+
+def test_parse_dob_formats():
+    """Test the accepted DOB formats and rejection of invalid dates"""
+    for text in ("1985-07-14", "07/14/1985", "07-14-1985", "14/07/1985"):
+        assert parse_dob(text) == date(1985, 7, 14)
+    for text in ("07/14/85", "02/30/1985", "1985/07/14", "july 14"):
+        with pytest.raises(ValueError):
+            parse_dob(text)
+
+
+def test_rule_classifier_uses_extracted_entities():
+    """Test ordinals and reference entities from the shared extractor"""
+    result = classify_by_rules("Confirm my Oct 21st appointment with Dr. Kim")
+    assert result["intent"] == "confirm_appointment"
+    assert result["entities"] == {"ordinal": None, "date": "Oct 21st", "time": None, "provider": "Dr. Kim"}
+
+    # Whole words only: "which" and "this" are not a greeting
+    assert classify_by_rules("which one is this")["intent"] == "fallback"
+    assert classify_by_rules("cancel the first one")["entities"]["ordinal"] == 1
@@ -0,0 +1,117 @@
+import random
+import httpx
+import pytest
+from benchmarks.fake_llm_server import FakeServerConfig, LatencyDistribution, create_app
+from app.llm.client import AsyncOpenAILLMClient, is_retryable
+from app.llm.prompts import SMALLTALK_PROMPT
+from app.llm.resilience import ResilientCaller
+from app.llm.cache import CachingLLMClient, TTLCache
+from app.utils.metrics import llm_latency, llm_tokens
+from app.utils.tracing import llm_call
+
+
+def openai_client(config: FakeServerConfig, monkeypatch, **kwargs) -> AsyncOpenAILLMClient:
+    """Real client whose HTTP traffic goes to the fake server in-process"""
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://fake-llm/v1")
+    transport = httpx.ASGITransport(app=create_app(config))
+    return AsyncOpenAILLMClient(
+        http_client=httpx.AsyncClient(transport=transport), **kwargs
+    )
+
+
+@pytest.mark.asyncio
+async def test_fake_server_answers_classification_and_batches(monkeypatch):
+    """Test that classification prompts get parseable JSON back over HTTP"""
+    client = openai_client(FakeServerConfig(), monkeypatch)
+    offer = [{"user_message": "confirm #1", "assistant_message": "Would you like to see your updated appointment list?"}]
+
+    single = await client.classify_intent("cancel the second one")
+    batch = await client.classify_intents([("yes", offer), ("hello", None)])
+
+    assert single["intent"] == "cancel_appointment"
+    assert single["entities"]["ordinal"] == 2
+    assert [r["intent"] for r in batch] == ["list_appointments", "smalltalk"]
+
+
+@pytest.mark.asyncio
+async def test_fake_server_streams_tokens(monkeypatch):
+    """Test that stream=True is served as SSE chunks the SDK can iterate"""
+    client = openai_client(FakeServerConfig(), monkeypatch)
+
+    tokens = [token async for token in client.stream_chat(SMALLTALK_PROMPT, "hello")]
+
+    assert len(tokens) > 1
+    assert "".join(tokens).startswith("Hello!")
+
+
+@pytest.mark.asyncio
+async def test_token_usage_is_counted_per_call_site(monkeypatch):
+    """Test that reported usage, streamed or not, lands on the active call site"""
+    client = openai_client(FakeServerConfig(), monkeypatch)
+    before = llm_tokens.values()
+
+    with llm_call("smalltalk"):
+        async for _ in client.stream_chat(SMALLTALK_PROMPT, "hello"):
+            pass
+    with llm_call("classify"):
+        await client.classify_intent("cancel the second one")
+
+    after = llm_tokens.values()
+    for call_site in ("smalltalk", "classify"):
+        for kind in ("prompt", "completion"):
+            key = (call_site, kind)
+            assert after[key] > before.get(key, 0)
+
+
+def llm_request_counts() -> dict:
+    return {labels: sum(values[:-1]) for labels, values in llm_latency.series().items()}
+
+
+@pytest.mark.asyncio
+async def test_llm_latency_counts_upstream_requests_only(monkeypatch):
+    """Test that intent-cache hits are not recorded as LLM calls, streams are"""
+    client = CachingLLMClient(openai_client(FakeServerConfig(), monkeypatch), TTLCache())
+    before = llm_request_counts()
+
+    with llm_call("classify"):
+        await client.classify_intent("cancel the second one")
+    with llm_call("classify"):
+        await client.classify_intent("Cancel the second one!")  # cache hit
+    with llm_call("smalltalk"):
+        async for _ in client.stream_chat(SMALLTALK_PROMPT, "hello"):
+            pass
+
+    after = llm_request_counts()
+    assert after[("classify",)] - before.get(("classify",), 0) == 1
+    assert after[("smalltalk",)] - before.get(("smalltalk",), 0) == 1
+
+
+@pytest.mark.asyncio
+async def test_fake_server_error_injection_exercises_retries(monkeypatch):
+    """Test that injected 5xx responses are retried by the real client"""
+    config = FakeServerConfig(error_rate=0.5, seed=3)
+    client = openai_client(
+        config,
+        monkeypatch,
+        resilience=ResilientCaller(max_retries=5, retryable=is_retryable, jitter=lambda: 0.0),
+    )
+
+    for _ in range(10):
+        assert (await client.classify_intent("list my appointments"))["intent"] == "list_appointments"
+
+    assert client.stats()["retries"] > 0
+    assert client.stats()["failures"] == 0
+
+
+def test_latency_distribution_specs():
+    """Test parsing and sampling of the latency distribution specs"""
+    rng = random.Random(0)
+    assert LatencyDistribution.parse("fixed:seconds=0.25").sample(rng) == 0.25
+    assert 0.1 <= LatencyDistribution.parse("uniform:low=0.1,high=0.2").sample(rng) <= 0.2
+
+    samples = sorted(LatencyDistribution.parse("lognormal:median=0.5,sigma=0.3").sample(rng) for _ in range(2001))
+    assert samples[1000] == pytest.approx(0.5, rel=0.1)
+
+    with pytest.raises(ValueError):
+        LatencyDistribution.parse("lognormal:median=0.5")
@@ -0,0 +1,111 @@
+import pytest
+from app.graph.builder import ConversationGraph
+from app.graph.definition import END, GraphDefinition, GraphDefinitionError, GraphRuntimeError
+from app.graph.nodes import GraphNodes
+from app.domain.state import GraphState
+from app.repositories.mock_appointments import MockAppointmentRepository
+from app.repositories.mock_otp import MockOTPRepository
+from app.repositories.mock_patients import MockPatientRepository
+from app.services.appointments import AppointmentService
+from app.services.verification import VerificationService
+from app.utils.time import get_pst_now
+
+
+def step(name):
+    async def handler(state):
+        state.append(name)
+        return state
+
+    return handler
+
+
+def by_last(targets):
+    # Route on the state (a list of visited names) via a lookup table
+    return lambda state: targets.get(state[-1])
+
+
+def test_compile_rejects_cycles():
+    """Test that a loop between nodes is reported with its path"""
+    graph = GraphDefinition(entry="a")
+    for name in "abc":
+        graph.add_node(name, step(name))
+    graph.add_edge("a", "b")
+    graph.add_conditional_edges("b", by_last({}), ["c", END])
+    graph.add_edge("c", "a")
+
+    with pytest.raises(GraphDefinitionError, match="Cycle: a -> b -> c -> a"):
+        graph.compile()
+
+
+def test_compile_rejects_unreachable_and_undefined_nodes():
+    """Test that dangling nodes and edges to unknown nodes fail at build time"""
+    graph = GraphDefinition(entry="a")
+    graph.add_node("a", step("a")).add_node("orphan", step("orphan"))
+    graph.add_edge("a", END)
+    with pytest.raises(GraphDefinitionError, match="Unreachable nodes: orphan"):
+        graph.compile()
+
+    graph = GraphDefinition(entry="a")
+    graph.add_node("a", step("a"))
+    graph.add_edge("a", "missing")
+    with pytest.raises(GraphDefinitionError, match="undefined target"):
+        graph.compile()
+
+
+@pytest.mark.asyncio
+async def test_compiled_graph_dispatches_and_calls_hooks():
+    """Test conditional dispatch and the node/turn hooks"""
+    graph = GraphDefinition(entry="start")
+    for name in ("start", "left", "right"):
+        graph.add_node(name, step(name))
+    graph.add_conditional_edges("start", by_last({"start": "right"}), ["left", "right"])
+    graph.add_edge("left", END)
+    graph.add_edge("right", END)
+    compiled = graph.compile()
+
+    seen_nodes, seen_turns = [], []
+    compiled.add_node_hook(lambda name, _state, seconds: seen_nodes.append((name, seconds)))
+    compiled.add_turn_hook(lambda _state, path, seconds: seen_turns.append((path, seconds)))
+
+    assert await compiled.run([]) == ["start", "right"]
+    assert [name for name, _ in seen_nodes] == ["start", "right"]
+    assert [path for path, _ in seen_turns] == [["start", "right"]]
+    assert seen_turns[0][1] >= sum(seconds for _, seconds in seen_nodes)
+
+
+@pytest.mark.asyncio
+async def test_compiled_graph_enforces_budget_and_declared_targets():
+    """Test that runs stop at the step budget or on an undeclared route"""
+    graph = GraphDefinition(entry="a")
+    for name in "abc":
+        graph.add_node(name, step(name))
+    graph.add_edge("a", "b")
+    graph.add_conditional_edges("b", by_last({"b": "elsewhere"}), ["c", END])
+    graph.add_edge("c", END)
+
+    with pytest.raises(GraphRuntimeError, match="Step budget of 1 exceeded"):
+        await graph.compile(step_budget=1).run([])
+    with pytest.raises(GraphRuntimeError, match="undeclared target elsewhere"):
+        await graph.compile().run([])
+
+
+@pytest.mark.asyncio
+async def test_conversation_graph_routes_verified_turn_to_action_node():
+    """Test the app graph: guard -> router -> list, ending once a reply exists"""
+    nodes = GraphNodes(
+        VerificationService(MockPatientRepository(), MockOTPRepository()),
+        AppointmentService(MockAppointmentRepository()),
+    )
+    graph = ConversationGraph(nodes)
+    state = GraphState(
+        "graph", get_pst_now(), "List my appointments", verified=True, patient_id="p_001"
+    )
+
+    result = await graph.run(state)
+
+    assert result.trace["path"] == ["Guard", "Router", "List"]
+    assert result.assistant_message
+    assert result.next_action is None
+    assert sorted(graph.graph.nodes) == sorted(
+        ["guard", "verify", "router", "list", "confirm", "cancel", "batch", "help", "smalltalk", "fallback"]
+    )
@@ -0,0 +1,556 @@
+import asyncio
+import json
+import time
+import httpx
+import pytest
+from app.llm.cache import CachingLLMClient, ResponseCache, TTLCache
+from app.llm.batching import BatchingLLMClient
+from app.llm.client import (
+    DEFAULT_INTENT_MODEL_PATH,
+    AsyncOpenAILLMClient,
+    build_batch_classification_prompt,
+    is_retryable,
+    parse_batch_classification,
+)
+from app.llm.prompts import HELP_PROMPT, OFFLINE_REPLIES
+from app.llm.resilience import CircuitBreaker, DeadlineExceeded, ResilientCaller
+from app.llm.singleflight import CoalescingLLMClient
+from app.llm.local_classifier import IntentModel, LocalIntentClassifier, train_intent_model
+from app.llm.mock_client import AsyncMockLLMClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class CountingMockLLMClient(AsyncMockLLMClient):
+    """Mock client that records how many classifications reached it"""
+
+    def __init__(self):
+        super().__init__()
+        self.classify_calls = 0
+
+    async def classify_intent(self, user_message, conversation_history=None):
+        self.classify_calls += 1
+        return await super().classify_intent(user_message, conversation_history)
+
+
+def test_ttl_cache_lru_eviction():
+    """Test that the least recently used entry is evicted at capacity"""
+    cache = TTLCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_expiry():
+    """Test that entries expire after the TTL"""
+    clock = FakeClock()
+    cache = TTLCache(ttl_seconds=10, clock=clock)
+    cache.set("a", 1)
+
+    clock.now = 9.9
+    assert cache.get("a") == 1
+    clock.now = 10.0
+    assert cache.get("a") is None
+    assert cache.stats() == {
+        "size": 0,
+        "hits": 1,
+        "misses": 1,
+        "evictions": 0,
+        "expirations": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_intent_cache_normalizes_messages():
+    """Test that trivially different phrasings share one classification"""
+    inner = CountingMockLLMClient()
+    client = CachingLLMClient(inner, TTLCache())
+
+    first = await client.classify_intent("List my appointments")
+    second = await client.classify_intent("  list my   appointments! ")
+    first["intent"] = "mutated"
+
+    assert second["intent"] == "list_appointments"
+    assert inner.classify_calls == 1
+    assert client.intent_cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_intent_cache_keys_on_last_assistant_turn():
+    """Test that the same reply under a different context is classified again"""
+    inner = CountingMockLLMClient()
+    client = CachingLLMClient(inner, TTLCache())
+    offer = [{"user_message": "confirm #1", "assistant_message": "Would you like to see your updated appointment list?"}]
+    greeting = [{"user_message": "hi", "assistant_message": "Hello! How can I help?"}]
+
+    await client.classify_intent("yes", offer)
+    await client.classify_intent("yes", offer)
+    await client.classify_intent("yes", greeting)
+
+    assert inner.classify_calls == 2
+
+
+def test_response_cache_fills_variant_pool_before_serving():
+    """Test that a key misses until its pool holds enough distinct replies"""
+    cache = ResponseCache(variants=2, choose=lambda pool: pool[-1])
+
+    assert cache.get("prompt", "hi") is None
+    cache.add("prompt", "hi", "Hello!")
+    assert cache.get("prompt", "Hi!") is None
+    cache.add("prompt", "Hi!", "Hi there!")
+
+    assert cache.get("prompt", "  HI ") == "Hi there!"
+    assert cache.get("other prompt", "hi") is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_response_cache_expires_pools():
+    """Test that pooled replies are dropped after the TTL"""
+    clock = FakeClock()
+    cache = ResponseCache(ttl_seconds=60, variants=1, clock=clock)
+    cache.add("prompt", "thanks", "You're welcome!")
+
+    assert cache.get("prompt", "thanks") == "You're welcome!"
+    clock.now = 60.0
+    assert cache.get("prompt", "thanks") is None
+
+
+class SlowCountingMockLLMClient(CountingMockLLMClient):
+    """Counting mock that stays in flight long enough for callers to overlap"""
+
+    def __init__(self, fail: bool = False):
+        super().__init__()
+        self.fail = fail
+
+    async def classify_intent(self, user_message, conversation_history=None):
+        await asyncio.sleep(0.01)
+        if self.fail:
+            self.classify_calls += 1
+            raise RuntimeError("upstream unavailable")
+        return await super().classify_intent(user_message, conversation_history)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_classifications_share_one_call():
+    """Test that overlapping identical requests hit the upstream once"""
+    inner = SlowCountingMockLLMClient()
+    client = CoalescingLLMClient(inner)
+
+    results = await asyncio.gather(
+        *(client.classify_intent("List my appointments") for _ in range(10)),
+        client.classify_intent("cancel #2"),
+    )
+
+    assert [r["intent"] for r in results[:10]] == ["list_appointments"] * 10
+    assert results[10]["intent"] == "cancel_appointment"
+    assert inner.classify_calls == 2
+    assert client.stats() == {"calls": 2, "coalesced": 9, "in_flight": 0}
+
+    # Sequential calls are not coalesced
+    await client.classify_intent("List my appointments")
+    assert inner.classify_calls == 3
+
+
+@pytest.mark.asyncio
+async def test_coalesced_callers_all_see_upstream_error():
+    """Test that a failed shared call raises in every waiter"""
+    inner = SlowCountingMockLLMClient(fail=True)
+    client = CoalescingLLMClient(inner)
+
+    results = await asyncio.gather(
+        *(client.classify_intent("hi") for _ in range(3)), return_exceptions=True
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert inner.classify_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_followers():
+    """Test that a follower still gets the result when the first caller is cancelled"""
+    inner = SlowCountingMockLLMClient()
+    client = CoalescingLLMClient(inner)
+
+    leader = asyncio.create_task(client.classify_intent("List my appointments"))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(client.classify_intent("List my appointments"))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert (await follower)["intent"] == "list_appointments"
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert inner.classify_calls == 1
+
+    # With every caller gone, the shared call itself is cancelled
+    abandoned = asyncio.create_task(client.classify_intent("cancel #2"))
+    await asyncio.sleep(0)
+    abandoned.cancel()
+    await asyncio.gather(abandoned, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert client.stats()["in_flight"] == 0
+    assert inner.classify_calls == 1
+
+
+class BatchRecordingMockLLMClient(AsyncMockLLMClient):
+    """Mock client that records the size of each upstream batch"""
+
+    def __init__(self):
+        super().__init__()
+        self.batch_sizes = []
+
+    async def classify_intent(self, user_message, conversation_history=None):
+        self.batch_sizes.append(1)
+        return await super().classify_intent(user_message, conversation_history)
+
+    async def classify_intents(self, requests):
+        self.batch_sizes.append(len(requests))
+        return await super().classify_intents(requests)
+
+
+@pytest.mark.asyncio
+async def test_batching_splits_results_back_to_callers():
+    """Test that concurrent calls share one batch and each gets its own answer"""
+    inner = BatchRecordingMockLLMClient()
+    client = BatchingLLMClient(inner, max_batch_size=3, max_wait_ms=50)
+    messages = ["list my appointments", "cancel #2", "help", "hello"]
+
+    results = await asyncio.gather(*(client.classify_intent(m) for m in messages))
+
+    assert [r["intent"] for r in results] == [
+        "list_appointments", "cancel_appointment", "help", "smalltalk",
+    ]
+    assert results[1]["entities"]["ordinal"] == 2
+    # The full batch goes out immediately; the straggler waits for the timer
+    assert inner.batch_sizes == [3, 1]
+    assert client.stats() == {"calls": 4, "batches": 2, "largest_batch": 3}
+
+
+def test_batch_prompt_and_parsing():
+    """Test that the batch prompt numbers conversations and the parser checks length"""
+    offer = [{"user_message": "confirm #1", "assistant_message": "Would you like to see your updated appointment list?"}]
+    prompt = build_batch_classification_prompt([("yes", offer), ("cancel #2", None)])
+
+    assert "### Conversation 1" in prompt and "### Conversation 2" in prompt
+    assert prompt.index("updated appointment list") < prompt.index("### Conversation 2")
+
+    content = '[{"intent": "help", "entities": {}}, {"intent": "smalltalk", "entities": {}}]'
+    assert [r["intent"] for r in parse_batch_classification(content, 2)] == ["help", "smalltalk"]
+    with pytest.raises(ValueError):
+        parse_batch_classification(content, 3)
+
+
+class FlakyUpstream:
+    """Async callable failing `failures` times before answering after `delay` seconds"""
+
+    def __init__(self, failures: int = 0, delays: list[float] | None = None):
+        self.failures = failures
+        self.delays = delays or []
+        self.attempts = 0
+
+    async def __call__(self):
+        self.attempts += 1
+        if self.attempts <= len(self.delays):
+            await asyncio.sleep(self.delays[self.attempts - 1])
+        if self.attempts <= self.failures:
+            raise ConnectionError("connection reset")
+        return f"answer {self.attempts}"
+
+
+@pytest.mark.asyncio
+async def test_resilient_caller_retries_transient_failures():
+    """Test that failed attempts are retried until one succeeds"""
+    caller = ResilientCaller(max_retries=2, jitter=lambda: 0.0)
+    upstream = FlakyUpstream(failures=2)
+
+    assert await caller.call(upstream) == "answer 3"
+    assert caller.stats()["retries"] == 2
+
+    with pytest.raises(ConnectionError):
+        await caller.call(FlakyUpstream(failures=3))
+    assert caller.stats()["failures"] == 1
+
+
+@pytest.mark.asyncio
+async def test_resilient_caller_respects_deadline():
+    """Test that slow attempts time out and backoff never outlives the budget"""
+    caller = ResilientCaller(timeout=0.05)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        await caller.call(FlakyUpstream(delays=[1.0]))
+    assert time.monotonic() - started < 0.5
+
+    # A 10s backoff can't fit in a 1s budget, so the error surfaces immediately
+    caller = ResilientCaller(timeout=1.0, backoff_base=10.0, jitter=lambda: 1.0)
+    upstream = FlakyUpstream(failures=1)
+    with pytest.raises(ConnectionError):
+        await caller.call(upstream)
+    assert upstream.attempts == 1
+    assert caller.stats()["retries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_resilient_caller_hedges_slow_attempts():
+    """Test that an attempt slower than p95 gets a twin and the faster one wins"""
+    caller = ResilientCaller(hedge=True, hedge_min_samples=5)
+    for _ in range(5):
+        caller.latency.observe(0.01)
+
+    started = time.monotonic()
+    result = await caller.call(FlakyUpstream(delays=[1.0, 0.0]))
+
+    assert result == "answer 2"
+    assert time.monotonic() - started < 0.5
+    stats = caller.stats()
+    assert (stats["hedges"], stats["hedge_wins"], stats["hedge_rate"]) == (1, 1, 1.0)
+
+
+def fake_completions_transport(responses: list[httpx.Response]) -> httpx.MockTransport:
+    """In-process stand-in for the chat completions endpoint replaying `responses`"""
+    remaining = iter(responses)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path.endswith("/chat/completions")
+        return next(remaining)
+
+    return httpx.MockTransport(handler)
+
+
+def completion_response(content: str) -> httpx.Response:
+    return httpx.Response(200, json={
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o-mini",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+    })
+
+
+@pytest.mark.asyncio
+async def test_openai_client_retries_server_errors(monkeypatch):
+    """Test that a 5xx from the provider is retried within the call's budget"""
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    transport = fake_completions_transport([
+        httpx.Response(503, json={"error": {"message": "overloaded"}}),
+        completion_response(json.dumps({"intent": "help", "entities": {}})),
+    ])
+    client = AsyncOpenAILLMClient(
+        resilience=ResilientCaller(retryable=is_retryable, jitter=lambda: 0.0),
+        http_client=httpx.AsyncClient(transport=transport),
+    )
+
+    result = await client.classify_intent("what can you do?")
+
+    assert result["intent"] == "help"
+    assert client.stats()["retries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_openai_client_does_not_retry_bad_requests(monkeypatch, caplog):
+    """Test that 4xx errors fall back immediately, and visibly, instead of retrying"""
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    transport = fake_completions_transport([
+        httpx.Response(400, json={"error": {"message": "bad request"}}),
+    ])
+    client = AsyncOpenAILLMClient(
+        resilience=ResilientCaller(retryable=is_retryable),
+        http_client=httpx.AsyncClient(transport=transport),
+    )
+
+    result = await client.classify_intent("cancel #2")
+
+    assert result["intent"] == "cancel_appointment"
+    assert result["source"] == "fallback"
+    assert client.stats()["retries"] == 0
+    assert any(
+        r.name == "app.llm.client" and "keyword fallback" in r.getMessage()
+        for r in caplog.records
+    )
+
+
+@pytest.mark.asyncio
+async def test_openai_client_logs_failed_chat(monkeypatch, caplog):
+    """Test that a provider error behind the offline reply is logged with its traceback"""
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    transport = fake_completions_transport([
+        httpx.Response(400, json={"error": {"message": "bad request"}}),
+    ])
+    client = AsyncOpenAILLMClient(
+        resilience=ResilientCaller(retryable=is_retryable),
+        http_client=httpx.AsyncClient(transport=transport),
+    )
+
+    assert await client.chat(HELP_PROMPT, "help") == OFFLINE_REPLIES[HELP_PROMPT]
+    record = next(r for r in caplog.records if r.name == "app.llm.client")
+    assert record.levelname == "WARNING"
+    assert record.exc_info is not None
+
+
+@pytest.mark.asyncio
+async def test_intent_cache_skips_fallback_classifications(monkeypatch):
+    """Test that a keyword guess made during an outage isn't served after recovery"""
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    transport = fake_completions_transport([
+        httpx.Response(400, json={"error": {"message": "bad request"}}),
+        completion_response(json.dumps({"intent": "help", "entities": {}})),
+    ])
+    inner = AsyncOpenAILLMClient(
+        resilience=ResilientCaller(retryable=is_retryable),
+        http_client=httpx.AsyncClient(transport=transport),
+    )
+    client = CachingLLMClient(inner, TTLCache())
+
+    assert (await client.classify_intent("what now?"))["source"] == "fallback"
+    result = await client.classify_intent("what now?")
+
+    assert result["intent"] == "help"
+    assert client.intent_cache.stats()["size"] == 1
+
+
+def test_circuit_breaker_opens_and_recovers_through_half_open():
+    """Test closed -> open on errors, then a half-open probe closing it again"""
+    clock = FakeClock()
+    breaker = CircuitBreaker(window=4, min_calls=4, failure_rate_threshold=0.5, open_seconds=30, clock=clock)
+
+    for success in [True, False, True, False]:
+        assert breaker.allow()
+        breaker.record(success)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    clock.now = 30.0
+    assert breaker.allow()  # the probe
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record(False)
+    assert breaker.state == "open"
+
+    clock.now = 60.0
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed"
+    assert breaker.stats()["times_opened"] == 2
+
+
+def test_circuit_breaker_counts_slow_calls_as_failures():
+    """Test that successful but slow calls still trip the breaker"""
+    breaker = CircuitBreaker(min_calls=2, slow_call_seconds=1.0)
+    breaker.allow()
+    breaker.record(True, latency=2.0)
+    breaker.allow()
+    breaker.record(True, latency=3.0)
+
+    assert breaker.state == "open"
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_skips_the_network(monkeypatch):
+    """Test that an open breaker answers from rules and templates without requests"""
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(503, json={"error": {"message": "overloaded"}})
+
+    breaker = CircuitBreaker(min_calls=1)
+    client = AsyncOpenAILLMClient(
+        resilience=ResilientCaller(max_retries=0, retryable=is_retryable),
+        breaker=breaker,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+
+    await client.chat(HELP_PROMPT, "help")  # the failure that opens the circuit
+    assert breaker.state == "open"
+    requests.clear()
+
+    assert await client.chat(HELP_PROMPT, "help") == OFFLINE_REPLIES[HELP_PROMPT]
+    assert (await client.classify_intent("cancel #2"))["intent"] == "cancel_appointment"
+    assert requests == []
+    assert client.stats()["circuit"]["rejected"] == 2
+
+
+LOCAL_EXAMPLES = [
+    {"user_message": "show my appointments", "intent": "list_appointments"},
+    {"user_message": "list my visits", "intent": "list_appointments"},
+    {"user_message": "cancel the second one", "intent": "cancel_appointment"},
+    {"user_message": "please cancel #1", "intent": "cancel_appointment"},
+    {"user_message": "yes", "context": "Would you like to see your updated appointment list?", "intent": "list_appointments"},
+    {"user_message": "yes", "context": "Hello! How can I help?", "intent": "smalltalk"},
+    {"user_message": "confirm #1 and cancel #2", "intent": "batch_actions"},
+    {"user_message": "keep the first one but cancel the other", "intent": "batch_actions"},
+]
+
+
+def test_local_model_learns_context_and_round_trips(tmp_path):
+    """Test that the trained model uses the assistant context and survives save/load"""
+    model = train_intent_model(LOCAL_EXAMPLES, n_features=1024)
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    loaded = IntentModel.load(path)
+
+    offer = "Would you like to see your updated appointment list?"
+    assert loaded.predict("yes", offer)[0] == "list_appointments"
+    assert loaded.predict("yes", "Hello! How can I help?")[0] == "smalltalk"
+    assert loaded.predict("cancel the second one")[0] == "cancel_appointment"
+    assert loaded.labels == model.labels
+
+
+@pytest.mark.asyncio
+async def test_local_classifier_falls_back_to_llm_when_unsure():
+    """Test that only low-confidence predictions reach the LLM"""
+    inner = CountingMockLLMClient()
+    model = train_intent_model(LOCAL_EXAMPLES, n_features=1024)
+    client = LocalIntentClassifier(model, inner, threshold=0.6)
+
+    result = await client.classify_intent("please cancel the second one")
+    assert result["intent"] == "cancel_appointment"
+    assert result["entities"]["ordinal"] == 2
+    assert inner.classify_calls == 0
+
+    client.threshold = 1.0
+    await client.classify_intent("please cancel the second one")
+    assert inner.classify_calls == 1
+    assert client.stats() == {"local": 1, "llm": 1}
+
+
+@pytest.mark.asyncio
+async def test_local_batch_prediction_needs_keyword_actions():
+    """Test that a predicted batch is answered locally only when its actions were extracted"""
+    inner = CountingMockLLMClient()
+    model = train_intent_model(LOCAL_EXAMPLES, n_features=1024)
+    client = LocalIntentClassifier(model, inner, threshold=0.0)
+
+    result = await client.classify_intent("confirm #1 and cancel #2")
+    assert result["intent"] == "batch_actions"
+    assert [a["action"] for a in result["entities"]["actions"]] == ["confirm", "cancel"]
+    assert inner.classify_calls == 0
+
+    assert model.predict("keep the first one but cancel the other")[0] == "batch_actions"
+    await client.classify_intent("keep the first one but cancel the other")
+    assert inner.classify_calls == 1
+
+
+def test_shipped_intent_model_loads():
+    """Test that the committed artifact matches the classifier's labels"""
+    model = IntentModel.load(DEFAULT_INTENT_MODEL_PATH)
+
+    assert model.predict("show my appointments")[0] == "list_appointments"
+    assert set(model.labels) == {
+        "list_appointments", "confirm_appointment", "cancel_appointment",
+        "batch_actions", "help", "smalltalk", "fallback",
+    }
@@ -0,0 +1,50 @@
+import threading
+from app.utils.metrics import MetricsRegistry
+
+
+def test_registry_renders_prometheus_text():
+    """Test the text exposition of counters, histograms and collectors"""
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", labels=("status",))
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    registry.register_collector(
+        lambda: [("sessions_live", "gauge", "Live sessions", [({}, 3)])]
+    )
+
+    requests.inc("200")
+    requests.inc("200")
+    requests.inc('5"x"')
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{status="200"} 2' in lines
+    assert 'requests_total{status="5\\"x\\""} 1' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert "latency_seconds_count 2" in lines
+    assert "latency_seconds_sum 0.55" in lines
+    assert "sessions_live 3" in lines
+
+
+def test_sharded_counter_merges_writes_from_all_threads():
+    """Test that per-thread shards add up to every increment on scrape"""
+    registry = MetricsRegistry()
+    counter = registry.counter("hits_total", labels=("cache",))
+    histogram = registry.histogram("op_seconds")
+
+    def work():
+        for _ in range(10_000):
+            counter.inc("intent")
+            histogram.observe(0.001)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.values() == {("intent",): 80_000}
+    assert sum(histogram.series()[()][:-1]) == 80_000
@@ -1,15 +1,17 @@
 import pytest
 from datetime import datetime, timedelta
-from app.graph.state import GraphState
+from app.graph.references import resolve_reference
+from app.domain.state import GraphState
 from app.graph.nodes import GraphNodes
+from app.llm import client as llm
+from app.llm.cache import ResponseCache
+from app.llm.rules import classify_by_rules, RULE_CONFIDENCE_THRESHOLD
 from app.services.verification import VerificationService
 from app.services.appointments import AppointmentService
 from app.repositories.mock_patients import MockPatientRepository
 from app.repositories.mock_appointments import MockAppointmentRepository
 from app.repositories.mock_otp import MockOTPRepository
-from app.utils.time import get_pst_now
-from app.llm.mock_client import MockLLMClient
-import app.llm.client
+from app.utils.time import PST, get_pst_now
 
 
 @pytest.fixture
@@ -21,15 +23,6 @@ def repositories():
     }
 
 
-@pytest.fixture(autouse=True)
-def mock_llm_client():
-    """Replace the global LLM client with mock for testing"""
-    original_client = app.llm.client.llm_client
-    app.llm.client.llm_client = MockLLMClient()
-    yield
-    app.llm.client.llm_client = original_client
-
-
 @pytest.fixture
 def services(repositories):
     verification_service = VerificationService(repositories['patient'], repositories['otp'])
@@ -53,29 +46,32 @@ def base_state():
     )
 
 
-def test_guard_node_unverified(graph_nodes, base_state):
+@pytest.mark.asyncio
+async def test_guard_node_unverified(graph_nodes, base_state):
     """Test guard node routes to verify for unverified users"""
-    state = base_state.model_copy()
+    state = base_state.copy()
     state.verified = False
     
-    result = graph_nodes.guard_node(state)
+    result = await graph_nodes.guard_node(state)
     
     assert result.next_action == "verify"
 
 
-def test_guard_node_verified(graph_nodes, base_state):
+@pytest.mark.asyncio
+async def test_guard_node_verified(graph_nodes, base_state):
     """Test guard node routes to router for verified users"""
-    state = base_state.model_copy()
+    state = base_state.copy()
     state.verified = True
     
-    result = graph_nodes.guard_node(state)
+    result = await graph_nodes.guard_node(state)
     
     assert result.next_action == "router"
 
 
-def test_router_node_intent_classification(graph_nodes, base_state):
+@pytest.mark.asyncio
+async def test_router_node_intent_classification(graph_nodes, base_state):
     """Test router node classifies intents correctly"""
-    state = base_state.model_copy()
+    state = base_state.copy()
     state.verified = True
     
     test_cases = [
@@ -92,21 +88,22 @@ def test_router_node_intent_classification(graph_nodes, base_state):
     ]
     
     for message, expected_action in test_cases:
-        test_state = state.model_copy()
+        test_state = state.copy()
         test_state.user_message = message
         
-        result = graph_nodes.router_node(test_state)
+        result = await graph_nodes.router_node(test_state)
         
         assert result.next_action == expected_action, f"Message '{message}' should route to '{expected_action}', got '{result.next_action}'"
 
 
-def test_list_node_with_appointments(graph_nodes, base_state):
+@pytest.mark.asyncio
+async def test_list_node_with_appointments(graph_nodes, base_state):
     """Test list node with existing appointments"""
-    state = base_state.model_copy()
+    state = base_state.copy()
     state.verified = True
     state.patient_id = "p_001"  # Patient with appointments
     
-    result = graph_nodes.list_node(state)
+    result = await graph_nodes.list_node(state)
     
     assert result.assistant_message
     assert "appointments" in result.assistant_message.lower()
@@ -114,25 +111,27 @@ def test_list_node_with_appointments(graph_nodes, base_state):
     assert result.next_action == "router"
 
 
-def test_list_node_no_appointments(graph_nodes, base_state):
+@pytest.mark.asyncio
+async def test_list_node_no_appointments(graph_nodes, base_state):
     """Test list node with no appointments"""
-    state = base_state.model_copy()
+    state = base_state.copy()
     state.verified = True
     state.patient_id = "nonexistent_patient"
     
-    result = graph_nodes.list_node(state)
+    result = await graph_nodes.list_node(state)
     
     assert result.assistant_message
     assert "don't have any" in result.assistant_message.lower()
     assert len(result.last_list_snapshot) == 0
 
 
-def test_help_node(graph_nodes, base_state):
+@pytest.mark.asyncio
+async def test_help_node(graph_nodes, base_state):
     """Test help node provides guidance"""
-    state = base_state.model_copy()
+    state = base_state.copy()
     state.verified = True
     
-    result = graph_nodes.help_node(state)
+    result = await graph_nodes.help_node(state)
     
     assert result.assistant_message
     assert "list" in result.assistant_message.lower()
@@ -141,39 +140,89 @@ def test_help_node(graph_nodes, base_state):
     assert len(result.suggestions) > 0
 
 
-def test_smalltalk_node(graph_nodes, base_state):
+@pytest.mark.asyncio
+async def test_smalltalk_node(graph_nodes, base_state):
     """Test smalltalk node handles greetings"""
-    state = base_state.model_copy()
+    state = base_state.copy()
     state.verified = True
     
     test_messages = ["hello", "hi", "thank you", "thanks"]
     
     for message in test_messages:
-        test_state = state.model_copy()
+        test_state = state.copy()
         test_state.user_message = message
         
-        result = graph_nodes.smalltalk_node(test_state)
+        result = await graph_nodes.smalltalk_node(test_state)
         
         assert result.assistant_message
         assert result.next_action == "router"
 
 
-def test_fallback_node(graph_nodes, base_state):
+@pytest.mark.asyncio
+async def test_fallback_node(graph_nodes, base_state):
     """Test fallback node for unclear requests"""
-    state = base_state.model_copy()
+    state = base_state.copy()
     state.verified = True
     state.user_message = "something completely unclear"
     
-    result = graph_nodes.fallback_node(state)
+    result = await graph_nodes.fallback_node(state)
     
     assert result.assistant_message
     assert "not sure" in result.assistant_message.lower() or "help" in result.assistant_message.lower()
     assert len(result.suggestions) > 0
 
 
+@pytest.mark.asyncio
+async def test_generic_replies_served_from_response_cache(services, base_state, mock_llm_client):
+    """Test that repeated smalltalk reuses a cached reply instead of calling the LLM"""
+    calls = []
+    original_chat = mock_llm_client.chat
+
+    async def counting_chat(system_prompt, user_message):
+        calls.append(user_message)
+        return await original_chat(system_prompt, user_message)
+
+    mock_llm_client.chat = counting_chat
+    nodes = GraphNodes(*services, response_cache=ResponseCache(variants=1))
+    state = base_state.copy()
+    state.verified = True
+
+    for message in ["thanks", "Thanks!", "thanks"]:
+        turn = state.copy()
+        turn.user_message = message
+        result = await nodes.smalltalk_node(turn)
+        assert result.assistant_message
+
+    assert calls == ["thanks"]
+
+
+@pytest.mark.asyncio
+async def test_interrupted_stream_is_not_cached(services, base_state, mock_llm_client):
+    """Test that a reply cut short by a provider error never enters the response cache"""
+    async def failing_stream(system_prompt, user_message):
+        yield "You're "
+        raise llm.StreamInterrupted("connection reset")
+
+    async def sink(token):
+        pass
+
+    mock_llm_client.stream_chat = failing_stream
+    cache = ResponseCache(variants=1)
+    nodes = GraphNodes(*services, response_cache=cache)
+    state = base_state.copy()
+    state.verified = True
+    state.user_message = "thanks"
+    state.token_sink = sink
+
+    result = await nodes.smalltalk_node(state)
+
+    assert result.assistant_message == "You're"
+    assert cache.stats()["size"] == 0
+
+
 def test_appointment_reference_resolution(graph_nodes, base_state):
     """Test appointment reference resolution"""
-    state = base_state.model_copy()
+    state = base_state.copy()
     state.verified = True
     state.last_list_snapshot = [
         {"ordinal": 1, "appointment_id": "a_001"},
@@ -182,10 +231,138 @@ def test_appointment_reference_resolution(graph_nodes, base_state):
     
     # Test ordinal resolution
     state.ordinal = 2
-    appointment_id = graph_nodes._resolve_appointment_reference(state)
+    appointment_id, candidates = graph_nodes._resolve_appointment_reference(state)
     assert appointment_id == "a_002"
     
-    # Test fallback to first appointment
+    # Without a reference, several listed appointments are all candidates
     state.ordinal = None
-    appointment_id = graph_nodes._resolve_appointment_reference(state)
-    assert appointment_id == "a_001"
\ No newline at end of file
+    state.user_message = "confirm my appointment"
+    appointment_id, candidates = graph_nodes._resolve_appointment_reference(state)
+    assert appointment_id is None
+    assert [entry["appointment_id"] for entry in candidates] == ["a_001", "a_002"]
+
+
+def test_natural_reference_resolution():
+    """Test date, time and provider references against the list snapshot"""
+    now = datetime(2025, 10, 1, 9, 0, tzinfo=PST)  # a Wednesday
+    snapshot = [
+        {"ordinal": 1, "appointment_id": "a_1", "provider": "Dr. Kim",
+         "start": datetime(2025, 10, 2, 9, 30, tzinfo=PST).isoformat()},
+        {"ordinal": 2, "appointment_id": "a_2", "provider": "Dr. Lee",
+         "start": datetime(2025, 10, 2, 14, 0, tzinfo=PST).isoformat()},
+        {"ordinal": 3, "appointment_id": "a_3", "provider": "Dr. Kim",
+         "start": datetime(2025, 10, 6, 14, 0, tzinfo=PST).isoformat()},
+    ]
+
+    def resolve(message, entities=None):
+        return resolve_reference(message, snapshot, now, entities)
+
+    assert resolve("confirm my Oct 2 appointment with Dr. Kim").appointment_id == "a_1"
+    assert resolve("cancel tomorrow morning").appointment_id == "a_1"
+    assert resolve("cancel the one on monday").appointment_id == "a_3"
+    assert resolve("confirm the 2 PM one with lee").appointment_id == "a_2"
+    assert resolve("cancel it", {"date": "10/6"}).appointment_id == "a_3"
+
+    # Ambiguous references return every match; unmatched ones return nothing
+    ambiguous = resolve("confirm my appointment with Dr. Kim")
+    assert ambiguous.appointment_id is None
+    assert [entry["ordinal"] for entry in ambiguous.candidates] == [1, 3]
+    assert resolve("cancel the 2 PM one").candidates == [snapshot[1], snapshot[2]]
+    assert resolve("cancel my Oct 9 appointment") == (None, [])
+
+
+@pytest.mark.asyncio
+async def test_ambiguous_reference_asks_for_clarification(graph_nodes, base_state):
+    """Test that confirm asks which appointment instead of guessing"""
+    state = base_state.copy()
+    state.verified = True
+    state.patient_id = "p_001"
+    state.user_message = "list my appointments"
+    state = await graph_nodes.list_node(state)
+    assert {"provider", "start"} <= set(state.last_list_snapshot[0])
+
+    state.assistant_message = ""
+    state.user_message = "confirm my appointment"
+    result = await graph_nodes.confirm_node(state)
+
+    assert result.assistant_message.startswith("Which appointment would you like to confirm?")
+    assert result.suggestions[:2] == ["Confirm #1", "Confirm #2"]
+
+@pytest.mark.parametrize(
+    "message, confident",
+    [
+        ("confirm #2", True),
+        ("cancel my visit", True),
+        ("list my appointments", True),
+        ("hello", True),
+        ("thank you so much", True),
+        ("confirm #1 and cancel #2", True),
+        ("confirm #1 and cancel the other one", False),
+        ("don't cancel anything", False),
+        ("I need help with my appointments", False),
+        ("hi, is this the right place for the clinic", False),
+        ("something random", False),
+    ],
+)
+def test_rule_tier_confidence(message, confident):
+    """Test that only unambiguous messages clear the rule confidence threshold"""
+    result = classify_by_rules(message)
+
+    assert (result["confidence"] >= RULE_CONFIDENCE_THRESHOLD) is confident
+
+
+@pytest.mark.asyncio
+async def test_router_skips_llm_for_confident_rules(graph_nodes, base_state, mock_llm_client, monkeypatch):
+    """Test that rule-tier matches route without calling classify_intent"""
+    calls = []
+
+    async def recording_classify(user_message, conversation_history=None):
+        calls.append(user_message)
+        return {"intent": "fallback", "entities": {"ordinal": None}}
+
+    monkeypatch.setattr(mock_llm_client, "classify_intent", recording_classify)
+
+    for message in ["confirm #1", "hello", "something random"]:
+        state = base_state.copy()
+        state.verified = True
+        state.user_message = message
+        await graph_nodes.router_node(state)
+
+    assert calls == ["something random"]
+    assert graph_nodes.routing_stats == {"rules": 2, "llm": 1}
+
+
+@pytest.mark.asyncio
+async def test_router_normalizes_llm_batch_actions(graph_nodes, base_state, mock_llm_client, monkeypatch):
+    """Test that malformed LLM action lists are cleaned up instead of failing the turn"""
+    replies = [
+        ["confirm #1", {"action": "cancel", "ordinal": "2"}, {"action": "confirm", "ordinal": "#3"},
+         {"action": "reschedule", "ordinal": 1}, {"action": "cancel", "ordinal": "two"}],
+        [{"action": "cancel", "ordinal": "2"}, "confirm #1"],
+        "confirm #1 and cancel #2",
+    ]
+
+    async def llm_classify(user_message, conversation_history=None):
+        return {"intent": "batch_actions", "entities": {"ordinal": None, "actions": replies.pop(0)}}
+
+    monkeypatch.setattr(mock_llm_client, "classify_intent", llm_classify)
+
+    def turn():
+        state = base_state.copy()
+        state.verified = True
+        state.user_message = "do both of those"
+        return state
+
+    state = await graph_nodes.router_node(turn())
+    assert state.next_action == "batch"
+    assert state.actions == [{"action": "cancel", "ordinal": 2}, {"action": "confirm", "ordinal": 3}]
+
+    # A single usable action takes the regular cancel path
+    state = await graph_nodes.router_node(turn())
+    assert (state.next_action, state.ordinal) == ("cancel", 2)
+
+    # Nothing usable: batch_node asks for the appointments by number
+    state = await graph_nodes.router_node(turn())
+    assert state.next_action == "batch" and state.actions == []
+    state = await graph_nodes.batch_node(state)
+    assert "Could you list them by number" in state.assistant_message
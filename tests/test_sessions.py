@@ -1,7 +1,14 @@
+import threading
+import time
 import pytest
 from datetime import datetime, timedelta
-from app.domain.models import SessionState, VerificationState, PatientPublic
+from app.domain.models import SessionState, VerificationState, PatientPublic, ConversationTurn
+from app.repositories.factory import create_session_repository
 from app.repositories.mock_session import MockSessionRepository
+from app.repositories.sqlite_session import SQLiteSessionRepository
+from app.repositories.ttl_session import TTLSessionRepository
+from app.services.sessions import SessionService, CONTEXT_HISTORY_TURNS
+from app.utils.blocking import offload
 from app.utils.time import get_pst_now
 
 
@@ -100,4 +107,289 @@ def test_session_state_serialization():
     
     assert restored_state.session_id == state.session_id
     assert restored_state.verified == state.verified
-    assert restored_state.patient_public.name_masked == state.patient_public.name_masked
\ No newline at end of file
+    assert restored_state.patient_public.name_masked == state.patient_public.name_masked
+
+@pytest.fixture
+def sqlite_session_repo(tmp_path):
+    return SQLiteSessionRepository(str(tmp_path / "sessions.db"))
+
+
+def test_sqlite_session_round_trip(sqlite_session_repo):
+    """Test that SQLite-stored sessions deserialize back into SessionState"""
+    now = get_pst_now()
+    state = SessionState(
+        session_id="sqlite_session",
+        verified=True,
+        patient_id="p_001",
+        last_activity=now,
+        expires_at=now + timedelta(minutes=30),
+        conversation_history=[
+            ConversationTurn(user_message="hi", assistant_message="hello", timestamp=now)
+        ],
+    )
+
+    sqlite_session_repo.set(state.session_id, state.model_dump())
+    restored = SessionState(**sqlite_session_repo.get(state.session_id))
+
+    assert restored.verified is True
+    assert restored.expires_at == state.expires_at
+    assert restored.conversation_history[0].assistant_message == "hello"
+
+    sqlite_session_repo.delete(state.session_id)
+    assert sqlite_session_repo.get(state.session_id) is None
+
+
+def test_sqlite_sessions_shared_between_repositories(tmp_path):
+    """Test that separate repository instances (workers) see the same sessions"""
+    db_path = str(tmp_path / "shared.db")
+    worker_a = SQLiteSessionRepository(db_path)
+    worker_b = SQLiteSessionRepository(db_path)
+
+    worker_a.set("shared", {"session_id": "shared", "verified": False})
+    worker_b.set("shared", {"session_id": "shared", "verified": True})
+
+    assert worker_a.get("shared")["verified"] is True
+
+
+def test_sqlite_sweep_deletes_expired_sessions(sqlite_session_repo):
+    """Test that sweep drops rows past their idle or absolute deadline, deltas included"""
+    service = SessionService(sqlite_session_repo)
+    now = get_pst_now()
+    started = now - timedelta(minutes=14)
+    for session_id in ("idle", "active"):
+        service.save(
+            service.create(session_id, started),
+            ConversationTurn(user_message="hi", assistant_message="hello", timestamp=started),
+        )
+    # A later turn is journaled as a delta and pushes the idle deadline out
+    later = now - timedelta(minutes=2)
+    service.save(
+        service.load("active", later),
+        ConversationTurn(user_message="still here", assistant_message="ok", timestamp=later),
+    )
+    assert len(sqlite_session_repo.get_deltas("active")) == 1
+
+    assert sqlite_session_repo.sweep(now + timedelta(minutes=5)) == 1
+    assert sqlite_session_repo.get("idle") is None
+    assert sqlite_session_repo.get("active") is not None
+
+    assert sqlite_session_repo.sweep(now + timedelta(minutes=20)) == 1  # absolute expiry
+    assert sqlite_session_repo.get("active") is None
+    assert sqlite_session_repo.get_deltas("active") == []
+
+
+def test_session_backend_selection(monkeypatch, tmp_path):
+    """Test that SESSION_BACKEND selects the repository implementation"""
+    monkeypatch.setenv("SESSION_BACKEND", "sqlite")
+    monkeypatch.setenv("SESSION_DB_PATH", str(tmp_path / "configured.db"))
+    assert isinstance(create_session_repository(), SQLiteSessionRepository)
+
+    monkeypatch.setenv("SESSION_BACKEND", "memory")
+    assert isinstance(create_session_repository(), MockSessionRepository)
+
+    monkeypatch.delenv("SESSION_BACKEND")
+    assert isinstance(create_session_repository(), TTLSessionRepository)
+
+    monkeypatch.setenv("SESSION_BACKEND", "redis")
+    with pytest.raises(ValueError, match="Unknown SESSION_BACKEND"):
+        create_session_repository()
+
+
+def make_state_dict(session_id, last_activity, expires_at):
+    return {
+        "session_id": session_id,
+        "last_activity": last_activity,
+        "expires_at": expires_at,
+    }
+
+
+def test_ttl_sweep_evicts_idle_and_absolute():
+    """Test that sweep evicts only due sessions and counts the reason"""
+    repo = TTLSessionRepository()
+    now = get_pst_now()
+    repo.set("active", make_state_dict("active", now, now + timedelta(minutes=30)))
+    repo.set("idle", make_state_dict("idle", now - timedelta(minutes=16), now + timedelta(minutes=10)))
+    repo.set("expired", make_state_dict("expired", now - timedelta(minutes=1), now - timedelta(seconds=1)))
+
+    assert repo.sweep(now) == 2
+    assert repo.get("active") is not None
+    assert repo.stats() == {"live": 1, "evicted_idle": 1, "evicted_absolute": 1}
+
+
+def test_ttl_resave_supersedes_old_deadline():
+    """Test that activity pushes the deadline out and stale heap entries are ignored"""
+    repo = TTLSessionRepository()
+    now = get_pst_now()
+    repo.set("s", make_state_dict("s", now - timedelta(minutes=14), now + timedelta(minutes=20)))
+    repo.set("s", make_state_dict("s", now, now + timedelta(minutes=20)))
+
+    assert repo.sweep(now + timedelta(minutes=5)) == 0
+    assert repo.get("s") is not None
+    assert repo.sweep(now + timedelta(minutes=16)) == 1
+
+
+def test_ttl_get_hides_unswept_expired_session():
+    """Test that an expired session is never returned even before a sweep"""
+    repo = TTLSessionRepository()
+    now = get_pst_now()
+    repo.set("s", make_state_dict("s", now - timedelta(minutes=20), now + timedelta(minutes=5)))
+
+    assert repo.get("s") is None
+    assert repo.stats()["evicted_idle"] == 1
+
+
+def test_ttl_background_sweeper():
+    """Test that the sweeper thread evicts without explicit calls"""
+    repo = TTLSessionRepository(idle_timeout=timedelta(milliseconds=10))
+    now = get_pst_now()
+    repo.set("s", make_state_dict("s", now, now + timedelta(minutes=30)))
+
+    repo.start_sweeper(interval_seconds=0.01)
+    try:
+        deadline = time.monotonic() + 2
+        while repo.stats()["live"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        repo.stop_sweeper()
+
+    assert repo.stats()["live"] == 0
+
+
+@pytest.fixture(params=["memory", "ttl", "sqlite"])
+def any_session_repo(request, tmp_path):
+    if request.param == "memory":
+        return MockSessionRepository()
+    if request.param == "ttl":
+        return TTLSessionRepository()
+    return SQLiteSessionRepository(str(tmp_path / "journal.db"))
+
+
+def run_turns(session_service, session_id, count):
+    for i in range(count):
+        state = session_service.load(session_id)
+        state.last_intent = "list"
+        session_service.save(
+            state,
+            ConversationTurn(
+                user_message=f"message {i}",
+                assistant_message=f"reply {i}",
+                timestamp=get_pst_now(),
+            ),
+        )
+
+
+def test_session_service_appends_deltas(any_session_repo):
+    """Test that turns after the first are journaled as single-turn deltas"""
+    session_service = SessionService(any_session_repo, compact_every=20)
+    run_turns(session_service, "journal", 4)
+
+    snapshot = any_session_repo.get("journal")
+    deltas = any_session_repo.get_deltas("journal")
+    assert len(snapshot["conversation_history"]) == 1
+    assert len(deltas) == 3
+    assert deltas[-1]["turn"]["user_message"] == "message 3"
+    assert deltas[-1]["fields"]["last_intent"] == "list"
+    deltas.clear()  # callers get a copy, not the store's journal
+    assert len(any_session_repo.get_deltas("journal")) == 3
+
+    state = session_service.load("journal")
+    assert [t.user_message for t in state.conversation_history] == [
+        f"message {i}" for i in range(4)
+    ]
+
+
+def test_session_service_compacts_on_schedule(any_session_repo):
+    """Test that the journal is folded into a snapshot every compact_every turns"""
+    session_service = SessionService(any_session_repo, compact_every=5)
+    run_turns(session_service, "compact", 6)
+
+    assert len(any_session_repo.get("compact")["conversation_history"]) == 6
+    assert len(any_session_repo.get_deltas("compact")) == 0
+
+
+def test_session_service_loads_recent_context_only():
+    """Test that load materializes a bounded window while storage keeps 50 turns"""
+    session_service = SessionService(MockSessionRepository(), compact_every=7)
+    run_turns(session_service, "long", 60)
+
+    state = session_service.load("long")
+    record = session_service.materialize("long")
+
+    assert len(state.conversation_history) == CONTEXT_HISTORY_TURNS
+    assert state.conversation_history[-1].user_message == "message 59"
+    assert len(record["conversation_history"]) == 50
+    assert record["conversation_history"][0]["user_message"] == "message 10"
+
+
+def test_session_service_drops_expired_session():
+    """Test that an idle session is deleted and replaced with a fresh one"""
+    repo = MockSessionRepository()
+    session_service = SessionService(repo)
+    now = get_pst_now()
+    stale = session_service.create("stale", now - timedelta(minutes=20))
+    stale.verified = True
+    session_service.save(
+        stale,
+        ConversationTurn(user_message="hi", assistant_message="hello", timestamp=now),
+    )
+
+    state = session_service.load("stale", now)
+
+    assert state.verified is False
+    assert state.expires_at > now + timedelta(minutes=29)
+    assert repo.get("stale") is None
+
+
+def test_session_service_loads_session_without_absolute_expiry():
+    """Test that a stored session lacking expires_at loads instead of raising"""
+    repo = MockSessionRepository()
+    now = get_pst_now()
+    repo.set("legacy", {"session_id": "legacy", "verified": True, "last_activity": now})
+
+    state = SessionService(repo).load("legacy", now)
+
+    assert state.verified is True
+    assert state.expires_at is None
+
+
+@pytest.mark.asyncio
+async def test_sqlite_session_io_runs_off_the_event_loop(any_session_repo):
+    """Test that only blocking (SQLite) session stores are offloaded to a thread"""
+    session_service = SessionService(any_session_repo)
+    loop_thread = threading.get_ident()
+
+    def load_recording_thread(session_id):
+        load_recording_thread.thread = threading.get_ident()
+        return session_service.load(session_id)
+
+    state = await offload(session_service.blocking_io, load_recording_thread, "offloaded")
+
+    assert state.session_id == "offloaded"
+    offloaded = load_recording_thread.thread != loop_thread
+    assert offloaded is isinstance(any_session_repo, SQLiteSessionRepository)
+
+
+@pytest.mark.parametrize("backend", ["ttl", "sqlite"])
+def test_compaction_keeps_delta_appended_by_another_worker(backend, tmp_path):
+    """Test that a delta appended while the journal is being folded isn't dropped"""
+    if backend == "ttl":
+        repo = other_worker = TTLSessionRepository()
+    else:
+        repo = SQLiteSessionRepository(str(tmp_path / "race.db"))
+        other_worker = SQLiteSessionRepository(str(tmp_path / "race.db"))
+    run_turns(SessionService(repo), "race", 2)
+    late = {"fields": {}, "turn": {"user_message": "late"}}
+    writers = []
+
+    def fold_while_another_worker_appends(snapshot, deltas):
+        writer = threading.Thread(target=other_worker.append_delta, args=("race", late))
+        writer.start()
+        writer.join(0.2)  # waits on the compaction's lock
+        writers.append(writer)
+        return {**snapshot, "folded": len(deltas)}
+
+    repo.compact("race", fold_while_another_worker_appends)
+    writers[0].join()
+
+    assert repo.get("race")["folded"] == 1
+    assert [delta["turn"]["user_message"] for delta in repo.get_deltas("race")] == ["late"]
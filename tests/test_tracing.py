@@ -0,0 +1,88 @@
+import asyncio
+import pytest
+from app.utils.metrics import Histogram
+from app.utils.tracing import TracedProxy, TurnTrace, current_trace, dependency_span
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeRepository:
+    def __init__(self, clock: FakeClock):
+        self.clock = clock
+
+    def get_by_id(self, item_id):
+        self.clock.now += 0.002
+        return item_id
+
+
+@pytest.mark.asyncio
+async def test_turn_trace_attributes_dependency_time_to_running_node():
+    """Test that LLM and repository time land on the node that spent it"""
+    clock = FakeClock()
+    trace = TurnTrace(clock=clock)
+    repo = TracedProxy(FakeRepository(clock))
+
+    async def router(state):
+        with dependency_span("llm"):
+            clock.now += 0.1
+        return state
+
+    async def list_node(state):
+        clock.now += 0.001
+        return repo.get_by_id(state)
+
+    async def run_node(name, node, state):
+        # Stands in for the compiled graph's per-step clock and node hook
+        started = clock()
+        result = await node(state)
+        trace.end_node(name, clock() - started)
+        return result
+
+    token = current_trace.set(trace)
+    try:
+        await run_node("router", router, "a_001")
+        assert await run_node("list", list_node, "a_001") == "a_001"
+    finally:
+        current_trace.reset(token)
+    trace.total_seconds = clock.now
+
+    result = trace.to_dict()
+    assert result["path"] == ["Router", "List"]
+    assert result["nodes"][0] == {"node": "router", "ms": 100.0, "llm_ms": 100.0, "repository_ms": 0.0}
+    assert result["nodes"][1]["repository_ms"] == 2.0
+    assert result["nodes"][1]["ms"] == 3.0
+    assert result["total_ms"] == 103.0
+
+
+@pytest.mark.asyncio
+async def test_dependency_span_is_isolated_per_task():
+    """Test that concurrent turns never write into each other's trace"""
+    traces = [TurnTrace(), TurnTrace()]
+
+    async def turn(trace, delay):
+        current_trace.set(trace)
+        with dependency_span("llm"):
+            await asyncio.sleep(delay)
+        trace.end_node("smalltalk", delay)
+
+    await asyncio.gather(turn(traces[0], 0.0), turn(traces[1], 0.05))
+
+    assert traces[0].nodes[0]["llm"] < 0.04 <= traces[1].nodes[0]["llm"]
+
+
+def test_histogram_buckets_and_summary():
+    """Test bucket placement and the bucket-estimated summary"""
+    histogram = Histogram("test_seconds", labels=("node",), buckets=(0.01, 0.1, 1.0))
+    for value in [0.005, 0.05, 0.05, 0.5, 5.0]:
+        histogram.observe(value, "router")
+
+    counts_and_sum = histogram.series()[("router",)]
+    assert counts_and_sum[:-1] == [1, 2, 1, 1]
+    assert counts_and_sum[-1] == pytest.approx(5.605)
+    assert histogram.summary()["router"]["p50_ms"] == 100.0
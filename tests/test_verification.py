@@ -3,7 +3,7 @@ from datetime import datetime, date, timedelta
 from app.services.verification import VerificationService
 from app.repositories.mock_patients import MockPatientRepository
 from app.repositories.mock_otp import MockOTPRepository
-from app.domain.models import SessionState, VerificationState
+from app.domain.models import Patient, SessionState, VerificationState
 from app.utils.time import get_pst_now
 
 
@@ -127,4 +127,43 @@ def test_require_otp_threshold(verification_service, session_state):
     
     # After 3 failures, should require OTP
     session_state.verification.failed_attempts = 3
-    assert verification_service.require_otp_if_needed(session_state) is True
\ No newline at end of file
+    assert verification_service.require_otp_if_needed(session_state) is True
+
+def test_patient_index_tracks_inserts_and_updates(patient_repo):
+    """Test that the (phone, DOB) index follows inserts and updates"""
+    patient = Patient(
+        patient_id="p_100",
+        full_name="Ana Lopez",
+        phone_e164="+14155551000",
+        dob=date(1970, 3, 3),
+    )
+    patient_repo.add(patient)
+    assert patient_repo.find_by_phone_and_dob("+14155551000", date(1970, 3, 3)) == [patient]
+
+    moved = patient.model_copy(update={"phone_e164": "+14155552000"})
+    patient_repo.update(moved)
+
+    assert patient_repo.find_by_phone_and_dob("+14155551000", date(1970, 3, 3)) == []
+    assert patient_repo.find_by_phone_and_dob("+14155552000", date(1970, 3, 3)) == [moved]
+
+
+def test_shared_phone_and_dob_is_ambiguous(verification_service, patient_repo):
+    """Test that two patients sharing phone and DOB do not auto-match"""
+    patient_repo.add(
+        Patient(
+            patient_id="p_twin",
+            full_name="Jane Doe",
+            phone_e164="+14155550123",
+            dob=date(1985, 7, 14),
+        )
+    )
+
+    assert len(patient_repo.find_by_phone_and_dob("+14155550123", date(1985, 7, 14))) == 2
+    assert verification_service.attempt_match("+14155550123", date(1985, 7, 14)) is None
+
+
+def test_get_many_by_id(patient_repo):
+    """Test bulk lookup keeps order and skips unknown ids"""
+    patients = patient_repo.get_many_by_id(["p_002", "missing", "p_001"])
+
+    assert [p.patient_id for p in patients] == ["p_002", "p_001"]